@@ -0,0 +1,8 @@
+#benchmarks
+
+"""
+Benchmarks reproducibles del servicio de IA.
+
+    python -m benchmarks --sizes 10,100,1000 --output results.json
+    python -m benchmarks.compare base.json results.json
+"""
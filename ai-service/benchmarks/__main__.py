@@ -0,0 +1,62 @@
+#benchmarks/__main__
+
+import argparse
+import logging
+import os
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks del servicio de IA de FinWise")
+    parser.add_argument("--sizes", default="10,100,1000,10000,100000",
+                        help="Tamaños de historial separados por comas")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=5, help="Mediciones por caso")
+    parser.add_argument("--warmup", type=int, default=1, help="Ejecuciones de calentamiento por caso")
+    parser.add_argument("--max-seconds", type=float, default=30.0,
+                        help="Tiempo máximo por caso antes de cortar las repeticiones")
+    parser.add_argument("--targets", default="", help="Motores o rutas a medir, separados por comas (todos si se omite)")
+    parser.add_argument("--no-engines", action="store_true", help="No medir los motores")
+    parser.add_argument("--no-routes", action="store_true", help="No medir las rutas HTTP")
+    parser.add_argument("--no-serialization", action="store_true",
+                        help="No medir la serialización de las respuestas")
+    parser.add_argument("--no-frame", action="store_true",
+                        help="No medir la memoria y los groupby del frame de transacciones")
+    parser.add_argument("--no-memory", action="store_true", help="No medir el pico de memoria")
+    parser.add_argument("--executor", default="inline", choices=["inline", "thread", "process"],
+                        help="Modo del pool de modelos para las rutas (inline mide solo el cómputo)")
+    parser.add_argument("--output", default="", help="Archivo JSON de resultados")
+    args = parser.parse_args()
+
+    # La configuración se lee al importar el servicio: fijarla antes de cargarlo.
+    # El cache de respuestas se desactiva para medir siempre el cálculo completo;
+    # el warm-up también (cada caso ya tiene sus ejecuciones de calentamiento).
+    os.environ["AI_EXECUTOR_MODE"] = args.executor
+    os.environ["AI_CACHE_ENABLED"] = "false"
+    os.environ["AI_WARMUP_ENABLED"] = "false"
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    from benchmarks.runner import BenchmarkRunner, save_results
+
+    runner = BenchmarkRunner(
+        sizes=[int(size) for size in args.sizes.split(",") if size],
+        seed=args.seed,
+        repeat=args.repeat,
+        warmup=args.warmup,
+        max_seconds=args.max_seconds,
+        memory=not args.no_memory,
+        engines=not args.no_engines,
+        routes=not args.no_routes,
+        serialization=not args.no_serialization,
+        frame=not args.no_frame,
+        targets=[target for target in args.targets.split(",") if target] or None,
+    )
+    results = runner.run()
+
+    if args.output:
+        save_results(results, args.output)
+        logging.info(f"Resultados guardados en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
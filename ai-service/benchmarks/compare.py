@@ -0,0 +1,44 @@
+#benchmarks/compare
+
+import argparse
+import json
+from typing import Any, Dict, Tuple
+
+
+def _index(results: Dict[str, Any]) -> Dict[Tuple[str, str, int], Dict[str, Any]]:
+    return {(r["kind"], r["target"], r["size"]): r for r in results["results"]}
+
+
+def compare(base: Dict[str, Any], new: Dict[str, Any], metric: str = "p50_s") -> str:
+    """Tabla con la variación de ``metric`` por caso entre dos ejecuciones"""
+    base_index, new_index = _index(base), _index(new)
+    lines = [
+        f"base: {base['meta'].get('commit')}  nuevo: {new['meta'].get('commit')}  métrica: {metric}",
+        f"{'caso':48s} {'base':>12s} {'nuevo':>12s} {'cambio':>9s}",
+    ]
+
+    for key in sorted(set(base_index) & set(new_index), key=lambda k: (k[0], k[1], k[2])):
+        before, after = base_index[key][metric], new_index[key][metric]
+        change = (after / before - 1) * 100 if before else 0.0
+        case = f"{key[0]} {key[1]} n={key[2]}"
+        lines.append(f"{case:48s} {before * 1000:10.2f}ms {after * 1000:10.2f}ms {change:+8.1f}%")
+
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara dos archivos de resultados de benchmarks")
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--metric", default="p50_s", help="mean_s, p50_s, p95_s, p99_s...")
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    print(compare(base, new, args.metric))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+#benchmarks/differential
+
+"""
+Comparación diferencial del camino de arrays (payloads pequeños) con el de
+pandas: para cada payload sintético se construye el contexto sobre arrays y
+un contexto normal sobre el frame equivalente, y se exige que el resumen, la
+salud financiera, las recomendaciones, la predicción y las anomalías
+(normales y en modo degradado) sean idénticos byte a byte. Además, el ajuste
+agrupado de CategoryRegressions se compara (con tolerancia) con el de
+StandardScaler + LinearRegression por categoría.
+
+    python -m benchmarks.differential --cases 500
+"""
+
+import argparse
+import logging
+import random
+import sys
+import warnings
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.generator import DATE_FORMATS, TransactionGenerator
+from models.anomaly_detector import AnomalyDetector
+from models.predictor import ExpensePredictor
+from models.recommender import FinancialRecommender
+from schemas import UserFinancialData
+from utils.analysis_context import AnalysisContext
+from utils.array_context import ArrayAnalysisContext
+from utils.data_processor import DataProcessor
+from utils.fast_json import dumps
+
+
+def sklearn_reference(amounts: np.ndarray, dates: np.ndarray, days: int = 7) -> Tuple[np.ndarray, float]:
+    """
+    Proyección diaria y confianza de una categoría con su propio StandardScaler +
+    LinearRegression (el ajuste por categoría que CategoryRegressions reemplaza)
+    """
+    from sklearn.linear_model import LinearRegression
+    from sklearn.preprocessing import StandardScaler
+
+    dates = pd.to_datetime(dates)
+    start = dates.min()
+    X = np.column_stack([dates.dayofweek, (dates - start).days]).astype(np.float64)
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+    model = LinearRegression().fit(X_scaled, amounts)
+
+    future = [dates.max() + pd.Timedelta(days=i) for i in range(1, days + 1)]
+    X_future = np.array([[day.weekday(), (day - start).days] for day in future], dtype=np.float64)
+    predictions = np.minimum(np.maximum(model.predict(scaler.transform(X_future)), 0), amounts.mean() * 3)
+    return predictions, min(0.9, max(0.3, model.score(X_scaled, amounts)))
+
+
+def _without_dates(result: Any) -> Any:
+    """Quita la fecha de análisis (depende del instante en que se calcula)"""
+    if isinstance(result, dict):
+        return {k: _without_dates(v) for k, v in result.items() if k != "analysis_date"}
+    return result
+
+
+def random_case(rng: random.Random, max_rows: int) -> UserFinancialData:
+    """
+    Payload pequeño con una forma al azar: historiales de pocos días (muchas
+    fechas repetidas), pocas o muchas categorías, solo gastos, atípicos
+    frecuentes, fechas sin hora y usuarios sin budgets ni deudas
+    """
+    generator = TransactionGenerator(
+        seed=rng.randrange(1_000_000),
+        n_categories=rng.choice([1, 2, 3, 8, 16]),
+        income_ratio=rng.choice([0.0, 0.08, 0.3]),
+        saving_ratio=rng.choice([0.0, 0.04, 0.2]),
+        date_formats=rng.choice([DATE_FORMATS, ['%Y-%m-%d'], ['%d/%m/%Y']]),
+        outlier_rate=rng.choice([0.0, 0.02, 0.3]),
+        history_days=rng.choice([1, 3, 14, 45, 180, 720]),
+    )
+    payload = generator.payload(rng.randint(1, max_rows))
+    if rng.random() < 0.3:
+        payload["budgets"], payload["debts"] = [], []
+    return UserFinancialData(**payload)
+
+
+class DifferentialRunner:
+    def __init__(self, cases: int = 200, seed: int = 42, max_rows: int = 64):
+        self.cases = cases
+        self.seed = seed
+        self.max_rows = max_rows
+        self.data_processor = DataProcessor(small_payload_max_rows=max_rows)
+        self.predictor = ExpensePredictor()
+        self.anomaly_detector = AnomalyDetector()
+        self.recommender = FinancialRecommender()
+
+    def checks(self) -> List[Tuple[str, Callable[[AnalysisContext], Any]]]:
+        return [
+            ("summary", self.data_processor.generate_financial_summary),
+            ("financial_health", self.recommender._analyze_financial_health),
+            ("recommendations", lambda ctx: self.recommender.generate_recommendations(ctx, user_id="diff")),
+            ("prediction", lambda ctx: self.predictor.predict_weekly_expenses(ctx, "diff")),
+            ("prediction:statistical", lambda ctx: self.predictor.predict_weekly_expenses(ctx, "diff", statistical=True)),
+            ("anomalies", lambda ctx: self.anomaly_detector.detect_anomalies(ctx, "diff")),
+            ("anomalies:statistical", lambda ctx: self.anomaly_detector.detect_anomalies(ctx, "diff", statistical=True)),
+            ("valid_until", lambda ctx: ctx.valid_until),
+        ]
+
+    def regression_matches(self, context: AnalysisContext, rtol: float = 1e-6) -> bool:
+        """Monto y confianza del ajuste agrupado frente al de sklearn, categoría por categoría"""
+        amounts, dates, codes, categories = self.predictor._expense_columns(context)
+        counts = np.bincount(codes, minlength=len(categories))
+        fitted = np.flatnonzero(counts >= 5)
+        if not len(fitted):
+            return True
+
+        forecast, confidence = self.predictor._ml_predictions("differential", None, amounts, dates, codes, categories)
+        amount = forecast.mean(axis=1)
+        for code in fitted:
+            rows = codes == code
+            predictions, reference_confidence = sklearn_reference(amounts[rows], dates[rows])
+            if not (np.isclose(predictions.mean(), amount[code], rtol=rtol, atol=1e-9)
+                    and np.isclose(reference_confidence, confidence[code], rtol=rtol, atol=1e-9)):
+                return False
+        return True
+
+    def run(self) -> Dict[str, Any]:
+        rng = random.Random(self.seed)
+        checks = self.checks()
+        mismatches: Dict[str, List[int]] = {name: [] for name, _ in checks + [("frame", None), ("regression", None)]}
+
+        for case in range(self.cases):
+            financial_data = random_case(rng, self.max_rows)
+
+            # Los dos contextos salen de las mismas columnas parseadas: el frame
+            # del de pandas es el que el de arrays construye bajo demanda
+            arrays = self.data_processor.build_context(financial_data)
+            assert isinstance(arrays, ArrayAnalysisContext)
+            frame = AnalysisContext(arrays.df, arrays.budgets_df, arrays.debts_df, arrays.reference_date)
+            fresh = ArrayAnalysisContext(arrays.arrays, arrays._columns, self.data_processor,
+                                         financial_data.budgets, financial_data.debts, arrays.reference_date)
+
+            # El frame bajo demanda es el mismo que el del camino normal
+            eager = self.data_processor.process_transactions(financial_data.transactions, arrays.reference_date)
+            try:
+                pd.testing.assert_frame_equal(eager, arrays.df)
+            except AssertionError:
+                mismatches["frame"].append(case)
+
+            for name, check in checks:
+                if dumps(_without_dates(check(fresh))) != dumps(_without_dates(check(frame))):
+                    mismatches[name].append(case)
+
+            if not self.regression_matches(frame):
+                mismatches["regression"].append(case)
+
+        return {"cases": self.cases, "mismatches": mismatches}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara el camino de arrays con el de pandas")
+    parser.add_argument("--cases", type=int, default=200, help="Payloads aleatorios a comparar")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--max-rows", type=int, default=64, help="Transacciones máximas por payload")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    warnings.simplefilter("ignore")
+
+    results = DifferentialRunner(args.cases, args.seed, args.max_rows).run()
+    failed = False
+    for name, cases in results["mismatches"].items():
+        failed = failed or bool(cases)
+        status = "ok" if not cases else f"{len(cases)} diferencias (casos {cases[:10]})"
+        logging.info(f"{name:24s} {status}")
+    logging.info(f"{results['cases']} casos")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#benchmarks/generator
+
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+from schemas import UserFinancialData
+
+# Formatos aceptados por DataProcessor._parse_date
+DATE_FORMATS = ['%Y-%m-%d', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M:%S.%f', '%d/%m/%Y']
+
+# Categorías de gasto con su monto típico (mediana aproximada)
+EXPENSE_CATEGORIES = [
+    ("food", 25.0),
+    ("transportation", 15.0),
+    ("entertainment", 40.0),
+    ("housing", 600.0),
+    ("utilities", 80.0),
+    ("healthcare", 60.0),
+    ("education", 120.0),
+    ("shopping", 50.0),
+    ("clothing", 45.0),
+    ("travel", 250.0),
+    ("insurance", 90.0),
+    ("personal_care", 20.0),
+    ("subscriptions", 12.0),
+    ("gifts", 35.0),
+    ("pets", 30.0),
+    ("other", 20.0),
+]
+
+
+class TransactionGenerator:
+    """
+    Genera payloads sintéticos y deterministas (misma semilla, mismo payload)
+    con la forma de UserFinancialData.
+
+    - n_categories: categorías de gasto distintas (máximo 16)
+    - income_ratio / saving_ratio: fracción de transacciones de ingreso y ahorro
+    - date_formats: formatos de fecha usados, repartidos al azar
+    - outlier_rate / outlier_factor: gastos inflados para que haya anomalías
+    - history_days: días de historial hacia atrás desde reference_date
+    """
+
+    def __init__(self, seed: int = 42, n_categories: int = 8, income_ratio: float = 0.08,
+                 saving_ratio: float = 0.04, date_formats: Sequence[str] = DATE_FORMATS,
+                 outlier_rate: float = 0.02, outlier_factor: float = 8.0, history_days: int = 180,
+                 missing_date_rate: float = 0.0, reference_date: Optional[datetime] = None):
+        self.seed = seed
+        self.categories = EXPENSE_CATEGORIES[:max(1, min(n_categories, len(EXPENSE_CATEGORIES)))]
+        self.income_ratio = income_ratio
+        self.saving_ratio = saving_ratio
+        self.date_formats = list(date_formats)
+        self.outlier_rate = outlier_rate
+        self.outlier_factor = outlier_factor
+        self.history_days = history_days
+        self.missing_date_rate = missing_date_rate
+        # Medianoche para que el payload no dependa de la hora en que se genera
+        self.reference_date = (reference_date or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def transactions(self, n: int, seed_offset: int = 0) -> List[Dict[str, Any]]:
+        rng = random.Random(self.seed * 1_000_003 + seed_offset)
+        transactions = []
+
+        for i in range(n):
+            draw = rng.random()
+            if draw < self.income_ratio:
+                trans_type, category = "income", "salary"
+                amount = round(rng.lognormvariate(7.6, 0.2), 2)  # ~2000
+            elif draw < self.income_ratio + self.saving_ratio:
+                trans_type, category = "saving", "savings"
+                amount = round(rng.lognormvariate(5.0, 0.4), 2)  # ~150
+            else:
+                trans_type = "expense"
+                category, typical = rng.choice(self.categories)
+                amount = rng.lognormvariate(0, 0.5) * typical
+                if rng.random() < self.outlier_rate:
+                    amount *= self.outlier_factor
+                amount = round(amount, 2)
+
+            transaction = {
+                "id": f"t{seed_offset}-{i}",
+                "amount": amount,
+                "category": category,
+                "description": f"{category} #{i}" if i % 3 else None,
+                "type": trans_type,
+                "date": None,
+            }
+
+            if rng.random() >= self.missing_date_rate:
+                date = self.reference_date - timedelta(
+                    days=rng.randrange(self.history_days),
+                    seconds=rng.randrange(86400),
+                )
+                transaction["date"] = date.strftime(rng.choice(self.date_formats))
+
+            transactions.append(transaction)
+
+        return transactions
+
+    def payload(self, n: int, user_id: str = "bench-user", seed_offset: int = 0) -> Dict[str, Any]:
+        """Payload JSON (dict) con n transacciones, budgets y deudas"""
+        rng = random.Random(self.seed * 7_919 + seed_offset)
+        period_start = self.reference_date.replace(day=1)
+        period_end = (period_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+        budgets = [
+            {
+                "category": category,
+                "amountPlanned": round(typical * rng.uniform(8, 20), 2),
+                "periodStart": period_start.strftime('%Y-%m-%d'),
+                "periodEnd": period_end.strftime('%Y-%m-%d'),
+            }
+            for category, typical in self.categories[:4]
+        ]
+        debts = [
+            {"type": "credit_card", "amount": round(rng.uniform(500, 5000), 2), "interestRate": 0.24},
+            {"type": "loan", "amount": round(rng.uniform(2000, 20000), 2), "interestRate": 0.08},
+        ]
+
+        return {
+            "user_id": user_id,
+            "transactions": self.transactions(n, seed_offset),
+            "budgets": budgets,
+            "debts": debts,
+        }
+
+    def financial_data(self, n: int, user_id: str = "bench-user", seed_offset: int = 0) -> UserFinancialData:
+        return UserFinancialData(**self.payload(n, user_id, seed_offset))
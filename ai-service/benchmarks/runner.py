@@ -0,0 +1,328 @@
+#benchmarks/runner
+
+import gc
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from benchmarks.generator import TransactionGenerator
+
+DEFAULT_SIZES = (10, 100, 1_000, 10_000, 100_000)
+ENGINE_TARGETS = ("process_transactions", "build_context", "predictor", "predictor:warm", "anomaly_detector",
+                  "recommender", "financial_summary")
+SERIALIZATION_TARGETS = ("anomalies", "recommendations", "financial_analysis")
+ROUTE_TARGETS = ("/predict/weekly-expenses", "/detect/anomalies", "/recommendations", "/financial-analysis")
+
+
+def measure(fn: Callable[[], Any], setup: Optional[Callable[[], Any]] = None, repeat: int = 5,
+            warmup: int = 1, max_seconds: float = 30.0) -> List[float]:
+    """
+    Tiempos (segundos) de ``repeat`` ejecuciones de ``fn``. ``setup`` prepara los
+    argumentos de cada ejecución fuera de la medición. Se corta antes si el caso
+    supera ``max_seconds`` (siempre hay al menos una medición).
+    """
+    def call():
+        return fn(setup()) if setup else fn()
+
+    for _ in range(warmup):
+        call()
+
+    timings = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        args = setup() if setup else None
+        gc.collect()
+        start = time.perf_counter()
+        fn(args) if setup else fn()
+        timings.append(time.perf_counter() - start)
+        if time.perf_counter() - started > max_seconds:
+            break
+    return timings
+
+
+def peak_memory(fn: Callable[[], Any], setup: Optional[Callable[[], Any]] = None) -> int:
+    """Pico de memoria (bytes) asignado por una ejecución, medido con tracemalloc"""
+    args = setup() if setup else None
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn(args) if setup else fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def summarize(timings: Sequence[float], size: int) -> Dict[str, Any]:
+    values = np.array(timings)
+    mean = float(values.mean())
+    return {
+        "runs": len(values),
+        "mean_s": mean,
+        "min_s": float(values.min()),
+        "p50_s": float(np.percentile(values, 50)),
+        "p90_s": float(np.percentile(values, 90)),
+        "p95_s": float(np.percentile(values, 95)),
+        "p99_s": float(np.percentile(values, 99)),
+        "max_s": float(values.max()),
+        "ops_per_s": 1.0 / mean if mean else None,
+        "transactions_per_s": size / mean if mean else None,
+    }
+
+
+class BenchmarkRunner:
+    """
+    Mide los motores (DataProcessor, ExpensePredictor, AnomalyDetector,
+    FinancialRecommender) y las rutas HTTP en el mismo proceso, para cada
+    tamaño de historial, con payloads del TransactionGenerator.
+    """
+
+    def __init__(self, sizes: Sequence[int] = DEFAULT_SIZES, seed: int = 42, repeat: int = 5,
+                 warmup: int = 1, max_seconds: float = 30.0, memory: bool = True,
+                 engines: bool = True, routes: bool = True, serialization: bool = True, frame: bool = True,
+                 targets: Optional[Sequence[str]] = None):
+        self.sizes = list(sizes)
+        self.seed = seed
+        self.repeat = repeat
+        self.warmup = warmup
+        self.max_seconds = max_seconds
+        self.memory = memory
+        self.engines = engines
+        self.routes = routes
+        self.serialization = serialization
+        self.frame = frame
+        self.targets = set(targets) if targets else None
+        self.generator = TransactionGenerator(seed=seed)
+
+    def run(self) -> Dict[str, Any]:
+        results = []
+        for size in self.sizes:
+            financial_data = self.generator.financial_data(size)
+            if self.engines:
+                results.extend(self._run_engines(financial_data, size))
+            if self.serialization:
+                results.extend(self._run_serialization(financial_data, size))
+            if self.frame:
+                results.extend(self._run_frame(financial_data, size))
+            if self.routes:
+                results.extend(self._run_routes(financial_data, size))
+        return {"meta": self._metadata(), "results": results}
+
+    def _selected(self, target: str) -> bool:
+        return self.targets is None or target in self.targets
+
+    def _case(self, kind: str, target: str, size: int, fn: Callable, setup: Optional[Callable] = None,
+              extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        # Los historiales grandes se calientan una sola vez como mucho
+        warmup = self.warmup if size <= 10_000 else 0
+        timings = measure(fn, setup, self.repeat, warmup, self.max_seconds)
+        result = {"kind": kind, "target": target, "size": size, **summarize(timings, size)}
+        if self.memory:
+            result["peak_memory_bytes"] = peak_memory(fn, setup)
+        if extra:
+            result.update(extra)
+
+        logging.info(f"{kind:13s} {target:34s} n={size:<7d} p50={result['p50_s'] * 1000:9.2f} ms "
+                     f"p95={result['p95_s'] * 1000:9.2f} ms")
+        return result
+
+    def _run_engines(self, financial_data, size: int) -> List[Dict[str, Any]]:
+        from utils import pipeline
+        from utils.analysis_context import AnalysisContext
+
+        processor = pipeline.data_processor
+        user_id = financial_data.user_id
+        base = pipeline.build_context(financial_data)
+
+        def fresh_context():
+            # Contexto nuevo sobre el frame ya procesado: los agregados se recalculan en cada ejecución
+            return AnalysisContext(base.df, base.budgets_df, base.debts_df, base.reference_date)
+
+        def cold_context():
+            # Sin modelos del usuario (ni en el registro ni en disco): cada ejecución ajusta
+            pipeline.predictor.discard_models(user_id)
+            return fresh_context()
+
+        cases = {
+            "process_transactions": (lambda: processor.process_transactions(financial_data.transactions), None),
+            "build_context": (lambda: pipeline.build_context(financial_data), None),
+            "predictor": (lambda context: pipeline.predictor.predict_weekly_expenses(context, user_id), cold_context),
+            # Usuario que repite con los mismos datos: solo inferencia con los modelos guardados
+            "predictor:warm": (lambda context: pipeline.predictor.predict_weekly_expenses(context, user_id), fresh_context),
+            "anomaly_detector": (lambda context: pipeline.anomaly_detector.detect_anomalies(context, user_id), fresh_context),
+            "recommender": (lambda context: pipeline.recommender.generate_recommendations(context, user_id=user_id), fresh_context),
+            "financial_summary": (lambda context: processor.generate_financial_summary(context), fresh_context),
+        }
+
+        results = [
+            self._case("engine", target, size, fn, setup)
+            for target, (fn, setup) in cases.items()
+            if self._selected(target)
+        ]
+
+        # No dejar modelos del usuario sintético en disco
+        pipeline.predictor.wait_for_saves()
+        pipeline.predictor.discard_models(user_id)
+        return results
+
+    def _run_serialization(self, financial_data, size: int) -> List[Dict[str, Any]]:
+        """
+        Costo de serializar las respuestas grandes: la ruta de FastAPI (validación
+        contra el response_model + jsonable_encoder + json) frente a FastJSONResponse
+        """
+        import json
+        from fastapi.encoders import jsonable_encoder
+        from pydantic import TypeAdapter
+        from schemas import AnomalyResponse, RecommendationResponse
+        from utils import fast_json, pipeline
+
+        context = pipeline.build_context(financial_data)
+        models = {"anomalies": AnomalyResponse, "recommendations": RecommendationResponse, "financial_analysis": None}
+        results = []
+
+        for target in SERIALIZATION_TARGETS:
+            if not self._selected(target):
+                continue
+
+            content = pipeline.TASKS[target](context, financial_data.user_id)
+            adapter = TypeAdapter(models[target]) if models[target] else None
+
+            def validated(content=content, adapter=adapter):
+                if adapter is not None:
+                    encoded = adapter.dump_python(adapter.validate_python(content, from_attributes=True), mode="json")
+                else:
+                    encoded = jsonable_encoder(content)
+                return json.dumps(encoded, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+            def fast(content=content):
+                return fast_json.dumps(content)
+
+            extra = {"response_bytes": len(fast())}
+            results.append(self._case("serialization", f"{target}:validated", size, validated, extra=extra))
+            results.append(self._case("serialization", f"{target}:fast", size, fast, extra=extra))
+
+        return results
+
+    def _run_frame(self, financial_data, size: int) -> List[Dict[str, Any]]:
+        """
+        Esquema del frame de transacciones: memoria y tiempo de los groupby de los
+        motores con el esquema compacto (categóricas, enteros pequeños), con el
+        anterior (cadenas object, int64/float64) y con montos en float32
+        """
+        from utils import pipeline
+
+        frame = pipeline.build_context(financial_data).df
+        if frame.empty:
+            return []
+        # Esquema compacto aunque el tamaño quede bajo AI_COMPACT_DTYPES_MIN_ROWS
+        compact = pipeline.data_processor._compact_dtypes(frame)
+
+        layouts = {
+            "compact": compact,
+            "legacy": compact.astype({
+                'category': object, 'type': object, 'day_of_week': 'int64', 'month': 'int64',
+                'week_of_year': 'UInt32', 'days_ago': 'int64', 'amount': 'float64',
+            }),
+            "float32": compact.astype({'amount': 'float32'}),
+        }
+
+        def groupbys(df):
+            expenses = df[df['type'] == 'expense']
+            expenses.groupby('category', observed=True)['amount'].agg(['sum', 'count', 'mean'])
+            expenses.groupby('day_of_week')['amount'].agg(['sum', 'mean'])
+            df.groupby('type', observed=True)['amount'].sum()
+            expenses.groupby(expenses['date'].dt.date).agg({'amount': ['sum', 'count'], 'category': 'count'})
+
+        return [
+            self._case("frame", f"groupby:{layout}", size, lambda df=df: groupbys(df),
+                       extra={"frame_bytes": int(df.memory_usage(deep=True).sum())})
+            for layout, df in layouts.items()
+            if self._selected("frame") or self._selected(f"groupby:{layout}")
+        ]
+
+    def _run_routes(self, financial_data, size: int) -> List[Dict[str, Any]]:
+        try:
+            from fastapi.testclient import TestClient
+        except (ImportError, RuntimeError) as e:  # TestClient necesita httpx
+            logging.error(f"Rutas HTTP omitidas, TestClient no disponible: {e}")
+            return []
+
+        import main
+
+        # Cuerpo ya serializado: solo se mide el servidor, no la codificación del cliente
+        body = financial_data.model_dump_json().encode("utf-8")
+        headers = {"content-type": "application/json"}
+        results = []
+
+        with TestClient(main.app) as client:
+            for route in ROUTE_TARGETS:
+                if not self._selected(route):
+                    continue
+
+                response_bytes = len(client.post(route, content=body, headers=headers).content)
+
+                def call(route=route):
+                    response = client.post(route, content=body, headers=headers)
+                    if response.status_code >= 500:
+                        raise RuntimeError(f"{route} respondió {response.status_code}: {response.text[:200]}")
+
+                results.append(self._case("route", route, size, call, extra={
+                    "request_bytes": len(body),
+                    "response_bytes": response_bytes,
+                }))
+
+        return results
+
+    def _metadata(self) -> Dict[str, Any]:
+        import pandas as pd
+        import sklearn
+
+        return {
+            "timestamp": datetime.now().isoformat(),
+            "commit": _git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "scikit_learn": sklearn.__version__,
+            "seed": self.seed,
+            "sizes": self.sizes,
+            "repeat": self.repeat,
+            "executor_mode": os.getenv("AI_EXECUTOR_MODE"),
+            "max_rss_bytes": _max_rss(),
+        }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=os.path.dirname(__file__),
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def _max_rss() -> Optional[int]:
+    try:
+        import resource
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux informa KiB, macOS bytes
+        return usage if sys.platform == "darwin" else usage * 1024
+    except ImportError:  # Windows
+        return None
+
+
+def save_results(results: Dict[str, Any], path: str):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
@@ -0,0 +1,89 @@
+#ai-service/config
+
+import os
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:  # python-dotenv es opcional fuera del entorno de despliegue
+    pass
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_str(name: str, default: str) -> str:
+    return os.getenv(name, default).strip().lower()
+
+
+class Settings:
+    """Configuración del servicio leída de variables de entorno"""
+
+    def __init__(self):
+        # Capa de ejecución de los modelos: "process", "thread" o "inline"
+        self.executor_mode = _env_str("AI_EXECUTOR_MODE", "process")
+        self.executor_workers = max(1, _env_int("AI_EXECUTOR_WORKERS", os.cpu_count() or 1))
+        # Tareas que pueden esperar en cola además de las que ya se están ejecutando
+        self.executor_queue_depth = max(0, _env_int("AI_EXECUTOR_QUEUE_DEPTH", 32))
+
+        # Admisión de solicitudes de análisis (antes del pool)
+        self.admission_concurrency = max(1, _env_int("AI_ADMISSION_CONCURRENCY", self.executor_workers))
+        self.admission_queue = max(0, _env_int("AI_ADMISSION_QUEUE", 32))
+        # Lugares extra reservados para las rutas baratas (resumen)
+        self.admission_priority_slots = max(0, _env_int("AI_ADMISSION_PRIORITY_SLOTS", 1))
+        self.admission_queue_timeout = max(0, _env_int("AI_ADMISSION_QUEUE_TIMEOUT_SECONDS", 10))
+
+        # Trabajos asíncronos (/jobs): vida del resultado, máximo guardado y en ejecución
+        self.jobs_ttl_seconds = max(0, _env_int("AI_JOBS_TTL_SECONDS", 3600))
+        self.jobs_max = max(1, _env_int("AI_JOBS_MAX", 1000))
+        self.jobs_concurrency = max(1, _env_int("AI_JOBS_CONCURRENCY", 1))
+
+        # Calentar los motores al arrancar; /ready no pasa hasta terminar
+        self.warmup_enabled = _env_str("AI_WARMUP_ENABLED", "true") in ("1", "true", "yes")
+
+        # Validar las respuestas de los motores contra su response_model antes de
+        # serializarlas (más lento; pensado para pruebas)
+        self.strict_responses = _env_str("AI_STRICT_RESPONSES", "false") in ("1", "true", "yes")
+
+        # Montos de las transacciones en float32 en lugar de float64 (menos memoria,
+        # resultados con menos precisión)
+        self.float32_amounts = _env_str("AI_FLOAT32_AMOUNTS", "false") in ("1", "true", "yes")
+
+        # Payloads de hasta este número de transacciones se analizan sobre arrays
+        # de NumPy, sin construir el DataFrame salvo que un motor lo necesite (0 lo desactiva)
+        self.small_payload_max_rows = max(0, _env_int("AI_SMALL_PAYLOAD_MAX_ROWS", 64))
+
+        # Frames de transacciones desde este número de filas con el esquema compacto
+        # (category/type categóricas, enteros pequeños); 0 lo usa siempre
+        self.compact_dtypes_min_rows = max(0, _env_int("AI_COMPACT_DTYPES_MIN_ROWS", 10_000))
+
+        # Máximo de usuarios por petición de /batch/financial-analysis
+        self.batch_max_users = max(1, _env_int("AI_BATCH_MAX_USERS", 1000))
+
+        # Cache de respuestas de análisis
+        self.cache_enabled = _env_str("AI_CACHE_ENABLED", "true") in ("1", "true", "yes")
+        self.cache_max_bytes = max(0, _env_int("AI_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+        self.cache_ttl_seconds = max(0, _env_int("AI_CACHE_TTL_SECONDS", 300))
+        self.cache_dir = os.getenv("AI_CACHE_DIR", "")
+        self.cache_disk_max_bytes = max(0, _env_int("AI_CACHE_DISK_MAX_BYTES", 256 * 1024 * 1024))
+
+        # Cubos día × categoría reutilizados entre solicitudes del mismo usuario
+        # (por proceso; 0 los desactiva)
+        self.cube_cache_max_bytes = max(0, _env_int("AI_CUBE_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+
+        # Registro de modelos ajustados del predictor (por proceso)
+        self.model_registry_max_bytes = max(0, _env_int("AI_MODEL_REGISTRY_MAX_BYTES", 64 * 1024 * 1024))
+        self.model_registry_ttl_seconds = max(0, _env_int("AI_MODEL_REGISTRY_TTL_SECONDS", 3600))
+
+        # Modelos del predictor guardados en disco por usuario (vacío: solo en memoria)
+        self.model_storage_dir = os.getenv("AI_MODEL_STORAGE_DIR", "data/model_storage")
+
+        # Historial de transacciones guardado por usuario (URL de SQLAlchemy)
+        self.transaction_store_url = os.getenv("AI_TRANSACTION_STORE_URL", "sqlite:///data/transaction_store.db")
+
+
+settings = Settings()
@@ -2,13 +2,20 @@
 
 import joblib
 import os
+import re
 import json
+import hashlib
+import tempfile
 import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 import logging
 
+# Identificadores de usuario que se usan tal cual en los nombres de archivo; los
+# demás (p. ej. con "/" o "..") se reemplazan por un hash
+_SAFE_USER_ID = re.compile(r'[A-Za-z0-9_-]{1,64}')
+
 class ModelStorage:
     def __init__(self, storage_dir: str = "data/model_storage"):
         self.storage_dir = storage_dir
@@ -19,27 +26,55 @@ class ModelStorage:
         # Crear directorios si no existen
         self._ensure_directories()
         
-        # Cache en memoria para modelos frecuentemente usados
+        # Cache en memoria para modelos frecuentemente usados, con la fecha de
+        # modificación del archivo leído (otros procesos pueden reescribirlo)
         self.model_cache = {}
+        self.cache_mtimes = {}
         self.cache_limit = 10  # Máximo 10 modelos en cache
     
+    def _user_path(self, directory: str, user_id: str, suffix: str) -> str:
+        """
+        Ruta del archivo de un usuario dentro de ``directory``. El nombre sale del
+        user_id solo si pasa _SAFE_USER_ID; si no, de su SHA-256 (con un punto, que
+        el patrón no admite, para no chocar con otro user_id). ValueError si la
+        ruta resuelta queda fuera del directorio.
+        """
+        if _SAFE_USER_ID.fullmatch(user_id):
+            stem = user_id
+        else:
+            stem = "sha256." + hashlib.sha256(user_id.encode("utf-8")).hexdigest()
+        
+        path = os.path.join(directory, f"{stem}{suffix}")
+        if os.path.dirname(os.path.realpath(path)) != os.path.realpath(directory):
+            raise ValueError(f"Ruta fuera del almacenamiento de modelos: {path}")
+        return path
+    
+    def _stored_user_id(self, filename: str) -> Optional[str]:
+        """user_id de un archivo de modelos; los nombres con hash lo leen del modelo guardado"""
+        stem = filename[:-len('_model.pkl')]
+        if _SAFE_USER_ID.fullmatch(stem):
+            return stem
+        return joblib.load(os.path.join(self.models_dir, filename)).get("user_id")
+    
     def _ensure_directories(self):
         """Crea los directorios necesarios para almacenamiento"""
         directories = [self.storage_dir, self.models_dir, self.metadata_dir, self.backups_dir]
         
+        # exist_ok: otro worker puede crearlos al mismo tiempo
         for directory in directories:
-            if not os.path.exists(directory):
-                os.makedirs(directory)
-                logging.info(f"Directorio creado: {directory}")
+            os.makedirs(directory, exist_ok=True)
     
     def save_user_models(self, user_id: str, models: Dict[str, Any], 
-                        scalers: Dict[str, Any], metadata: Dict[str, Any] = None) -> bool:
+                        scalers: Dict[str, Any], metadata: Dict[str, Any] = None,
+                        backup: bool = True) -> bool:
         """
-        Guarda los modelos y scalers de un usuario específico
+        Guarda los modelos y scalers de un usuario específico. Con backup=False
+        no se copia el modelo anterior (modelos que se reconstruyen desde el historial)
         """
         try:
             # Crear backup del modelo anterior si existe
-            self._backup_existing_model(user_id)
+            if backup:
+                self._backup_existing_model(user_id)
             
             # Preparar datos para guardar
             model_data = {
@@ -50,9 +85,12 @@ class ModelStorage:
                 "version": "1.0"
             }
             
-            # Guardar modelo
-            model_path = os.path.join(self.models_dir, f"{user_id}_model.pkl")
-            joblib.dump(model_data, model_path)
+            # Guardar modelo (escritura atómica: otros procesos pueden estar leyéndolo)
+            model_path = self._user_path(self.models_dir, user_id, "_model.pkl")
+            fd, tmp_path = tempfile.mkstemp(dir=self.models_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                joblib.dump(model_data, f)
+            os.replace(tmp_path, model_path)
             
             # Guardar metadata
             if metadata:
@@ -62,17 +100,19 @@ class ModelStorage:
                     "model_path": model_path,
                     "saved_at": datetime.now().isoformat(),
                     "model_size_kb": round(os.path.getsize(model_path) / 1024, 2),
-                    "categories_trained": list(set([key.split('_')[1] for key in models.keys() if '_' in key]))
+                    "categories_trained": sorted(set(
+                        key[len(user_id) + 1:] if key.startswith(f"{user_id}_") else key for key in models
+                    ))
                 }
                 
-                metadata_path = os.path.join(self.metadata_dir, f"{user_id}_metadata.json")
+                metadata_path = self._user_path(self.metadata_dir, user_id, "_metadata.json")
                 with open(metadata_path, 'w') as f:
                     json.dump(metadata_enhanced, f, indent=2)
             
             # Actualizar cache
-            self._update_cache(user_id, model_data)
+            self._update_cache(user_id, model_data, os.path.getmtime(model_path))
             
-            logging.info(f"Modelo guardado exitosamente para usuario {user_id}")
+            logging.debug(f"Modelo guardado exitosamente para usuario {user_id}")
             return True
             
         except Exception as e:
@@ -84,18 +124,21 @@ class ModelStorage:
         Carga los modelos y scalers de un usuario específico
         """
         try:
-            # Verificar cache primero
-            if user_id in self.model_cache:
-                logging.info(f"Modelo cargado desde cache para {user_id}")
-                return self.model_cache[user_id]
-            
-            # Cargar desde archivo
-            model_path = os.path.join(self.models_dir, f"{user_id}_model.pkl")
+            model_path = self._user_path(self.models_dir, user_id, "_model.pkl")
             
             if not os.path.exists(model_path):
-                logging.warning(f"No se encontró modelo para usuario {user_id}")
+                # Sin modelo guardado (por ejemplo, eliminado desde otro proceso)
+                self.model_cache.pop(user_id, None)
+                self.cache_mtimes.pop(user_id, None)
                 return None
             
+            # Verificar cache primero (vigente si el archivo no cambió desde que se leyó)
+            mtime = os.path.getmtime(model_path)
+            if user_id in self.model_cache and self.cache_mtimes.get(user_id) == mtime:
+                logging.debug(f"Modelo cargado desde cache para {user_id}")
+                return self.model_cache[user_id]
+            
+            # Cargar desde archivo
             model_data = joblib.load(model_path)
             
             # Validar estructura del modelo
@@ -104,9 +147,9 @@ class ModelStorage:
                 return None
             
             # Actualizar cache
-            self._update_cache(user_id, model_data)
+            self._update_cache(user_id, model_data, mtime)
             
-            logging.info(f"Modelo cargado exitosamente para usuario {user_id}")
+            logging.debug(f"Modelo cargado exitosamente para usuario {user_id}")
             return model_data
             
         except Exception as e:
@@ -118,7 +161,7 @@ class ModelStorage:
         Obtiene la metadata de los modelos de un usuario
         """
         try:
-            metadata_path = os.path.join(self.metadata_dir, f"{user_id}_metadata.json")
+            metadata_path = self._user_path(self.metadata_dir, user_id, "_metadata.json")
             
             if not os.path.exists(metadata_path):
                 return None
@@ -132,17 +175,18 @@ class ModelStorage:
             logging.error(f"Error cargando metadata para {user_id}: {e}")
             return None
     
-    def delete_user_models(self, user_id: str) -> bool:
+    def delete_user_models(self, user_id: str, backup: bool = True) -> bool:
         """
         Elimina todos los modelos y metadata de un usuario
         """
         try:
             # Crear backup antes de eliminar
-            self._backup_existing_model(user_id)
+            if backup:
+                self._backup_existing_model(user_id)
             
             # Eliminar archivos
-            model_path = os.path.join(self.models_dir, f"{user_id}_model.pkl")
-            metadata_path = os.path.join(self.metadata_dir, f"{user_id}_metadata.json")
+            model_path = self._user_path(self.models_dir, user_id, "_model.pkl")
+            metadata_path = self._user_path(self.metadata_dir, user_id, "_metadata.json")
             
             files_deleted = 0
             
@@ -155,10 +199,10 @@ class ModelStorage:
                 files_deleted += 1
             
             # Remover del cache
-            if user_id in self.model_cache:
-                del self.model_cache[user_id]
+            self.model_cache.pop(user_id, None)
+            self.cache_mtimes.pop(user_id, None)
             
-            logging.info(f"Eliminados {files_deleted} archivos para usuario {user_id}")
+            logging.debug(f"Eliminados {files_deleted} archivos para usuario {user_id}")
             return files_deleted > 0
             
         except Exception as e:
@@ -174,7 +218,7 @@ class ModelStorage:
             
             for filename in os.listdir(self.models_dir):
                 if filename.endswith('_model.pkl'):
-                    user_id = filename.replace('_model.pkl', '')
+                    user_id = self._stored_user_id(filename)
                     
                     # Obtener información básica del archivo
                     model_path = os.path.join(self.models_dir, filename)
@@ -213,7 +257,7 @@ class ModelStorage:
                     file_modified = datetime.fromtimestamp(os.path.getmtime(model_path))
                     
                     if file_modified < cutoff_date:
-                        user_id = filename.replace('_model.pkl', '')
+                        user_id = self._stored_user_id(filename)
                         
                         # Crear backup antes de eliminar
                         self._backup_existing_model(user_id)
@@ -262,18 +306,18 @@ class ModelStorage:
         Crea backup del modelo existente antes de sobrescribir
         """
         try:
-            model_path = os.path.join(self.models_dir, f"{user_id}_model.pkl")
+            model_path = self._user_path(self.models_dir, user_id, "_model.pkl")
             
             if os.path.exists(model_path):
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                backup_filename = f"{user_id}_model_backup_{timestamp}.pkl"
-                backup_path = os.path.join(self.backups_dir, backup_filename)
+                backup_path = self._user_path(self.backups_dir, user_id, f"_model_backup_{timestamp}.pkl")
+                backup_filename = os.path.basename(backup_path)
                 
                 # Copiar archivo
                 import shutil
                 shutil.copy2(model_path, backup_path)
                 
-                logging.info(f"Backup creado: {backup_filename}")
+                logging.debug(f"Backup creado: {backup_filename}")
                 
                 # Limpiar backups antiguos (mantener solo los últimos 5)
                 self._cleanup_old_backups(user_id)
@@ -288,8 +332,9 @@ class ModelStorage:
         try:
             # Listar backups del usuario
             user_backups = []
+            prefix = os.path.basename(self._user_path(self.backups_dir, user_id, "_model_backup_"))
             for filename in os.listdir(self.backups_dir):
-                if filename.startswith(f"{user_id}_model_backup_"):
+                if filename.startswith(prefix):
                     backup_path = os.path.join(self.backups_dir, filename)
                     modified_time = os.path.getmtime(backup_path)
                     user_backups.append((filename, modified_time))
@@ -301,7 +346,7 @@ class ModelStorage:
             for filename, _ in user_backups[keep_count:]:
                 backup_path = os.path.join(self.backups_dir, filename)
                 os.remove(backup_path)
-                logging.info(f"Backup antiguo eliminado: {filename}")
+                logging.debug(f"Backup antiguo eliminado: {filename}")
                 
         except Exception as e:
             logging.error(f"Error limpiando backups para {user_id}: {e}")
@@ -333,20 +378,22 @@ class ModelStorage:
             logging.error(f"Error validando estructura del modelo: {e}")
             return False
     
-    def _update_cache(self, user_id: str, model_data: Dict[str, Any]):
+    def _update_cache(self, user_id: str, model_data: Dict[str, Any], mtime: Optional[float] = None):
         """
         Actualiza el cache de modelos en memoria
         """
         try:
             # Si el cache está lleno, eliminar el modelo menos usado (FIFO)
-            if len(self.model_cache) >= self.cache_limit:
+            if user_id not in self.model_cache and len(self.model_cache) >= self.cache_limit:
                 oldest_user = next(iter(self.model_cache))
-                del self.model_cache[oldest_user]
-                logging.info(f"Modelo eliminado del cache: {oldest_user}")
+                self.model_cache.pop(oldest_user, None)
+                self.cache_mtimes.pop(oldest_user, None)
+                logging.debug(f"Modelo eliminado del cache: {oldest_user}")
             
             # Agregar al cache
             self.model_cache[user_id] = model_data
-            logging.info(f"Modelo agregado al cache: {user_id}")
+            self.cache_mtimes[user_id] = mtime
+            logging.debug(f"Modelo agregado al cache: {user_id}")
             
         except Exception as e:
             logging.error(f"Error actualizando cache: {e}")
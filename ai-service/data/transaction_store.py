@@ -0,0 +1,319 @@
+# data/transaction_store.py
+
+import json
+import logging
+import threading
+import uuid
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import (
+    Column, DateTime, Float, Index, Integer, MetaData, String, Table, Text,
+    create_engine, delete, event, func, inspect, select, text, update,
+)
+from sqlalchemy.exc import DBAPIError, IntegrityError
+
+if TYPE_CHECKING:  # pandas solo se carga al leer el historial (en los workers)
+    import pandas as pd
+
+metadata = MetaData()
+
+# Historial columnar de transacciones por usuario. 'seq' conserva el orden de
+# llegada, que es el orden en el que los motores recibían la lista JSON.
+transactions_table = Table(
+    "transactions", metadata,
+    Column("seq", Integer, primary_key=True, autoincrement=True),
+    Column("user_id", String(128), nullable=False),
+    Column("transaction_id", String(128), nullable=False),
+    Column("amount", Float, nullable=False),
+    Column("category", String(128)),
+    Column("description", Text),
+    Column("type", String(64), nullable=False),
+    Column("date", DateTime, nullable=False),
+    Column("updated_at", DateTime, nullable=False),
+    Index("ix_transactions_user_transaction", "user_id", "transaction_id", unique=True),
+)
+
+# Versión del historial (sube con cada delta y con cada borrado) y
+# budgets/deudas vigentes. Un historial eliminado queda como lápida
+# (deleted_at) para que su versión nunca se repita: los caches de respuestas
+# y de cubos usan (usuario, versión) como clave
+histories_table = Table(
+    "user_histories", metadata,
+    Column("user_id", String(128), primary_key=True),
+    Column("version", Integer, nullable=False, default=0),
+    Column("budgets", Text),
+    Column("debts", Text),
+    Column("updated_at", DateTime, nullable=False),
+    Column("deleted_at", DateTime),
+)
+
+
+class TransactionStore:
+    """
+    Almacén local del historial de transacciones de cada usuario.
+
+    Por defecto usa SQLite como sustituto de Postgres; cualquier URL de
+    SQLAlchemy (por ejemplo postgresql+psycopg2://...) funciona igual.
+    Los clientes envían solo los cambios (altas, modificaciones por id y bajas)
+    y los endpoints de análisis leen el historial ya parseado.
+    """
+
+    def __init__(self, url: str = "sqlite:///data/transaction_store.db",
+                 parse_date: Optional[Callable[[str], datetime]] = None):
+        self.url = url
+        self.parse_date = parse_date
+        self._engine = None
+        self._engine_lock = threading.Lock()
+
+    @property
+    def engine(self):
+        """Crea la conexión y las tablas la primera vez que se usan"""
+        if self._engine is None:
+            with self._engine_lock:
+                if self._engine is None:
+                    connect_args = {"timeout": 30} if self.url.startswith("sqlite") else {}
+                    engine = create_engine(self.url, connect_args=connect_args, future=True)
+
+                    if self.url.startswith("sqlite"):
+                        @event.listens_for(engine, "connect")
+                        def _sqlite_pragmas(dbapi_connection, _):
+                            # WAL permite leer mientras otro worker escribe
+                            cursor = dbapi_connection.cursor()
+                            cursor.execute("PRAGMA journal_mode=WAL")
+                            cursor.close()
+
+                    self._create_schema(engine)
+                    self._engine = engine
+        return self._engine
+
+    def _create_schema(self, engine, attempts: int = 3):
+        """
+        Crea las tablas y columnas que falten. Los workers arrancan a la vez: si
+        otro crea una tabla o columna entre la comprobación y el CREATE/ALTER, la
+        sentencia falla y se repite, y la comprobación ya la encuentra
+        """
+        for attempt in range(attempts):
+            try:
+                metadata.create_all(engine)
+                self._migrate(engine)
+                return
+            except DBAPIError as e:
+                if attempt == attempts - 1:
+                    raise
+                logging.debug(f"Esquema creado por otro proceso, se comprueba de nuevo: {e}")
+
+    def _migrate(self, engine):
+        """Agrega las columnas nuevas a una base creada por una versión anterior"""
+        columns = {column["name"] for column in inspect(engine).get_columns("user_histories")}
+        if "deleted_at" not in columns:
+            with engine.begin() as conn:
+                conn.execute(text("ALTER TABLE user_histories ADD COLUMN deleted_at TIMESTAMP"))
+
+    def apply_delta(self, user_id: str, transactions: List[Any],
+                    deleted_ids: Optional[List[str]] = None,
+                    budgets: Optional[List[Dict[str, Any]]] = None,
+                    debts: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """
+        Aplica un delta al historial del usuario: inserta o reemplaza por id,
+        elimina los ids indicados y, si vienen, reemplaza budgets y deudas
+        """
+        try:
+            now = datetime.now()
+            inserted = updated = deleted = 0
+
+            with self.engine.begin() as conn:
+                # La versión sube antes que nada: el UPDATE bloquea la fila del
+                # usuario hasta el commit, así que los deltas concurrentes del
+                # mismo usuario se aplican uno detrás de otro y cada uno recibe
+                # una versión distinta
+                version = self._bump_version(conn, user_id, now, budgets, debts)
+
+                if deleted_ids:
+                    result = conn.execute(
+                        delete(transactions_table)
+                        .where(transactions_table.c.user_id == user_id)
+                        .where(transactions_table.c.transaction_id.in_(deleted_ids))
+                    )
+                    deleted = result.rowcount or 0
+
+                ids = [trans.id for trans in transactions if getattr(trans, "id", None)]
+                existing = set()
+                if ids:
+                    existing = set(conn.execute(
+                        select(transactions_table.c.transaction_id)
+                        .where(transactions_table.c.user_id == user_id)
+                        .where(transactions_table.c.transaction_id.in_(ids))
+                    ).scalars())
+
+                new_rows: Dict[str, Dict[str, Any]] = {}
+                for trans in transactions:
+                    row = self._transaction_row(trans, now)
+                    transaction_id = getattr(trans, "id", None) or uuid.uuid4().hex
+
+                    if transaction_id in existing:
+                        conn.execute(
+                            update(transactions_table)
+                            .where(transactions_table.c.user_id == user_id)
+                            .where(transactions_table.c.transaction_id == transaction_id)
+                            .values(**row)
+                        )
+                        updated += 1
+                    else:
+                        # Un id repetido dentro del mismo delta se queda con la última versión
+                        row.update(user_id=user_id, transaction_id=transaction_id)
+                        new_rows[transaction_id] = row
+
+                if new_rows:
+                    inserted, replaced = self._insert_rows(conn, user_id, new_rows)
+                    updated += replaced
+
+                total = conn.execute(
+                    select(func.count()).select_from(transactions_table)
+                    .where(transactions_table.c.user_id == user_id)
+                ).scalar_one()
+
+            return {
+                "user_id": user_id,
+                "inserted": inserted,
+                "updated": updated,
+                "deleted": deleted,
+                "total_transactions": total,
+                "version": version
+            }
+
+        except Exception as e:
+            logging.error(f"Error aplicando delta de transacciones para {user_id}: {e}")
+            raise
+
+    def load_transactions(self, user_id: str) -> "pd.DataFrame":
+        """Devuelve el historial del usuario en columnas (amount, category, description, type, date)"""
+        import pandas as pd
+
+        query = (
+            select(
+                transactions_table.c.amount,
+                transactions_table.c.category,
+                transactions_table.c.description,
+                transactions_table.c.type,
+                transactions_table.c.date,
+            )
+            .where(transactions_table.c.user_id == user_id)
+            .order_by(transactions_table.c.seq)
+        )
+        with self.engine.connect() as conn:
+            return pd.read_sql(query, conn, parse_dates=["date"])
+
+    def load_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Versión del historial y budgets/deudas guardados, o None si el usuario no existe"""
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                select(histories_table).where(histories_table.c.user_id == user_id)
+            ).mappings().first()
+
+        if row is None or row["deleted_at"] is not None:
+            return None
+
+        return {
+            "user_id": user_id,
+            "version": row["version"],
+            "budgets": json.loads(row["budgets"]) if row["budgets"] else [],
+            "debts": json.loads(row["debts"]) if row["debts"] else [],
+            "updated_at": row["updated_at"].isoformat() if row["updated_at"] else None
+        }
+
+    def delete_user(self, user_id: str) -> bool:
+        """
+        Elimina el historial completo de un usuario. La fila de versión queda
+        como lápida (sin budgets ni deudas) con la versión incrementada, y el
+        siguiente delta sigue contando desde ella
+        """
+        now = datetime.now()
+        with self.engine.begin() as conn:
+            conn.execute(delete(transactions_table).where(transactions_table.c.user_id == user_id))
+            result = conn.execute(
+                update(histories_table)
+                .where(histories_table.c.user_id == user_id)
+                .where(histories_table.c.deleted_at.is_(None))
+                .values(version=histories_table.c.version + 1, budgets=None, debts=None,
+                        updated_at=now, deleted_at=now)
+            )
+        return (result.rowcount or 0) > 0
+
+    def _transaction_row(self, trans: Any, now: datetime) -> Dict[str, Any]:
+        """Normaliza la transacción al guardarla para no volver a parsearla en cada análisis"""
+        date = None
+        if trans.date:
+            date = self.parse_date(trans.date) if self.parse_date else datetime.fromisoformat(trans.date)
+
+        return {
+            "amount": float(trans.amount) if trans.amount else 0.0,
+            "category": trans.category,
+            "description": trans.description,
+            "type": trans.type,
+            # Sin fecha, la transacción queda registrada con la fecha de llegada
+            "date": date or now,
+            "updated_at": now,
+        }
+
+    def _insert_rows(self, conn, user_id: str, rows: Dict[str, Dict[str, Any]]) -> Tuple[int, int]:
+        """
+        Inserta las transacciones nuevas; devuelve (insertadas, reemplazadas).
+        Si el índice único rechaza alguna (otro delta la insertó después de
+        leer los ids existentes), esas se reemplazan y el resto se inserta
+        """
+        try:
+            with conn.begin_nested():
+                conn.execute(transactions_table.insert(), list(rows.values()))
+            return len(rows), 0
+        except IntegrityError:
+            existing = set(conn.execute(
+                select(transactions_table.c.transaction_id)
+                .where(transactions_table.c.user_id == user_id)
+                .where(transactions_table.c.transaction_id.in_(list(rows)))
+            ).scalars())
+            for transaction_id in existing:
+                row = {k: v for k, v in rows[transaction_id].items() if k not in ("user_id", "transaction_id")}
+                conn.execute(
+                    update(transactions_table)
+                    .where(transactions_table.c.user_id == user_id)
+                    .where(transactions_table.c.transaction_id == transaction_id)
+                    .values(**row)
+                )
+            remaining = [row for transaction_id, row in rows.items() if transaction_id not in existing]
+            if remaining:
+                conn.execute(transactions_table.insert(), remaining)
+            return len(remaining), len(existing)
+
+    def _bump_version(self, conn, user_id: str, now: datetime,
+                      budgets: Optional[List[Dict[str, Any]]],
+                      debts: Optional[List[Dict[str, Any]]]) -> int:
+        """
+        Incrementa la versión en la base (version = version + 1 ... RETURNING),
+        sin leerla antes: dos deltas concurrentes nunca obtienen la misma
+        """
+        # Un delta sobre una lápida recrea el historial con la versión siguiente
+        values: Dict[str, Any] = {"updated_at": now, "deleted_at": None}
+        if budgets is not None:
+            values["budgets"] = json.dumps(budgets)
+        if debts is not None:
+            values["debts"] = json.dumps(debts)
+
+        def increment() -> Optional[int]:
+            return conn.execute(
+                update(histories_table)
+                .where(histories_table.c.user_id == user_id)
+                .values(version=histories_table.c.version + 1, **values)
+                .returning(histories_table.c.version)
+            ).scalar()
+
+        version = increment()
+        if version is not None:
+            return version
+
+        try:
+            with conn.begin_nested():
+                conn.execute(histories_table.insert().values(user_id=user_id, version=1, **values))
+            return 1
+        except IntegrityError:
+            # Otro delta creó el historial a la vez: se continúa desde su versión
+            return increment()
@@ -1,18 +1,148 @@
 #ai-service/main
 
-from fastapi import FastAPI, HTTPException
+import time
+_import_started = time.perf_counter()
+
+import asyncio
+import importlib
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Optional
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
-from datetime import datetime, timedelta
-import pandas as pd
-import numpy as np
-from models.predictor import ExpensePredictor
-from models.anomaly_detector import AnomalyDetector
-from models.recommender import FinancialRecommender
-from utils.data_processor import DataProcessor
-
-app = FastAPI(title="FinWise AI Service", version="1.0.0")
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from datetime import datetime
+from config import settings
+from schemas import (
+    BatchFinancialData,
+    ColumnarFinancialData,
+    Transaction,
+    TransactionDelta,
+    Budget,
+    Debt,
+    ForecastRequest,
+    ForecastResponse,
+    UserFinancialData,
+    PredictionResponse,
+    AnomalyResponse,
+    RecommendationResponse,
+)
+from utils import columnar
+from utils import metrics
+from utils.errors import InsufficientDataError, HistoryNotFoundError
+from utils.lazy_import import DeferredModule
+from utils.sections import ANALYSIS_SECTIONS, STREAM_SECTIONS
+from utils import fast_json
+from utils.fast_json import FastJSONResponse
+from utils.executor import ModelExecutor, ExecutorSaturatedError
+from utils.response_cache import ResponseCache, payload_fingerprint
+from data.transaction_store import TransactionStore
+from utils.single_flight import SingleFlight
+from utils.admission import AdmissionController, AdmissionMiddleware
+from utils.jobs import Job, JobCapacityError, JobManager, CACHED
+from utils.deadline import Deadline, parse_deadline_ms
+from utils import deadline as stage_status
+
+NDJSON = "application/x-ndjson"
+
+# Capa de ejecución: el trabajo de pandas/scikit-learn sale del event loop
+model_executor = ModelExecutor(
+    mode=settings.executor_mode,
+    max_workers=settings.executor_workers,
+    queue_depth=settings.executor_queue_depth,
+    warm_up=settings.warmup_enabled,
+)
+
+# Cache de respuestas por contenido (None si está deshabilitado)
+response_cache = ResponseCache(
+    max_bytes=settings.cache_max_bytes,
+    ttl_seconds=settings.cache_ttl_seconds,
+    disk_dir=settings.cache_dir or None,
+    disk_max_bytes=settings.cache_disk_max_bytes,
+) if settings.cache_enabled else None
+
+# Los motores (pandas, NumPy, scikit-learn) se importan solo donde se ejecutan:
+# el proceso principal pasa al pool referencias diferidas a las funciones de
+# utils.pipeline y en modo "process" nunca lo importa. En modo "thread" o
+# "inline" el pool es el propio proceso y los motores se cargan aquí.
+pipeline = DeferredModule("utils.pipeline")
+
+# Versión del historial guardado, leída desde el proceso principal para la
+# clave de cache (sin pasar por el pool ni cargar los motores)
+history_store = TransactionStore(settings.transaction_store_url)
+
+# Admisión: cola acotada delante de las rutas de análisis
+admission = AdmissionController(
+    max_concurrency=settings.admission_concurrency,
+    max_queue=settings.admission_queue,
+    priority_slots=settings.admission_priority_slots,
+    queue_timeout=settings.admission_queue_timeout,
+)
+
+# Rutas que no pasan por la admisión (sondas y métricas) y rutas baratas con carril prioritario
+_ADMISSION_EXEMPT = {"/", "/health", "/ready", "/metrics", "/docs", "/redoc", "/openapi.json"}
+_PRIORITY_ROUTES = {"/financial-summary"}
+
+# Ejecuciones en curso compartidas entre solicitudes idénticas
+coalescer = SingleFlight()
+
+# Sección del análisis completo que corresponde a cada tarea individual
+_FULL_ANALYSIS_SECTIONS = {
+    "summary": "summary",
+    "prediction": "predictions",
+    "anomalies": "anomalies",
+    "recommendations": "recommendations",
+}
+
+# Trabajos asíncronos para análisis grandes
+jobs = JobManager(ttl_seconds=settings.jobs_ttl_seconds, max_jobs=settings.jobs_max)
+_jobs_running = asyncio.Semaphore(settings.jobs_concurrency)
+
+# Etapas de un trabajo y la sección del análisis completo que produce cada una
+JOB_STAGES = {
+    "parse": None,
+    "summarize": "summary",
+    "predict": "predictions",
+    "detect": "anomalies",
+    "recommend": "recommendations",
+}
+
+# Estado de /ready
+readiness: Dict[str, Any] = {"ready": False, "time_to_ready_seconds": None, "warm_up": None}
+
+async def _warm_up():
+    """Importa y calienta los motores fuera del arranque; /ready pasa al terminar"""
+    started = time.perf_counter()
+    try:
+        workers = await model_executor.warm_up()
+        readiness["warm_up"] = {"seconds": round(time.perf_counter() - started, 3), **workers}
+    except Exception as e:
+        logging.error(f"Error en el warm-up de los motores: {e}")
+        readiness["warm_up"] = {"error": str(e)}
+    _mark_ready()
+
+def _mark_ready():
+    readiness["ready"] = True
+    readiness["time_to_ready_seconds"] = round(time.perf_counter() - _import_started, 3)
+    logging.info(f"Servicio listo en {readiness['time_to_ready_seconds']} s (warm-up: {readiness['warm_up']})")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logging.info(f"Módulo principal importado en {time.perf_counter() - _import_started:.3f} s")
+    model_executor.start()
+    warm_up_task = None
+    if settings.warmup_enabled:
+        warm_up_task = asyncio.create_task(_warm_up())
+    else:
+        _mark_ready()
+    yield
+    if warm_up_task is not None:
+        warm_up_task.cancel()
+    jobs.cancel_all()
+    # Esperar a que los workers terminen sin bloquear el event loop
+    await asyncio.to_thread(model_executor.shutdown)
+
+app = FastAPI(title="FinWise AI Service", version="1.0.0", lifespan=lifespan)
 
 # Configurar CORS para permitir conexiones desde NestJS
 app.add_middleware(
@@ -23,184 +153,616 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Modelos de datos usando Pydantic
-class Transaction(BaseModel):
-    amount: float
-    category: str
-    description: Optional[str] = None
-    type: str  # "income", "expense", "saving", etc.
-    date: Optional[str] = None  # Si no se proporciona, usa fecha actual
-
-class Budget(BaseModel):
-    category: str
-    amountPlanned: float
-    periodStart: str
-    periodEnd: str
-
-class Debt(BaseModel):
-    type: str
-    amount: float
-    dueDate: Optional[str] = None
-    interestRate: Optional[float] = None
-    description: Optional[str] = None
-
-class UserFinancialData(BaseModel):
-    user_id: str
-    transactions: List[Transaction]
-    budgets: Optional[List[Budget]] = []
-    debts: Optional[List[Debt]] = []
-
-class PredictionResponse(BaseModel):
-    user_id: str
-    period: str
-    predicted_expenses: Dict[str, float]
-    total_predicted: float
-    confidence_score: float
-
-class AnomalyResponse(BaseModel):
-    user_id: str
-    anomalies: List[Dict[str, Any]]
-    risk_score: float
-
-class RecommendationResponse(BaseModel):
-    user_id: str
-    recommendations: List[Dict[str, Any]]
-    priority_score: float
-
-# Inicializar modelos de IA
-predictor = ExpensePredictor()
-anomaly_detector = AnomalyDetector()
-recommender = FinancialRecommender()
-data_processor = DataProcessor()
+# Cola acotada delante de las rutas de análisis
+app.add_middleware(
+    AdmissionMiddleware,
+    controller=admission,
+    exempt_paths=_ADMISSION_EXEMPT,
+    priority_paths=_PRIORITY_ROUTES,
+)
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Contador y latencia por ruta (plantilla de la ruta, no la URL concreta)"""
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        metrics.http_requests.inc(method=request.method, route=path, status=status)
+        metrics.http_latency.observe(time.perf_counter() - start, method=request.method, route=path)
+
+# Alias de compatibilidad: los motores viven en utils.pipeline y se resuelven
+# al usarlos (importando el pipeline en este proceso), no junto con este módulo
+_ENGINE_ALIASES = ("predictor", "anomaly_detector", "recommender", "data_processor")
+
+def __getattr__(name: str):
+    if name in _ENGINE_ALIASES:
+        return getattr(importlib.import_module("utils.pipeline"), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def _respond(result: Any) -> Any:
+    """
+    Salida de los motores como respuesta JSON directa, sin re-validarla contra el
+    response_model. Con AI_STRICT_RESPONSES se devuelve tal cual para que FastAPI
+    la valide y serialice (útil en pruebas).
+    """
+    if settings.strict_responses:
+        return result
+    return FastJSONResponse(result)
+
+def _service_busy(error: Exception) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(error), headers={"Retry-After": "1"})
+
+async def _run_analysis(error_prefix: str, task: Callable, *args: Any):
+    """Ejecuta una tarea del pipeline en el pool y traduce sus errores a HTTP"""
+    try:
+        return await model_executor.run(task, *args)
+    
+    except (InsufficientDataError, columnar.ColumnarFormatError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HistoryNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ExecutorSaturatedError as e:
+        raise _service_busy(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"{error_prefix}: {str(e)}")
+
+async def _run_cached(error_prefix: str, task: str, financial_data: UserFinancialData):
+    """
+    Igual que _run_analysis para una tarea de pipeline.TASKS, pero consultando
+    antes el cache de respuestas y compartiendo las ejecuciones en curso: las
+    solicitudes concurrentes con el mismo usuario y payload esperan un solo
+    cálculo. Con historial guardado, la versión del historial forma parte de la clave.
+    """
+    payload_key = await _payload_key(financial_data)
+    key = f"{task}:{payload_key}"
+    
+    if response_cache is not None:
+        cached = await _cache_call(response_cache.get, key)
+        if cached is not None:
+            return cached
+    
+    # Un análisis completo en curso con el mismo payload ya calcula esta sección
+    section = _FULL_ANALYSIS_SECTIONS.get(task)
+    if section and coalescer.in_flight(f"financial_analysis:{payload_key}"):
+        try:
+            full = await coalescer.join(f"financial_analysis:{payload_key}")
+            if full is not None and full["results"].get(section) is not None:
+                coalescer.coalesced += 1
+                metrics.coalesced_requests.inc(task=task)
+                return full["results"][section]
+        except HTTPException:
+            pass  # Se calcula por separado para devolver el error propio de la ruta
+    
+    if coalescer.in_flight(key):
+        metrics.coalesced_requests.inc(task=task)
+    return await coalescer.do(key, lambda: _compute(error_prefix, task, financial_data, key))
+
+async def _compute(error_prefix: str, task: str, financial_data: UserFinancialData, key: str):
+    if response_cache is None:
+        return await _run_analysis(error_prefix, pipeline.run_task, task, financial_data)
+    
+    result, valid_until = await _run_analysis(error_prefix, pipeline.run_task, task, financial_data, True)
+    await _cache_call(response_cache.put, key, result, valid_until, financial_data.user_id)
+    return result
+
+async def _history_version(user_id: str) -> Optional[int]:
+    """Versión del historial guardado del usuario, o None si no tiene"""
+    profile = await asyncio.to_thread(history_store.load_profile, user_id)
+    return profile["version"] if profile else None
+
+async def _payload_key(financial_data: UserFinancialData) -> str:
+    """Huella del payload (usuario incluido), común a todas las tareas"""
+    version = ""
+    if financial_data.transactions is None:
+        version = await _history_version(financial_data.user_id)
+    return payload_fingerprint(financial_data.user_id, financial_data.model_dump_json(), extra=f"v{version}")
+
+async def _cache_call(fn: Callable, *args: Any):
+    # Con nivel en disco, la E/S del cache sale del event loop
+    if response_cache.disk_dir:
+        return await asyncio.to_thread(fn, *args)
+    return fn(*args)
 
 @app.get("/")
 async def root():
     return {"message": "FinWise AI Service is running!", "version": "1.0.0"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Métricas en formato de exposición de Prometheus"""
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/ready")
+async def readiness_check():
+    """
+    Readiness: pasa solo cuando los motores están importados y calentados.
+    /health sigue respondiendo mientras tanto (liveness).
+    """
+    if not readiness["ready"]:
+        return JSONResponse(status_code=503, content={"status": "warming_up"}, headers={"Retry-After": "1"})
+    return {"status": "ready", **readiness}
+
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "timestamp": datetime.now().isoformat()}
+    return {
+        "status": "healthy",
+        "timestamp": datetime.now().isoformat(),
+        "executor": model_executor.stats(),
+        "cache": response_cache.stats() if response_cache else None,
+        "coalescing": coalescer.stats(),
+        "admission": admission.stats(),
+        "jobs": jobs.stats()
+    }
+
+@app.get("/models/registry")
+async def model_registry_stats():
+    """
+    Estadísticas del registro de modelos (entradas, bytes, aciertos,
+    desalojos). Con AI_EXECUTOR_MODE=process cada worker tiene su propio
+    registro: la respuesta corresponde al worker que atendió la solicitud (pid).
+    """
+    try:
+        return await model_executor.run(pipeline.model_registry_stats)
+    except ExecutorSaturatedError as e:
+        raise _service_busy(e)
 
 @app.post("/predict/weekly-expenses", response_model=PredictionResponse)
 async def predict_weekly_expenses(financial_data: UserFinancialData):
     """
     Predice los gastos de la próxima semana basado en el historial del usuario
     """
-    try:
-        # Procesar datos de entrada
-        processed_data = data_processor.process_transactions(financial_data.transactions)
-        
-        if len(processed_data) == 0:
-            raise HTTPException(status_code=400, detail="No hay suficientes datos para realizar predicciones")
-        
-        # Generar predicciones
-        predictions = predictor.predict_weekly_expenses(processed_data, financial_data.user_id)
-        
-        return PredictionResponse(
-            user_id=financial_data.user_id,
-            period="next_week",
-            predicted_expenses=predictions["by_category"],
-            total_predicted=predictions["total"],
-            confidence_score=predictions["confidence"]
-        )
-    
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error en predicción: {str(e)}")
+    # Procesar datos de entrada y generar predicciones en el pool
+    return _respond(await _run_cached("Error en predicción", "prediction", financial_data))
+
+@app.post("/predict/forecast", response_model=ForecastResponse)
+async def forecast_expenses(financial_data: ForecastRequest):
+    """
+    Proyecta los gastos por categoría para varios horizontes (mañana, próxima
+    semana, próximo mes y fin del presupuesto vigente) con un solo ajuste de
+    los modelos del usuario
+    """
+    return _respond(await _run_cached("Error en proyección", "forecast", financial_data))
 
 @app.post("/detect/anomalies", response_model=AnomalyResponse)
 async def detect_anomalies(financial_data: UserFinancialData):
     """
     Detecta gastos anómalos o patrones inusuales en las transacciones
     """
-    try:
-        processed_data = data_processor.process_transactions(financial_data.transactions)
-        
-        if len(processed_data) < 5:  # Necesitamos al menos 5 transacciones
-            return AnomalyResponse(
-                user_id=financial_data.user_id,
-                anomalies=[],
-                risk_score=0.0
-            )
-        
-        anomalies = anomaly_detector.detect_anomalies(processed_data, financial_data.user_id)
-        
-        return AnomalyResponse(
-            user_id=financial_data.user_id,
-            anomalies=anomalies["anomalies"],
-            risk_score=anomalies["risk_score"]
-        )
-    
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error en detección de anomalías: {str(e)}")
+    return _respond(await _run_cached("Error en detección de anomalías", "anomalies", financial_data))
 
 @app.post("/recommendations", response_model=RecommendationResponse)
 async def get_recommendations(financial_data: UserFinancialData):
     """
     Genera recomendaciones personalizadas de ahorro y gestión financiera
     """
+    return _respond(await _run_cached("Error generando recomendaciones", "recommendations", financial_data))
+
+@app.post("/financial-summary")
+async def financial_summary(financial_data: UserFinancialData):
+    """
+    Resumen financiero (totales, desglose por categoría y tendencia). Es la
+    ruta de análisis más barata y usa el carril prioritario de la admisión.
+    """
+    return _respond(await _run_cached("Error generando resumen", "summary", financial_data))
+
+@app.post("/financial-analysis")
+async def comprehensive_analysis(financial_data: UserFinancialData, request: Request, stream: bool = False,
+                                 deadline_ms: Optional[float] = None):
+    """
+    Análisis financiero completo que combina predicciones, anomalías y recomendaciones.
+    Con ``Accept: application/x-ndjson`` o ``?stream=true`` responde en NDJSON,
+    una línea por sección en cuanto termina.
+    
+    Con ``?deadline_ms=`` o el header ``X-Deadline-Ms`` el análisis respeta ese
+    plazo: las secciones pasan a modos más baratos o se omiten según el tiempo
+    restante y la respuesta informa cuáles se degradaron u omitieron.
+    """
+    deadline = _request_deadline(request, deadline_ms)
+    
+    if stream or NDJSON in request.headers.get("accept", ""):
+        return await _stream_financial_analysis(financial_data, deadline)
+    
+    if deadline is not None:
+        return _respond(await _run_with_deadline(financial_data, deadline))
+    
+    # Un solo parseo y un solo contexto compartido, ejecutados en el pool
+    return _respond(await _run_cached("Error en análisis completo", "financial_analysis", financial_data))
+
+def _request_deadline(request: Request, deadline_ms: Optional[float]) -> Optional[Deadline]:
+    """Plazo de la solicitud, descontando la espera en la cola de admisión"""
+    value = deadline_ms if deadline_ms is not None else request.headers.get("x-deadline-ms")
     try:
-        processed_transactions = data_processor.process_transactions(financial_data.transactions)
-        processed_budgets = data_processor.process_budgets(financial_data.budgets) if financial_data.budgets else []
-        processed_debts = data_processor.process_debts(financial_data.debts) if financial_data.debts else []
+        return parse_deadline_ms(value, elapsed=getattr(request.state, "queue_wait", 0.0))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="El plazo debe ser un número positivo de milisegundos")
+
+def _record_deadline(report: Dict[str, Any]):
+    for section, stage in report["stages"].items():
+        metrics.deadline_stages.inc(section=section, status=stage["status"])
+
+async def _run_with_deadline(financial_data: UserFinancialData, deadline: Deadline) -> Dict[str, Any]:
+    """
+    Análisis completo con plazo. Un resultado completo en cache se devuelve de
+    inmediato; si no, se calcula con el plazo y solo se guarda en el cache si
+    ninguna sección se degradó, omitió o falló.
+    """
+    key = f"financial_analysis:{await _payload_key(financial_data)}"
+    
+    if response_cache is not None:
+        cached = await _cache_call(response_cache.get, key)
+        if cached is not None:
+            report = deadline.report({section: {"status": stage_status.CACHED} for section in cached["results"]})
+            _record_deadline(report)
+            return {**cached, "deadline": report}
+    
+    result, valid_until = await _run_analysis(
+        "Error en análisis completo", pipeline.run_task, "financial_analysis", financial_data, True, deadline
+    )
+    _record_deadline(result["deadline"])
+    if response_cache is not None and result["deadline"]["complete"]:
+        full = {k: v for k, v in result.items() if k != "deadline"}
+        await _cache_call(response_cache.put, key, full, valid_until, financial_data.user_id)
+    return result
+
+async def _stream_financial_analysis(financial_data: UserFinancialData,
+                                     deadline: Optional[Deadline] = None) -> StreamingResponse:
+    """
+    Envía cada sección del análisis completo como una línea JSON en cuanto
+    está lista. El payload se parsea una sola vez y las secciones se ejecutan
+    en paralelo en el pool sobre ese contexto, enviadas de la más barata a la
+    más costosa, así el resumen y las recomendaciones llegan mientras la
+    detección de anomalías sigue en curso.
+    
+    Sin plazo usa la misma clave que /financial-analysis: se responde desde el
+    cache, se comparte un análisis en curso con el mismo payload y el resultado
+    queda en el cache. Con plazo solo se guarda si ninguna sección se degradó.
+    
+    Línea por sección: {"user_id", "section", "result"} (y "error" si falló).
+    Última línea: {"user_id", "section": "end", "analysis_date"}.
+    Con plazo, cada línea lleva además "stage" y la última el informe "deadline".
+    """
+    user_id = financial_data.user_id
+    key = f"financial_analysis:{await _payload_key(financial_data)}"
+    
+    cached = None
+    if response_cache is not None:
+        cached = await _cache_call(response_cache.get, key)
+    
+    if cached is None and not (deadline is None and coalescer.in_flight(key)):
+        # Los errores previos al stream todavía pueden responder con su código HTTP
+        if financial_data.transactions is None:
+            version = await _history_version(user_id)
+            if version is None:
+                raise HTTPException(status_code=404, detail=f"No hay historial guardado para el usuario {user_id}")
+        if model_executor.available() < len(STREAM_SECTIONS):
+            raise _service_busy(ExecutorSaturatedError("El servicio está procesando demasiadas solicitudes"))
+    
+    def line(payload: Dict[str, Any]) -> bytes:
+        return fast_json.dumps(payload) + b"\n"
+    
+    stages: Dict[str, Dict[str, Any]] = {}
+    
+    def section_line(section: str, result: Any, error: Optional[Exception] = None) -> bytes:
+        payload = {"user_id": user_id, "section": section, "result": result}
+        if error is not None:
+            payload["error"] = getattr(error, "detail", None) or str(error)
+            stages.setdefault(section, {"status": stage_status.FAILED, "error": payload["error"]})
+        if deadline is not None and section in stages:
+            payload["stage"] = stages[section]
+        return line(payload)
+    
+    def end(analysis_date: str) -> bytes:
+        payload = {"user_id": user_id, "section": "end", "analysis_date": analysis_date}
+        if deadline is not None:
+            payload["deadline"] = deadline.report(stages)
+            _record_deadline(payload["deadline"])
+        return line(payload)
+    
+    async def sections():
+        if cached is not None:
+            for section in STREAM_SECTIONS:
+                if deadline is not None:
+                    stages[section] = {"status": stage_status.CACHED}
+                yield section_line(section, cached["results"][section])
+            yield end(cached["analysis_date"])
+            return
         
-        recommendations = recommender.generate_recommendations(
-            processed_transactions, 
-            processed_budgets, 
-            processed_debts, 
-            financial_data.user_id
-        )
+        # Las secciones llegan por la cola a medida que terminan; el análisis
+        # completo (propio o uno en curso con la misma clave) cubre las que falten
+        finished: asyncio.Queue = asyncio.Queue()
+        
+        def on_section(section: str, result: Any, error: Optional[Exception]):
+            finished.put_nowait((section, result, error))
+        
+        if deadline is None:
+            flight = asyncio.ensure_future(
+                coalescer.do(key, lambda: _run_streamed_analysis(financial_data, key, on_section))
+            )
+        else:
+            flight = asyncio.ensure_future(_run_streamed_analysis(financial_data, key, on_section, deadline, stages))
         
-        return RecommendationResponse(
-            user_id=financial_data.user_id,
-            recommendations=recommendations["recommendations"],
-            priority_score=recommendations["priority_score"]
+        sent = set()
+        try:
+            while len(sent) < len(STREAM_SECTIONS):
+                if finished.empty():
+                    if flight.done():
+                        break
+                    getter = asyncio.ensure_future(finished.get())
+                    await asyncio.wait({getter, flight}, return_when=asyncio.FIRST_COMPLETED)
+                    if not getter.done():
+                        getter.cancel()
+                        continue
+                    section, result, error = getter.result()
+                else:
+                    section, result, error = finished.get_nowait()
+                sent.add(section)
+                yield section_line(section, result, error)
+            
+            full, failure = None, None
+            try:
+                full = await flight
+            except Exception as e:
+                failure = e
+            for section in STREAM_SECTIONS:
+                if section not in sent:
+                    yield section_line(section, full["results"][section] if full else None, failure)
+            yield end(full["analysis_date"] if full else datetime.now().isoformat())
+        finally:
+            # Si el cliente se desconecta solo se deja de esperar: el análisis
+            # compartido termina y queda en el cache para las demás solicitudes
+            flight.cancel()
+    
+    return StreamingResponse(sections(), media_type=NDJSON)
+
+async def _run_streamed_analysis(financial_data: UserFinancialData, key: str,
+                                 on_section: Callable[[str, Any, Optional[Exception]], None],
+                                 deadline: Optional[Deadline] = None,
+                                 stages: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """
+    Análisis completo por secciones: un solo parseo en el pool y después las
+    secciones en paralelo sobre ese contexto, avisando a ``on_section`` al
+    terminar cada una. Devuelve el mismo resultado que /financial-analysis y lo
+    guarda en el cache (con plazo, solo si ninguna sección se degradó).
+    """
+    user_id = financial_data.user_id
+    # En modo "process" el contexto vuelve serializado y se reenvía tal cual
+    context, valid_until = await _run_analysis(
+        "Error en análisis completo", pipeline.run_parse, financial_data, model_executor.mode == "process"
+    )
+    
+    async def run_section(section: str) -> Any:
+        try:
+            if deadline is None:
+                result = await _run_analysis(
+                    "Error en análisis completo", pipeline.run_context_section, section, context, user_id
+                )
+            else:
+                result, stages[section] = await _run_analysis(
+                    "Error en análisis completo", pipeline.run_context_stage, section, context, user_id, deadline
+                )
+        except Exception as e:
+            logging.error(f"Error en la sección {section} del análisis para {user_id}: {e}")
+            on_section(section, None, e)
+            raise
+        on_section(section, result, None)
+        return result
+    
+    outcomes = await asyncio.gather(*[run_section(section) for section in STREAM_SECTIONS], return_exceptions=True)
+    for outcome in outcomes:
+        if isinstance(outcome, BaseException):
+            raise outcome
+    
+    results = dict(zip(STREAM_SECTIONS, outcomes))
+    result = {
+        "user_id": user_id,
+        "analysis_date": datetime.now().isoformat(),
+        "results": {section: results[section] for section in ANALYSIS_SECTIONS}
+    }
+    complete = deadline is None or deadline.report(stages)["complete"]
+    if response_cache is not None and complete:
+        await _cache_call(response_cache.put, key, result, valid_until, user_id)
+    return result
+
+@app.post("/batch/financial-analysis")
+async def batch_financial_analysis(batch: BatchFinancialData):
+    """
+    Análisis financiero de varios usuarios en una sola llamada (resumen,
+    predicción estadística y recomendaciones), con operaciones agrupadas
+    """
+    if len(batch.users) > settings.batch_max_users:
+        raise HTTPException(
+            status_code=413,
+            detail=f"El lote admite como máximo {settings.batch_max_users} usuarios"
         )
     
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error generando recomendaciones: {str(e)}")
+    return _respond(await _run_analysis("Error en análisis en lote", pipeline.run_batch_analysis, batch))
 
-@app.post("/financial-analysis")
-async def comprehensive_analysis(financial_data: UserFinancialData):
+# Trabajos asíncronos: para historiales grandes el cliente recibe un id de
+# inmediato y consulta el estado y el resultado con GET /jobs/{job_id}.
+
+@app.post("/jobs/financial-analysis", status_code=202)
+async def submit_financial_analysis_job(financial_data: UserFinancialData):
     """
-    Análisis financiero completo que combina predicciones, anomalías y recomendaciones
+    Encola un análisis financiero completo y devuelve el id del trabajo. El
+    mismo payload enviado otra vez mientras el trabajo existe devuelve ese trabajo.
     """
+    if financial_data.transactions is None:
+        version = await _history_version(financial_data.user_id)
+        if version is None:
+            raise HTTPException(status_code=404, detail=f"No hay historial guardado para el usuario {financial_data.user_id}")
+    
+    payload_key = await _payload_key(financial_data)
     try:
-        results = {}
-        
-        # Predicciones si hay suficientes datos
-        try:
-            prediction_response = await predict_weekly_expenses(financial_data)
-            results["predictions"] = prediction_response
-        except:
-            results["predictions"] = None
+        job, created = jobs.submit(
+            f"financial_analysis:{payload_key}",
+            financial_data.user_id,
+            list(JOB_STAGES),
+            lambda job: _run_job(job, financial_data, payload_key),
+        )
+    except JobCapacityError as e:
+        raise _service_busy(e)
+    
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "created": created,
+        "status_url": f"/jobs/{job.id}"
+    }
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Estado de un trabajo: progreso por etapa (parse, summarize, predict, detect,
+    recommend) y, al terminar, el resultado con la forma de /financial-analysis
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Trabajo {job_id} no encontrado o expirado")
+    return _respond(job.to_dict(jobs.ttl))
+
+async def _run_job(job: Job, financial_data: UserFinancialData, payload_key: str) -> Dict[str, Any]:
+    """
+    Ejecuta el análisis por etapas en el pool: primero el parseo y después las
+    secciones en paralelo sobre el mismo contexto. El resultado queda también en
+    el cache de respuestas de /financial-analysis.
+    """
+    key = f"financial_analysis:{payload_key}"
+    if response_cache is not None:
+        cached = await _cache_call(response_cache.get, key)
+        if cached is not None:
+            for stage in JOB_STAGES:
+                job.finish_stage(stage, CACHED)
+            return cached
+    
+    async with _jobs_running:
+        job.start_stage("parse")
+        # En modo "process" el contexto vuelve serializado y se reenvía tal cual
+        context, valid_until = await _run_job_task(
+            pipeline.run_parse, financial_data, model_executor.mode == "process"
+        )
+        job.finish_stage("parse")
         
-        # Detección de anomalías
-        try:
-            anomaly_response = await detect_anomalies(financial_data)
-            results["anomalies"] = anomaly_response
-        except:
-            results["anomalies"] = None
+        async def run_stage(stage: str, section: str):
+            job.start_stage(stage)
+            result = await _run_job_task(pipeline.run_context_section, section, context, financial_data.user_id)
+            job.finish_stage(stage)
+            return section, result
         
-        # Recomendaciones
+        sections = dict(await asyncio.gather(*[
+            run_stage(stage, section) for stage, section in JOB_STAGES.items() if section
+        ]))
+    
+    result = {
+        "user_id": financial_data.user_id,
+        "analysis_date": datetime.now().isoformat(),
+        "results": {section: sections[section] for section in ANALYSIS_SECTIONS}
+    }
+    if response_cache is not None:
+        await _cache_call(response_cache.put, key, result, valid_until, financial_data.user_id)
+    return result
+
+async def _run_job_task(fn: Callable, *args: Any) -> Any:
+    # Los trabajos no tienen prisa: si el pool está lleno, esperan en lugar de fallar
+    while True:
         try:
-            recommendation_response = await get_recommendations(financial_data)
-            results["recommendations"] = recommendation_response
-        except:
-            results["recommendations"] = None
-        
-        # Análisis general
-        processed_data = data_processor.process_transactions(financial_data.transactions)
-        summary = data_processor.generate_financial_summary(processed_data)
-        results["summary"] = summary
-        
-        return {
-            "user_id": financial_data.user_id,
-            "analysis_date": datetime.now().isoformat(),
-            "results": results
-        }
+            return await model_executor.run(fn, *args)
+        except ExecutorSaturatedError:
+            await asyncio.sleep(0.5)
+
+# Historial guardado: el cliente envía solo los cambios y después analiza con
+# {"user_id": ...} sin transacciones.
+
+@app.post("/users/{user_id}/transactions")
+async def apply_transaction_delta(user_id: str, delta: TransactionDelta):
+    """
+    Agrega, reemplaza (por id) o elimina transacciones del historial guardado
+    """
+    try:
+        return await model_executor.run(pipeline.run_store_delta, user_id, delta)
     
+    except ExecutorSaturatedError as e:
+        raise _service_busy(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error actualizando historial: {str(e)}")
+
+@app.delete("/users/{user_id}/transactions")
+async def delete_transaction_history(user_id: str):
+    """
+    Elimina el historial guardado de un usuario
+    """
+    try:
+        deleted = await model_executor.run(pipeline.run_store_delete, user_id)
+    except ExecutorSaturatedError as e:
+        raise _service_busy(e)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error en análisis completo: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error eliminando historial: {str(e)}")
+    
+    if not deleted:
+        raise HTTPException(status_code=404, detail=f"No hay historial guardado para el usuario {user_id}")
+    
+    # La versión nueva ya deja fuera las entradas viejas; aquí además se liberan
+    if response_cache is not None:
+        await _cache_call(response_cache.invalidate, user_id)
+    return {"user_id": user_id, "deleted": True}
+
+# Ingesta columnar: las transacciones llegan como Arrow IPC o Parquet en el cuerpo.
+# user_id va en la query o en los metadatos del esquema; budgets y debts, como JSON
+# en los metadatos. Las respuestas son las mismas que en los endpoints JSON.
+
+async def _read_columnar_payload(request: Request, user_id: Optional[str]) -> ColumnarFinancialData:
+    try:
+        fmt = columnar.format_from_content_type(request.headers.get("content-type"))
+        data = await request.body()
+        metadata = columnar.schema_metadata(columnar.read_schema(data, fmt))
+    except columnar.UnsupportedFormatError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except columnar.ColumnarFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    user_id = user_id or metadata.get("user_id")
+    if not user_id:
+        raise HTTPException(status_code=400, detail="Falta user_id (query o metadatos del esquema)")
+    
+    try:
+        return ColumnarFinancialData(
+            user_id=user_id,
+            data=data,
+            format=fmt,
+            budgets=metadata.get("budgets") or [],
+            debts=metadata.get("debts") or []
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Metadatos inválidos: {e}")
+
+@app.post("/columnar/predict/weekly-expenses", response_model=PredictionResponse)
+async def predict_weekly_expenses_columnar(request: Request, user_id: Optional[str] = None):
+    """Predicción semanal con transacciones en formato columnar"""
+    payload = await _read_columnar_payload(request, user_id)
+    return _respond(await _run_analysis("Error en predicción", pipeline.run_prediction, payload))
+
+@app.post("/columnar/detect/anomalies", response_model=AnomalyResponse)
+async def detect_anomalies_columnar(request: Request, user_id: Optional[str] = None):
+    """Detección de anomalías con transacciones en formato columnar"""
+    payload = await _read_columnar_payload(request, user_id)
+    return _respond(await _run_analysis("Error en detección de anomalías", pipeline.run_anomaly_detection, payload))
+
+@app.post("/columnar/recommendations", response_model=RecommendationResponse)
+async def get_recommendations_columnar(request: Request, user_id: Optional[str] = None):
+    """Recomendaciones con transacciones en formato columnar"""
+    payload = await _read_columnar_payload(request, user_id)
+    return _respond(await _run_analysis("Error generando recomendaciones", pipeline.run_recommendations, payload))
+
+@app.post("/columnar/financial-analysis")
+async def comprehensive_analysis_columnar(request: Request, user_id: Optional[str] = None):
+    """Análisis financiero completo con transacciones en formato columnar"""
+    payload = await _read_columnar_payload(request, user_id)
+    return _respond(await _run_analysis("Error en análisis completo", pipeline.run_financial_analysis, payload))
 
 if __name__ == "__main__":
     import uvicorn
@@ -3,25 +3,36 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Union
 from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler
 import logging
+from utils.analysis_context import AnalysisContext
+from utils.array_context import ArrayAnalysisContext, TransactionArrays, series_mean, series_std
+from utils.metrics import timed_stage
 
 class AnomalyDetector:
-    def __init__(self):
-        self.models = {}
-        self.scalers = {}
+    # Sin estado: IsolationForest y su scaler se ajustan en cada análisis con
+    # los gastos de la solicitud, así que no hay modelos que guardar entre llamadas
     
-    def detect_anomalies(self, df: pd.DataFrame, user_id: str) -> Dict[str, Any]:
+    @timed_stage("anomaly_detector")
+    def detect_anomalies(self, data: Union[pd.DataFrame, AnalysisContext], user_id: str,
+                         statistical: bool = False) -> Dict[str, Any]:
         """
-        Detecta gastos anómalos y patrones inusuales en las transacciones
+        Detecta gastos anómalos y patrones inusuales en las transacciones.
+        Con statistical=True los montos se evalúan por Z-score en lugar de
+        IsolationForest (modo degradado por plazo).
         """
         try:
-            if df.empty:
+            context = AnalysisContext.ensure(data)
+            if context.empty:
                 return self._no_anomalies_response()
             
-            expense_df = df[df['type'] == 'expense'].copy()
+            # Payloads pequeños: los caminos estadísticos se calculan sobre arrays
+            if isinstance(context, ArrayAnalysisContext) and context.expense_count < 5:
+                return self._statistical_anomaly_detection_arrays(context.expense_arrays)
+            
+            expense_df = context.expenses
             
             if len(expense_df) < 5:
                 return self._statistical_anomaly_detection(expense_df)
@@ -29,20 +40,23 @@ class AnomalyDetector:
             # Detección de anomalías usando múltiples métodos
             anomalies = []
             
-            # 1. Anomalías por monto (usando IsolationForest)
-            amount_anomalies = self._detect_amount_anomalies(expense_df, user_id)
+            # 1. Anomalías por monto (usando IsolationForest, o Z-score en modo degradado)
+            if statistical:
+                amount_anomalies = self._zscore_amount_anomalies(context)
+            else:
+                amount_anomalies = self._detect_amount_anomalies(context, user_id)
             anomalies.extend(amount_anomalies)
             
             # 2. Anomalías por frecuencia de gastos
-            frequency_anomalies = self._detect_frequency_anomalies(expense_df)
+            frequency_anomalies = self._detect_frequency_anomalies(context)
             anomalies.extend(frequency_anomalies)
             
             # 3. Anomalías por patrones de categorías
-            category_anomalies = self._detect_category_anomalies(expense_df)
+            category_anomalies = self._detect_category_anomalies(context)
             anomalies.extend(category_anomalies)
             
             # 4. Anomalías por días de la semana
-            temporal_anomalies = self._detect_temporal_anomalies(expense_df)
+            temporal_anomalies = self._detect_temporal_anomalies(context)
             anomalies.extend(temporal_anomalies)
             
             # Calcular score de riesgo general
@@ -62,13 +76,16 @@ class AnomalyDetector:
             logging.error(f"Error detectando anomalías: {e}")
             return self._no_anomalies_response()
     
-    def _detect_amount_anomalies(self, expense_df: pd.DataFrame, user_id: str) -> List[Dict[str, Any]]:
+    @timed_stage("anomaly_amount")
+    def _detect_amount_anomalies(self, context: AnalysisContext, user_id: str) -> List[Dict[str, Any]]:
         """Detecta anomalías basadas en montos usando Isolation Forest"""
         try:
             anomalies = []
             
-            if len(expense_df) < 10:  # Para pocos datos, usar método estadístico
-                return self._statistical_amount_anomalies(expense_df)
+            if context.expense_count < 10:  # Para pocos datos, usar método estadístico
+                return self._zscore_amount_anomalies(context)
+            
+            expense_df = context.expenses
             
             # Preparar datos para Isolation Forest
             features = expense_df[['amount', 'day_of_week']].values
@@ -84,12 +101,14 @@ class AnomalyDetector:
             # Identificar anomalías
             anomaly_indices = np.where(predictions == -1)[0]
             
+            # Estadísticos globales, calculados una sola vez
+            avg_amount = context.expense_mean
+            std_amount = expense_df['amount'].std()
+            
             for idx in anomaly_indices:
                 transaction = expense_df.iloc[idx]
                 
                 # Calcular qué tan anómalo es
-                avg_amount = expense_df['amount'].mean()
-                std_amount = expense_df['amount'].std()
                 z_score = abs((transaction['amount'] - avg_amount) / std_amount) if std_amount > 0 else 0
                 
                 severity = "high" if z_score > 2.5 else "medium" if z_score > 1.5 else "low"
@@ -124,7 +143,7 @@ class AnomalyDetector:
                 return []
             
             # Detectar outliers (Z-score > 2)
-            z_scores = np.abs((expense_df['amount'] - mean_amount) / std_amount)
+            z_scores = np.abs((expense_df['amount'] - mean_amount) / std_amount).to_numpy()
             outlier_indices = np.where(z_scores > 2)[0]
             
             for idx in outlier_indices:
@@ -150,16 +169,54 @@ class AnomalyDetector:
             logging.error(f"Error en detección estadística: {e}")
             return []
     
-    def _detect_frequency_anomalies(self, expense_df: pd.DataFrame) -> List[Dict[str, Any]]:
+    def _zscore_amount_anomalies(self, context: AnalysisContext) -> List[Dict[str, Any]]:
+        """Anomalías por Z-score sobre los arrays del contexto si los tiene, si no sobre el frame"""
+        if isinstance(context, ArrayAnalysisContext):
+            return self._statistical_amount_anomalies_arrays(context.expense_arrays)
+        return self._statistical_amount_anomalies(context.expenses)
+    
+    def _statistical_amount_anomalies_arrays(self, expenses: TransactionArrays) -> List[Dict[str, Any]]:
+        """_statistical_amount_anomalies sobre los arrays de un payload pequeño"""
+        try:
+            anomalies = []
+            
+            mean_amount = series_mean(expenses.amount)
+            std_amount = series_std(expenses.amount)
+            
+            if std_amount == 0:
+                return []
+            
+            z_scores = np.abs((expenses.amount - mean_amount) / std_amount)
+            
+            for idx in np.where(z_scores > 2)[0]:
+                amount = expenses.amount[idx]
+                z_score = z_scores[idx]
+                
+                anomalies.append({
+                    "type": "statistical_outlier",
+                    "severity": "high" if z_score > 3 else "medium",
+                    "description": f"Gasto estadísticamente inusual de ${amount:.2f}",
+                    "amount": float(amount),
+                    "category": expenses.category[idx],
+                    "date": expenses.isoformat(idx),
+                    "z_score": float(z_score),
+                    "context": f"Desviación de {z_score:.1f} veces la norma"
+                })
+            
+            return anomalies
+            
+        except Exception as e:
+            logging.error(f"Error en detección estadística: {e}")
+            return []
+    
+    @timed_stage("anomaly_frequency")
+    def _detect_frequency_anomalies(self, context: AnalysisContext) -> List[Dict[str, Any]]:
         """Detecta anomalías en la frecuencia de gastos"""
         try:
             anomalies = []
             
-            # Analizar gastos por día
-            daily_spending = expense_df.groupby(expense_df['date'].dt.date).agg({
-                'amount': 'sum',
-                'category': 'count'
-            }).rename(columns={'category': 'transaction_count'})
+            # Analizar gastos por día (desde el cubo día × categoría)
+            daily_spending = context.expense_daily_stats
             
             if len(daily_spending) < 3:
                 return []
@@ -174,8 +231,6 @@ class AnomalyDetector:
                 ]
                 
                 for date, row in high_spending_days.iterrows():
-                    day_transactions = expense_df[expense_df['date'].dt.date == date]
-                    
                     anomalies.append({
                         "type": "high_frequency_spending",
                         "severity": "medium",
@@ -184,17 +239,17 @@ class AnomalyDetector:
                         "amount": float(row['amount']),
                         "transaction_count": int(row['transaction_count']),
                         "context": f"Promedio diario: ${mean_daily:.2f}",
-                        "categories": day_transactions['category'].unique().tolist()
+                        "categories": context.expense_day_categories(date)
                     })
             
             # Detectar patrones de gasto muy frecuentes
-            recent_week = expense_df[expense_df['days_ago'] <= 7]
-            if len(recent_week) > 10:  # Más de 10 transacciones en una semana
+            recent_week = context.recent_expense_count(7)
+            if recent_week > 10:  # Más de 10 transacciones en una semana
                 anomalies.append({
                     "type": "high_transaction_frequency",
                     "severity": "low",
-                    "description": f"Frecuencia alta de transacciones: {len(recent_week)} en 7 días",
-                    "transaction_count": len(recent_week),
+                    "description": f"Frecuencia alta de transacciones: {recent_week} en 7 días",
+                    "transaction_count": recent_week,
                     "context": "Considera revisar si todos los gastos son necesarios"
                 })
             
@@ -204,13 +259,14 @@ class AnomalyDetector:
             logging.error(f"Error detectando anomalías de frecuencia: {e}")
             return []
     
-    def _detect_category_anomalies(self, expense_df: pd.DataFrame) -> List[Dict[str, Any]]:
+    @timed_stage("anomaly_category")
+    def _detect_category_anomalies(self, context: AnalysisContext) -> List[Dict[str, Any]]:
         """Detecta anomalías en los patrones de categorías"""
         try:
             anomalies = []
             
             # Analizar distribución de gastos por categoría
-            category_spending = expense_df.groupby('category')['amount'].agg(['sum', 'count', 'mean'])
+            category_spending = context.expense_category_stats
             
             if len(category_spending) < 2:
                 return []
@@ -234,7 +290,7 @@ class AnomalyDetector:
                     })
                 
                 # Detectar categorías con gastos promedio muy altos
-                overall_mean = expense_df['amount'].mean()
+                overall_mean = context.expense_mean
                 if row['mean'] > overall_mean * 3:
                     anomalies.append({
                         "type": "high_average_category",
@@ -252,13 +308,15 @@ class AnomalyDetector:
             logging.error(f"Error detectando anomalías de categoría: {e}")
             return []
     
-    def _detect_temporal_anomalies(self, expense_df: pd.DataFrame) -> List[Dict[str, Any]]:
+    @timed_stage("anomaly_temporal")
+    def _detect_temporal_anomalies(self, context: AnalysisContext) -> List[Dict[str, Any]]:
         """Detecta anomalías en patrones temporales"""
         try:
             anomalies = []
+            expense_df = context.expenses
             
             # Analizar gastos por día de la semana
-            weekly_pattern = expense_df.groupby('day_of_week')['amount'].sum()
+            weekly_pattern = context.expense_weekday_stats['sum']
             
             if len(weekly_pattern) >= 3:
                 mean_daily = weekly_pattern.mean()
@@ -393,6 +451,39 @@ class AnomalyDetector:
             logging.error(f"Error en detección estadística simple: {e}")
             return self._no_anomalies_response()
     
+    def _statistical_anomaly_detection_arrays(self, expenses: TransactionArrays) -> Dict[str, Any]:
+        """_statistical_anomaly_detection sobre los arrays de un payload pequeño"""
+        try:
+            if not len(expenses):
+                return self._no_anomalies_response()
+            
+            anomalies = []
+            
+            # Buscar gastos que sean 3 veces el promedio
+            mean_amount = series_mean(expenses.amount)
+            
+            for idx in np.flatnonzero(expenses.amount > mean_amount * 3):
+                amount = expenses.amount[idx]
+                anomalies.append({
+                    "type": "high_expense",
+                    "severity": "medium",
+                    "description": f"Gasto elevado: ${amount:.2f} en {expenses.category[idx]}",
+                    "amount": float(amount),
+                    "category": expenses.category[idx],
+                    "context": f"Es {amount/mean_amount:.1f}x el promedio"
+                })
+            
+            return {
+                "anomalies": anomalies,
+                "risk_score": len(anomalies) * 2.0,  # Score simple
+                "total_anomalies": len(anomalies),
+                "analysis_date": datetime.now().isoformat()
+            }
+            
+        except Exception as e:
+            logging.error(f"Error en detección estadística simple: {e}")
+            return self._no_anomalies_response()
+    
     def _no_anomalies_response(self) -> Dict[str, Any]:
         """Respuesta cuando no hay anomalías detectadas"""
         return {
@@ -0,0 +1,244 @@
+#models/category_regression
+
+from datetime import datetime
+from typing import List, Optional
+
+import numpy as np
+
+NS_PER_DAY = 86_400 * 10**9
+
+# Umbral relativo del determinante de X'X (features escaladas) por debajo del
+# cual las dos features se tratan como colineales. lstsq de sklearn da en ese
+# caso la solución de norma mínima; con features enteras (día de la semana,
+# días desde el inicio) la colinealidad es exacta o está muy lejos del umbral
+RANK_TOLERANCE = 1e-9
+
+
+def _features(ns: np.ndarray, origin: np.ndarray) -> np.ndarray:
+    """Día de la semana (1970-01-01 fue jueves) y días completos desde el origen"""
+    return np.column_stack([
+        ((ns // NS_PER_DAY + 3) % 7).astype(np.float64),
+        ((ns - origin) // NS_PER_DAY).astype(np.float64),
+    ])
+
+
+class CategoryModel:
+    """
+    Estadísticos suficientes de la regresión de una categoría: número de
+    gastos, medias y co-momentos centrados de (día de la semana, días desde el
+    origen, monto), con la primera y la última fecha. Una transacción nueva se
+    incorpora en O(1) (actualización de Welford); solo una fecha anterior al
+    origen obliga a reajustar, porque cambia los días desde el inicio de todas.
+    """
+
+    def __init__(self, count: float, first: int, last: int, feature_mean: np.ndarray,
+                 amount_mean: float, feature_m2: np.ndarray, cross_m2: np.ndarray,
+                 amount_m2: float, version: Optional[str] = None):
+        self.count = count
+        self.first = first
+        self.last = last
+        self.feature_mean = feature_mean
+        self.amount_mean = amount_mean
+        # Σ x1², Σ x2², Σ x1·x2 y Σ xj·y, centrados
+        self.feature_m2 = feature_m2
+        self.cross_m2 = cross_m2
+        self.amount_m2 = amount_m2
+        # Versión del historial guardado que resume (None para payloads JSON)
+        self.version = version
+
+    @classmethod
+    def start(cls, date: datetime, amount: float, version: Optional[str] = None) -> "CategoryModel":
+        """Modelo de una categoría con su primera transacción"""
+        ns = int(np.datetime64(date, 'ns').astype(np.int64))
+        return cls(1.0, ns, ns, _features(np.array([ns]), ns)[0], float(amount),
+                   np.zeros(3), np.zeros(2), 0.0, version)
+
+    def update(self, date: datetime, amount: float) -> bool:
+        """
+        Incorpora una transacción. False (sin cambios) si la fecha es anterior
+        al origen: el modelo debe reajustarse con el historial completo
+        """
+        ns = int(np.datetime64(date, 'ns').astype(np.int64))
+        if ns < self.first:
+            return False
+
+        x = _features(np.array([ns]), self.first)[0]
+        self.count += 1
+        dx = x - self.feature_mean
+        self.feature_mean = self.feature_mean + dx / self.count
+        dy = amount - self.amount_mean
+        self.amount_mean += dy / self.count
+
+        # Co-momentos con las medias ya actualizadas
+        rx = x - self.feature_mean
+        ry = amount - self.amount_mean
+        self.feature_m2 = self.feature_m2 + np.array([dx[0] * rx[0], dx[1] * rx[1], dx[0] * rx[1]])
+        self.cross_m2 = self.cross_m2 + dx * ry
+        self.amount_m2 += dy * ry
+        self.last = max(self.last, ns)
+        return True
+
+
+class CategoryRegressions:
+    """
+    Regresión lineal monto ~ día de la semana + días desde la primera
+    transacción, ajustada para todas las categorías a la vez.
+
+    Reproduce StandardScaler + LinearRegression de cada categoría resolviendo
+    las ecuaciones normales 2×2 de cada grupo a partir de sus estadísticos
+    suficientes (sumas agrupadas con bincount o CategoryModel guardados), sin
+    bucles por categoría. Los coeficientes quedan en el espacio de las
+    features escaladas, igual que en sklearn, para que la solución de norma
+    mínima en los casos colineales sea la misma.
+    """
+
+    def __init__(self, count: np.ndarray, first: np.ndarray, last: np.ndarray,
+                 feature_mean: np.ndarray, amount_mean: np.ndarray, feature_m2: np.ndarray,
+                 cross_m2: np.ndarray, amount_m2: np.ndarray):
+        self.count = count
+        self.first = first
+        self.last = last
+        self.feature_mean = feature_mean
+        self.amount_mean = amount_mean
+        self.feature_m2 = feature_m2
+        self.cross_m2 = cross_m2
+        self.amount_m2 = amount_m2
+        self._solve()
+
+    @classmethod
+    def fit(cls, amounts: np.ndarray, dates: np.ndarray, groups: np.ndarray,
+            n_groups: int) -> "CategoryRegressions":
+        """
+        Ajusta un modelo por grupo. ``groups`` es el índice (0..n_groups-1) de
+        la categoría de cada fila y ``dates`` sus fechas (datetime64[ns])
+        """
+        y = amounts.astype(np.float64)
+        count = np.bincount(groups, minlength=n_groups).astype(np.float64)
+        safe_count = np.where(count > 0, count, 1)
+
+        def group_sum(values: np.ndarray) -> np.ndarray:
+            return np.bincount(groups, weights=values, minlength=n_groups)
+
+        # Primera y última fecha de cada grupo
+        ns = dates.astype('datetime64[ns]').astype(np.int64)
+        first = np.full(n_groups, np.iinfo(np.int64).max)
+        last = np.full(n_groups, np.iinfo(np.int64).min)
+        np.minimum.at(first, groups, ns)
+        np.maximum.at(last, groups, ns)
+        present = count > 0
+        first, last = np.where(present, first, 0), np.where(present, last, 0)
+
+        # Medias y co-momentos centrados (dos pasadas, como StandardScaler)
+        features = _features(ns, first[groups])
+        feature_mean = np.column_stack([group_sum(features[:, j]) for j in range(2)]) / safe_count[:, None]
+        amount_mean = group_sum(y) / safe_count
+        centered = features - feature_mean[groups]
+        y_centered = y - amount_mean[groups]
+
+        return cls(
+            count=count,
+            first=first,
+            last=last,
+            feature_mean=feature_mean,
+            amount_mean=amount_mean,
+            feature_m2=np.column_stack([
+                group_sum(centered[:, 0] ** 2),
+                group_sum(centered[:, 1] ** 2),
+                group_sum(centered[:, 0] * centered[:, 1]),
+            ]),
+            cross_m2=np.column_stack([group_sum(centered[:, j] * y_centered) for j in range(2)]),
+            amount_m2=group_sum(y_centered ** 2),
+        )
+
+    @classmethod
+    def from_models(cls, models: List[CategoryModel]) -> "CategoryRegressions":
+        """Resuelve de una vez los modelos guardados de varias categorías"""
+        return cls(
+            count=np.array([model.count for model in models], dtype=np.float64),
+            first=np.array([model.first for model in models], dtype=np.int64),
+            last=np.array([model.last for model in models], dtype=np.int64),
+            feature_mean=np.array([model.feature_mean for model in models], dtype=np.float64).reshape(-1, 2),
+            amount_mean=np.array([model.amount_mean for model in models], dtype=np.float64),
+            feature_m2=np.array([model.feature_m2 for model in models], dtype=np.float64).reshape(-1, 3),
+            cross_m2=np.array([model.cross_m2 for model in models], dtype=np.float64).reshape(-1, 2),
+            amount_m2=np.array([model.amount_m2 for model in models], dtype=np.float64),
+        )
+
+    def model(self, index: int, version: Optional[str] = None) -> CategoryModel:
+        """Estadísticos suficientes de un grupo, para guardarlos y actualizarlos"""
+        return CategoryModel(float(self.count[index]), int(self.first[index]), int(self.last[index]),
+                             self.feature_mean[index].copy(), float(self.amount_mean[index]),
+                             self.feature_m2[index].copy(), self.cross_m2[index].copy(),
+                             float(self.amount_m2[index]), version)
+
+    def _solve(self):
+        count = self.count
+        safe_count = np.where(count > 0, count, 1)
+
+        # StandardScaler: desviación poblacional; las features constantes
+        # quedan con escala 1
+        variance = self.feature_m2[:, :2] / safe_count[:, None]
+        eps = np.finfo(np.float64).eps
+        constant = variance <= count[:, None] * eps * variance + (count[:, None] * self.feature_mean * eps) ** 2
+        self.feature_scale = np.where(constant, 1.0, np.sqrt(variance))
+        s1, s2 = self.feature_scale[:, 0], self.feature_scale[:, 1]
+
+        # Ecuaciones normales con las features escaladas: G = Z'Z (2×2), b = Z'y
+        g11 = np.where(constant[:, 0], 0, self.feature_m2[:, 0] / (s1 * s1))
+        g22 = np.where(constant[:, 1], 0, self.feature_m2[:, 1] / (s2 * s2))
+        g12 = np.where(constant.any(axis=1), 0, self.feature_m2[:, 2] / (s1 * s2))
+        b1 = np.where(constant[:, 0], 0, self.cross_m2[:, 0] / s1)
+        b2 = np.where(constant[:, 1], 0, self.cross_m2[:, 1] / s2)
+
+        det = g11 * g22 - g12 * g12
+        full_rank = (g11 > 0) & (g22 > 0) & (det > RANK_TOLERANCE * g11 * g22)
+        trace = g11 + g22
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Rango completo: G⁻¹b. Rango 1: pseudo-inversa G / traza², la
+            # solución de norma mínima. Rango 0 (todo constante): coeficientes 0
+            safe_det = np.where(full_rank, det, 1)
+            safe_trace2 = np.where(trace > 0, trace * trace, 1)
+            coef = np.column_stack([
+                np.where(full_rank, (g22 * b1 - g12 * b2) / safe_det, (g11 * b1 + g12 * b2) / safe_trace2),
+                np.where(full_rank, (g11 * b2 - g12 * b1) / safe_det, (g12 * b1 + g22 * b2) / safe_trace2),
+            ])
+        coef[~full_rank & (trace <= 0)] = 0
+        self.coef = coef
+
+        # R² sobre los datos de entrenamiento: la suma de cuadrados explicada
+        # es coef·b. Con montos constantes (salvo el redondeo de la media) el
+        # modelo los predice exactamente: R² = 1, como r2_score cuando la
+        # varianza es exactamente 0
+        ss_tot = self.amount_m2
+        ss_res = np.maximum(ss_tot - (coef[:, 0] * b1 + coef[:, 1] * b2), 0)
+        constant_amount = ss_tot <= count * (count * eps * self.amount_mean) ** 2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.r2 = np.where(constant_amount, 1.0, 1 - ss_res / np.where(constant_amount, 1, ss_tot))
+
+    def __len__(self) -> int:
+        return len(self.count)
+
+    def forecast(self, days: int = 7) -> np.ndarray:
+        """
+        Montos predichos para cada uno de los ``days`` días siguientes a la
+        última transacción de cada grupo (forma grupos × días), acotados entre
+        0 y 3 veces el promedio histórico
+        """
+        steps = np.arange(1, days + 1)
+        last_day_of_week = (self.last // NS_PER_DAY + 3) % 7
+        span_days = (self.last - self.first) // NS_PER_DAY
+        future = np.stack([
+            (last_day_of_week[:, None] + steps) % 7,
+            span_days[:, None] + steps,
+        ], axis=-1).astype(np.float64)
+
+        z = (future - self.feature_mean[:, None, :]) / self.feature_scale[:, None, :]
+        predictions = self.amount_mean[:, None] + (z * self.coef[:, None, :]).sum(axis=-1)
+
+        predictions = np.maximum(predictions, 0)
+        return np.minimum(predictions, self.amount_mean[:, None] * 3)
+
+    def confidence(self) -> np.ndarray:
+        """Confianza de cada grupo: R² acotado entre 0.3 y 0.9"""
+        return np.clip(self.r2, 0.3, 0.9)
@@ -2,189 +2,442 @@
 
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
-from typing import Dict, Any
-from sklearn.linear_model import LinearRegression
-from sklearn.preprocessing import StandardScaler
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Set, Tuple, Union
 import logging
-import joblib
-import os
+import copy
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from data.model_storage import ModelStorage
+from models.category_regression import CategoryModel, CategoryRegressions
+from utils.analysis_context import AnalysisContext
+from utils.array_context import ArrayAnalysisContext, TransactionArrays, series_mean, series_std
+from utils.metrics import timed_stage
+from utils.model_registry import ModelKey, ModelRegistry
+
+# Días de cada horizonte de proyección con duración fija; "budget_period"
+# llega hasta el fin del presupuesto vigente (como mucho MAX_HORIZON_DAYS)
+HORIZON_DAYS = {"next_day": 1, "next_week": 7, "next_month": 30}
+MAX_HORIZON_DAYS = 366
+
 
 class ExpensePredictor:
-    def __init__(self):
-        self.models = {}  # Almacenar modelos por usuario
-        self.scalers = {}  # Almacenar scalers por usuario
-        self.model_dir = "data/model_storage"
-        self._ensure_model_dir()
-    
-    def _ensure_model_dir(self):
-        """Crea el directorio para almacenar modelos si no existe"""
-        if not os.path.exists(self.model_dir):
-            os.makedirs(self.model_dir)
+    def __init__(self, registry: Optional[ModelRegistry] = None, storage: Optional[ModelStorage] = None):
+        # Modelos y scalers por (usuario, categoría), en el registro acotado del proceso
+        registry = registry or ModelRegistry()
+        self.models = registry.view("predictor.models")
+        self.scalers = registry.view("predictor.scalers")
+        
+        # Persistencia de los modelos por usuario (sin storage solo viven en memoria).
+        # Se guardan en segundo plano, una escritura por usuario aunque se pidan varias
+        self.storage = storage
+        self._saver = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-save")
+        self._pending_saves: Set[str] = set()
+        self._save_lock = threading.Lock()
+        # Serializa escrituras y borrados: un guardado en curso no revive un modelo eliminado
+        self._storage_lock = threading.Lock()
     
-    def predict_weekly_expenses(self, df: pd.DataFrame, user_id: str) -> Dict[str, Any]:
+    @timed_stage("predictor")
+    def predict_weekly_expenses(self, data: Union[pd.DataFrame, AnalysisContext], user_id: str,
+                                statistical: bool = False) -> Dict[str, Any]:
         """
-        Predice los gastos de la próxima semana basado en patrones históricos
+        Predice los gastos de la próxima semana basado en patrones históricos.
+        Con statistical=True no se ajustan modelos (modo degradado por plazo).
         """
         try:
-            if df.empty:
-                return self._default_prediction()
-            
-            # Filtrar solo gastos
-            expense_df = df[df['type'] == 'expense'].copy()
-            
-            if len(expense_df) < 3:  # Necesitamos al menos 3 transacciones
-                return self._fallback_prediction(expense_df)
-            
-            # Preparar datos para predicción
-            predictions_by_category = {}
-            total_predicted = 0
-            confidence_scores = []
+            return self._predict_horizons(AnalysisContext.ensure(data), user_id, {"next_week": 7},
+                                          statistical)["next_week"]
             
-            # Predecir por categoría
-            categories = expense_df['category'].unique()
-            
-            for category in categories:
-                cat_data = expense_df[expense_df['category'] == category]
-                
-                if len(cat_data) >= 2:  # Al menos 2 transacciones por categoría
-                    category_prediction = self._predict_category_expense(cat_data, user_id, category)
-                    predictions_by_category[category] = category_prediction['amount']
-                    total_predicted += category_prediction['amount']
-                    confidence_scores.append(category_prediction['confidence'])
-                else:
-                    # Para categorías con pocas transacciones, usar promedio
-                    avg_amount = cat_data['amount'].mean()
-                    predictions_by_category[category] = float(avg_amount * 0.7)  # Factor conservador
-                    total_predicted += predictions_by_category[category]
-                    confidence_scores.append(0.3)  # Baja confianza
-            
-            # Calcular confianza general
-            overall_confidence = np.mean(confidence_scores) if confidence_scores else 0.3
+        except Exception as e:
+            logging.error(f"Error en predicción de gastos: {e}")
+            return self._default_prediction()
+    
+    @timed_stage("predictor_forecast")
+    def forecast_expenses(self, data: Union[pd.DataFrame, AnalysisContext], user_id: str,
+                          horizons: List[str]) -> Dict[str, Any]:
+        """
+        Proyecta los gastos por categoría para varios horizontes (HORIZON_DAYS
+        y "budget_period", hasta el fin del presupuesto vigente) con un único
+        ajuste por categoría. Cada horizonte tiene la forma de
+        predict_weekly_expenses, con montos proporcionales a sus días
+        ("next_week" coincide con la predicción semanal). Los horizontes sin
+        días (sin presupuesto vigente) quedan en "unavailable".
+        """
+        context = AnalysisContext.ensure(data)
+        horizon_days = {}
+        for horizon in dict.fromkeys(horizons):
+            days = self._horizon_days(context, horizon)
+            if days is not None:
+                horizon_days[horizon] = days
+        unavailable = [horizon for horizon in dict.fromkeys(horizons) if horizon not in horizon_days]
+        
+        try:
+            forecasts = self._predict_horizons(context, user_id, horizon_days) if horizon_days else {}
+        except Exception as e:
+            logging.error(f"Error en proyección de gastos: {e}")
+            forecasts = {horizon: self._default_prediction() for horizon in horizon_days}
+        
+        for horizon, days in horizon_days.items():
+            forecasts[horizon]["days"] = days
+        return {"forecasts": forecasts, "unavailable": unavailable}
+    
+    def _horizon_days(self, context: AnalysisContext, horizon: str) -> Optional[int]:
+        """Días de un horizonte; None si no aplica (sin presupuesto vigente)"""
+        if horizon in HORIZON_DAYS:
+            return HORIZON_DAYS[horizon]
+        if horizon != "budget_period" or not context.has_budgets or context.budgets_df.empty:
+            return None
+        
+        # Fin del último periodo de presupuesto vigente en la fecha de referencia
+        # (periodEnd es un día: el periodo sigue vigente durante todo ese día)
+        budgets = context.budgets_df
+        reference = context.reference_date
+        active = budgets[(budgets['period_start'] <= reference)
+                         & (budgets['period_end'] >= pd.Timestamp(reference.date()))]
+        if active.empty:
+            return None
+        days = (active['period_end'].max().date() - reference.date()).days
+        return int(min(max(days, 1), MAX_HORIZON_DAYS))
+    
+    def _predict_horizons(self, context: AnalysisContext, user_id: str, horizon_days: Dict[str, int],
+                          statistical: bool = False) -> Dict[str, Dict[str, Any]]:
+        """
+        Predicción de cada horizonte (días) desde un solo ajuste: el modelo
+        lineal de cada categoría se evalúa una vez sobre los días del horizonte
+        más largo y cada horizonte promedia sus primeros días. Los montos se
+        expresan en la escala de la predicción semanal, proporcionales a los
+        días del horizonte; la confianza es la misma para todos.
+        """
+        def scaled(prediction: Dict[str, Any], days: int) -> Dict[str, Any]:
+            by_category = {category: amount * (days / 7) for category, amount in prediction["by_category"].items()}
+            return {**prediction, "by_category": by_category, "total": sum(by_category.values())}
+        
+        if context.empty:
+            return {horizon: self._default_prediction() for horizon in horizon_days}
+        
+        amounts, dates, codes, categories = self._expense_columns(context)
+        
+        if len(amounts) < 3:  # Necesitamos al menos 3 transacciones
+            fallback = self._fallback_prediction(context)
+            return {horizon: scaled(fallback, days) for horizon, days in horizon_days.items()}
+        
+        # Filas de cada categoría (en orden de fecha) y categorías con datos
+        # suficientes para el modelo de ML
+        counts = np.bincount(codes, minlength=len(categories))
+        rows_by_category = np.split(np.argsort(codes, kind='stable'), np.cumsum(counts)[:-1])
+        use_ml = (counts >= 5) & (not statistical)
+        
+        ml_predictions = None
+        if use_ml.any():
+            ml_predictions = self._ml_predictions(user_id, context.history_version, amounts, dates,
+                                                  codes, categories, days=max(horizon_days.values()))
+        
+        # Montos de las categorías sin modelo (iguales para todos los horizontes)
+        base_predictions = {}
+        confidence_scores = []
+        
+        for code, category in enumerate(categories):
+            cat_amounts = amounts[rows_by_category[code]]
+            
+            if use_ml[code] and ml_predictions is not None:
+                confidence_scores.append(float(ml_predictions[1][code]))
+            elif len(cat_amounts) >= 2:  # Al menos 2 transacciones por categoría
+                category_prediction = self._statistical_prediction_arrays(cat_amounts)
+                base_predictions[category] = category_prediction['amount']
+                confidence_scores.append(category_prediction['confidence'])
+            else:
+                # Para categorías con pocas transacciones, usar promedio
+                base_predictions[category] = float(series_mean(cat_amounts) * 0.7)  # Factor conservador
+                confidence_scores.append(0.3)  # Baja confianza
+        
+        # Calcular confianza general
+        overall_confidence = np.mean(confidence_scores) if confidence_scores else 0.3
+        model_type = "ml_prediction" if len(amounts) > 10 and not statistical else "statistical_estimation"
+        
+        results = {}
+        for horizon, days in horizon_days.items():
+            predicted_amounts = ml_predictions[0][:, :days].mean(axis=1) if ml_predictions is not None else None
+            predictions_by_category = {
+                category: (float(predicted_amounts[code]) if category not in base_predictions
+                           else base_predictions[category]) * (days / 7)
+                for code, category in enumerate(categories)
+            }
             
             # Aplicar factor estacional y tendencias
-            adjusted_predictions = self._apply_seasonal_adjustment(
-                predictions_by_category, expense_df
-            )
+            adjusted_predictions = self._apply_seasonal_adjustment(predictions_by_category, context)
             
-            return {
+            results[horizon] = {
                 "by_category": adjusted_predictions,
                 "total": sum(adjusted_predictions.values()),
                 "confidence": float(overall_confidence),
-                "model_type": "ml_prediction" if len(expense_df) > 10 else "statistical_estimation"
+                "model_type": model_type
             }
+        
+        return results
+    
+    def _expense_columns(self, context: AnalysisContext) -> Tuple[np.ndarray, np.ndarray, np.ndarray, List[str]]:
+        """
+        Montos y fechas de los gastos ordenados por fecha, con el código de
+        categoría de cada fila y las categorías en orden de aparición (como
+        Series.unique()). Los payloads pequeños no construyen el frame.
+        """
+        if isinstance(context, ArrayAnalysisContext):
+            expenses = context.expense_arrays
+            index: Dict[str, int] = {}
+            codes = np.array([index.setdefault(category, len(index)) for category in expenses.category],
+                             dtype=np.int64)
+            return expenses.amount, expenses.date, codes, list(index)
+        
+        expense_df = context.expenses
+        codes, categories = pd.factorize(expense_df['category'])
+        amounts = expense_df['amount'].to_numpy()
+        dates = expense_df['date'].to_numpy()
+        
+        if not context.sorted_by_date:
+            order = np.argsort(dates, kind='stable')
+            amounts, dates, codes = amounts[order], dates[order], codes[order]
+        
+        return amounts, dates, codes.astype(np.int64), [str(category) for category in categories]
+    
+    @timed_stage("predictor_regression")
+    def _ml_predictions(self, user_id: str, version: Optional[str], amounts: np.ndarray, dates: np.ndarray,
+                        codes: np.ndarray, categories: List[str],
+                        days: int = 7) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Predicción con el modelo lineal de todas las categorías en una sola
+        pasada: montos de cada uno de los próximos ``days`` días (categorías ×
+        días) y confianza (R² acotado) por código de categoría. None si el
+        ajuste falla.
+        
+        Los modelos del usuario se identifican por la versión del historial
+        guardado o, para payloads JSON, por la huella de los gastos: si los
+        guardados corresponden a esos mismos datos no se ajusta nada; si no, se
+        ajustan y se guardan.
+        """
+        try:
+            version = version or self._training_fingerprint(amounts, dates, codes, categories)
+            regressions = self._stored_regressions(user_id, version, amounts, dates, codes, categories)
+            if regressions is None:
+                regressions = CategoryRegressions.fit(amounts, dates, codes, len(categories))
+                self._store_models(user_id, version, categories, regressions)
+            
+            return regressions.forecast(days), regressions.confidence()
             
         except Exception as e:
-            logging.error(f"Error en predicción de gastos: {e}")
-            return self._default_prediction()
+            logging.error(f"Error en predicción ML: {e}")
+            return None
     
-    def _predict_category_expense(self, cat_data: pd.DataFrame, user_id: str, category: str) -> Dict[str, Any]:
-        """Predice gastos para una categoría específica"""
+    def _model_key(self, user_id: str, category: str) -> ModelKey:
+        return (user_id, category)
+    
+    def _training_fingerprint(self, amounts: np.ndarray, dates: np.ndarray, codes: np.ndarray,
+                              categories: List[str]) -> str:
+        """Huella de las filas de entrenamiento (categoría, fecha y monto de cada gasto)"""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update("\x1f".join(categories).encode("utf-8"))
+        digest.update(np.ascontiguousarray(codes, dtype=np.int64).tobytes())
+        digest.update(np.ascontiguousarray(dates.astype('datetime64[ns]')).tobytes())
+        digest.update(np.ascontiguousarray(amounts, dtype=np.float64).tobytes())
+        return f"fp:{digest.hexdigest()}"
+    
+    def _stored_regressions(self, user_id: str, version: Optional[str], amounts: np.ndarray,
+                            dates: np.ndarray, codes: np.ndarray,
+                            categories: List[str]) -> Optional[CategoryRegressions]:
+        """Modelos guardados de todas las categorías, si coinciden con los gastos de esta versión"""
+        # Conteo, primera y última fecha de cada categoría en los datos actuales
+        ns = dates.astype('datetime64[ns]').astype(np.int64)
+        counts = np.bincount(codes, minlength=len(categories))
+        first = np.full(len(categories), np.iinfo(np.int64).max)
+        last = np.full(len(categories), np.iinfo(np.int64).min)
+        np.minimum.at(first, codes, ns)
+        np.maximum.at(last, codes, ns)
+        
+        def current_models() -> Optional[List[CategoryModel]]:
+            models = [self.models.get(self._model_key(user_id, category)) for category in categories]
+            for code, model in enumerate(models):
+                if not (isinstance(model, CategoryModel) and model.version == version
+                        and model.count == counts[code] and model.first == first[code]
+                        and model.last == last[code]):
+                    return None
+            return models
+        
+        models = current_models()
+        if models is None and self.storage is not None:
+            # Carga perezosa: otro proceso (o una ejecución anterior) pudo haberlos guardado
+            self.load_model(user_id)
+            models = current_models()
+        
+        return CategoryRegressions.from_models(models) if models is not None else None
+    
+    def _store_models(self, user_id: str, version: str, categories: List[str],
+                      regressions: CategoryRegressions):
+        # Reemplazan a los anteriores (categorías de otros datos incluidas)
+        self.models.discard(user_id)
+        for code, category in enumerate(categories):
+            self.models[self._model_key(user_id, category)] = regressions.model(code, version)
+        self.save_model_async(user_id)
+    
+    def update_models(self, user_id: str, expenses: TransactionArrays,
+                      previous_version: str, version: str) -> bool:
+        """
+        Incorpora gastos nuevos (solo altas) a los modelos del usuario que
+        resumen ``previous_version``, que pasan a resumir ``version`` sin
+        reajustar: O(1) por transacción. Si no hay modelos de esa versión, o
+        alguna fecha es anterior al origen de su categoría, los modelos se
+        descartan y la próxima predicción ajusta con el historial completo.
+        """
         try:
-            # Preparar features temporales
-            cat_data = cat_data.sort_values('date')
+            def current_models() -> Dict[str, CategoryModel]:
+                return {
+                    category: model for category, model in self.models.owned(user_id).items()
+                    if isinstance(model, CategoryModel) and model.version == previous_version
+                }
+            
+            models = current_models()
+            if not models and self.storage is not None:
+                self.load_model(user_id)
+                models = current_models()
+            if not models:
+                return False
+            
+            # Se actualizan copias: una predicción concurrente sigue viendo los anteriores
+            updated = {category: copy.copy(model) for category, model in models.items()}
+            for amount, category, date in zip(expenses.amount, expenses.category, expenses.date):
+                if category not in updated:
+                    updated[category] = CategoryModel.start(date, amount)
+                elif not updated[category].update(date, amount):
+                    # Fecha anterior al origen: cambian los días desde el inicio de todas las filas
+                    self.discard_models(user_id)
+                    return False
+            
+            for category, model in updated.items():
+                model.version = version
+                self.models[self._model_key(user_id, category)] = model
+            self.save_model_async(user_id)
+            return True
             
-            # Features: día de la semana, días desde la primera transacción
-            if len(cat_data) >= 5:  # Suficientes datos para ML
-                return self._ml_prediction(cat_data, user_id, category)
-            else:
-                return self._statistical_prediction(cat_data)
-                
         except Exception as e:
-            logging.error(f"Error prediciendo categoría {category}: {e}")
-            avg_amount = cat_data['amount'].mean()
-            return {"amount": float(avg_amount), "confidence": 0.2}
+            logging.error(f"Error actualizando modelos de {user_id}: {e}")
+            self.discard_models(user_id)
+            return False
+    
+    def discard_models(self, user_id: str):
+        """Olvida los modelos del usuario (en memoria y en disco)"""
+        self.models.discard(user_id)
+        self.scalers.discard(user_id)
+        if self.storage is not None:
+            with self._storage_lock:
+                self.storage.delete_user_models(user_id, backup=False)
     
-    def _ml_prediction(self, cat_data: pd.DataFrame, user_id: str, category: str) -> Dict[str, Any]:
-        """Predicción usando Machine Learning"""
+    @timed_stage("predictor_batch")
+    def predict_weekly_expenses_batch(self, expense_df: pd.DataFrame, group_key: str = 'user_key',
+                                      reference_date: Optional[datetime] = None) -> Dict[Any, Dict[str, Any]]:
+        """
+        Predicción estadística de la próxima semana para muchos usuarios a la vez.
+
+        Aplica las reglas de _statistical_prediction_arrays (tendencia sobre las
+        últimas 5 transacciones de cada categoría) y el ajuste por día de la semana con
+        operaciones agrupadas, sin bucles por usuario ni por categoría.
+        """
         try:
-            # Preparar features
-            cat_data = cat_data.copy()
-            cat_data['days_since_start'] = (cat_data['date'] - cat_data['date'].min()).dt.days
-            
-            # Features para el modelo
-            features = ['day_of_week', 'days_since_start']
-            X = cat_data[features].values
-            y = cat_data['amount'].values
-            
-            # Escalar features
-            scaler_key = f"{user_id}_{category}"
-            if scaler_key not in self.scalers:
-                self.scalers[scaler_key] = StandardScaler()
-                X_scaled = self.scalers[scaler_key].fit_transform(X)
-            else:
-                X_scaled = self.scalers[scaler_key].transform(X)
-            
-            # Entrenar modelo
-            model = LinearRegression()
-            model.fit(X_scaled, y)
-            
-            # Guardar modelo
-            self.models[scaler_key] = model
-            
-            # Predecir para la próxima semana (promedio de 7 días)
-            next_week_features = []
-            base_date = cat_data['date'].max() + timedelta(days=1)
-            
-            for i in range(7):
-                future_date = base_date + timedelta(days=i)
-                days_since_start = (future_date - cat_data['date'].min()).days
-                day_of_week = future_date.weekday()
-                next_week_features.append([day_of_week, days_since_start])
-            
-            X_future = np.array(next_week_features)
-            X_future_scaled = self.scalers[scaler_key].transform(X_future)
-            
-            # Realizar predicción
-            predictions = model.predict(X_future_scaled)
-            
-            # Filtrar predicciones negativas y aplicar límites razonables
-            predictions = np.maximum(predictions, 0)
-            avg_historical = cat_data['amount'].mean()
-            predictions = np.minimum(predictions, avg_historical * 3)  # Máximo 3x el promedio
-            
-            predicted_amount = np.mean(predictions)
-            
-            # Calcular confianza basada en R²
-            score = model.score(X_scaled, y)
-            confidence = max(0.3, min(0.9, score))  # Entre 0.3 y 0.9
+            if expense_df.empty:
+                return {}
+            
+            keys = [group_key, 'category']
+            df = expense_df.sort_values(keys + ['date'], kind='stable')
+            
+            # Estadísticos de cada categoría completa
+            full_stats = df.groupby(keys, observed=True)['amount'].agg(['count', 'mean'])
+            
+            # Últimas 5 transacciones de cada categoría, con su índice temporal 0..n-1
+            tail = df[df.groupby(keys, observed=True).cumcount(ascending=False) < 5][keys + ['amount']].copy()
+            tail['t'] = tail.groupby(keys, observed=True).cumcount()
+            tail['ty'] = tail['t'] * tail['amount']
+            tail_stats = tail.groupby(keys, observed=True).agg(
+                n=('amount', 'count'),
+                mean=('amount', 'mean'),
+                std=('amount', 'std'),
+                sum_ty=('ty', 'sum')
+            )
             
-            return {
-                "amount": float(predicted_amount),
-                "confidence": float(confidence)
-            }
+            # Pendiente de la regresión lineal simple (equivalente a np.polyfit grado 1)
+            n = tail_stats['n'].astype(float)
+            t_mean = (n - 1) / 2
+            sxx = n * (n * n - 1) / 12
+            slope = (tail_stats['sum_ty'] - n * t_mean * tail_stats['mean']) / sxx.where(sxx > 0)
+            
+            trend_amount = (tail_stats['mean'] + slope * 2).clip(lower=0)
+            variability = tail_stats['std'] / tail_stats['mean']
+            trend_confidence = (0.7 - variability).clip(lower=0.2).fillna(0.2)
+            
+            count = full_stats['count']
+            amount = np.select(
+                [count == 1, n < 3],
+                [full_stats['mean'] * 0.7, full_stats['mean']],
+                default=trend_amount
+            )
+            confidence = np.where(n < 3, 0.3, trend_confidence)
+            
+            categories = pd.DataFrame({'amount': amount, 'confidence': confidence}, index=full_stats.index)
+            
+            # Usuarios con menos de 3 gastos: promedio conservador por categoría
+            user_counts = count.groupby(level=0).sum()
+            fallback_users = user_counts.index[user_counts < 3]
+            is_fallback = categories.index.get_level_values(0).isin(fallback_users)
+            categories.loc[is_fallback, 'amount'] = full_stats.loc[is_fallback, 'mean'] * 0.8
+            
+            # Ajuste por día de la semana (mismo criterio que _apply_seasonal_adjustment)
+            current_day = (reference_date or datetime.now()).weekday()
+            overall_avg = df.groupby(group_key)['amount'].mean()
+            today = df[df['day_of_week'] == current_day]
+            day_avg = today.groupby(group_key)['amount'].mean().reindex(overall_avg.index)
+            day_factor = (day_avg / overall_avg.where(overall_avg > 0)).fillna(1.0)
+            adjustment = 1 + (day_factor - 1) * 0.3
+            adjustment[adjustment.index.isin(fallback_users)] = 1.0
+            
+            user_level = categories.index.get_level_values(0)
+            categories['amount'] = (categories['amount'] * adjustment.reindex(user_level).values).clip(lower=0)
+            
+            results = {}
+            for user, user_categories in categories.groupby(level=0, sort=False):
+                by_category = {
+                    cat: float(value)
+                    for cat, value in zip(user_categories.index.get_level_values(1), user_categories['amount'])
+                }
+                is_user_fallback = user in fallback_users
+                results[user] = {
+                    "by_category": by_category,
+                    "total": sum(by_category.values()),
+                    "confidence": 0.4 if is_user_fallback else float(user_categories['confidence'].mean()),
+                    "model_type": "fallback_estimation" if is_user_fallback else "statistical_estimation"
+                }
+            
+            return results
             
         except Exception as e:
-            logging.error(f"Error en predicción ML: {e}")
-            return self._statistical_prediction(cat_data)
+            logging.error(f"Error en predicción en lote: {e}")
+            return {}
     
-    def _statistical_prediction(self, cat_data: pd.DataFrame) -> Dict[str, Any]:
-        """Predicción estadística simple"""
+    def _statistical_prediction_arrays(self, amounts: np.ndarray) -> Dict[str, Any]:
+        """
+        Predicción estadística de una categoría (tendencia de sus últimas 5
+        transacciones) a partir de sus montos, ya ordenados por fecha
+        """
         try:
-            # Análisis de tendencia simple
-            recent_data = cat_data.tail(min(5, len(cat_data)))
+            recent = amounts[-min(5, len(amounts)):]
             
-            if len(recent_data) >= 3:
-                # Calcular tendencia
-                amounts = recent_data['amount'].values
-                time_indices = np.arange(len(amounts))
-                
-                # Regresión lineal simple
-                slope = np.polyfit(time_indices, amounts, 1)[0]
-                
-                # Predicción basada en tendencia
-                base_amount = recent_data['amount'].mean()
-                trend_adjustment = slope * 2  # Proyectar tendencia
+            if len(recent) >= 3:
+                slope = np.polyfit(np.arange(len(recent)), recent, 1)[0]
                 
-                predicted_amount = max(0, base_amount + trend_adjustment)
+                base_amount = series_mean(recent)
+                predicted_amount = max(0, base_amount + slope * 2)
                 
-                # Confianza basada en variabilidad
-                variability = recent_data['amount'].std() / recent_data['amount'].mean()
+                variability = series_std(recent) / series_mean(recent)
                 confidence = max(0.2, 0.7 - variability)
                 
             else:
-                # Muy pocos datos, usar promedio simple
-                predicted_amount = cat_data['amount'].mean()
+                predicted_amount = series_mean(amounts)
                 confidence = 0.3
             
             return {
@@ -194,10 +447,9 @@ class ExpensePredictor:
             
         except Exception as e:
             logging.error(f"Error en predicción estadística: {e}")
-            avg_amount = cat_data['amount'].mean()
-            return {"amount": float(avg_amount), "confidence": 0.2}
+            return {"amount": float(series_mean(amounts)), "confidence": 0.2}
     
-    def _apply_seasonal_adjustment(self, predictions: Dict[str, float], expense_df: pd.DataFrame) -> Dict[str, float]:
+    def _apply_seasonal_adjustment(self, predictions: Dict[str, float], context: AnalysisContext) -> Dict[str, float]:
         """Aplica ajustes estacionales y de tendencia"""
         try:
             adjusted = predictions.copy()
@@ -206,16 +458,16 @@ class ExpensePredictor:
             current_day = datetime.now().weekday()
             
             # Analizar patrones por día de la semana
-            if not expense_df.empty:
-                daily_avg = expense_df.groupby('day_of_week')['amount'].mean()
-                overall_avg = expense_df['amount'].mean()
+            # (sin gastos no hay promedios por día)
+            daily_avg = context.expense_weekday_means
+            overall_avg = context.expense_mean
+            
+            if current_day in daily_avg and overall_avg > 0:
+                day_factor = daily_avg[current_day] / overall_avg
                 
-                if current_day in daily_avg.index and overall_avg > 0:
-                    day_factor = daily_avg[current_day] / overall_avg
-                    
-                    # Aplicar factor suavizado
-                    for category in adjusted:
-                        adjusted[category] *= (1 + (day_factor - 1) * 0.3)  # Suavizar el efecto
+                # Aplicar factor suavizado
+                for category in adjusted:
+                    adjusted[category] *= (1 + (day_factor - 1) * 0.3)  # Suavizar el efecto
             
             # Asegurar valores positivos
             for category in adjusted:
@@ -227,13 +479,12 @@ class ExpensePredictor:
             logging.error(f"Error aplicando ajustes estacionales: {e}")
             return predictions
     
-    def _fallback_prediction(self, expense_df: pd.DataFrame) -> Dict[str, Any]:
+    def _fallback_prediction(self, context: AnalysisContext) -> Dict[str, Any]:
         """Predicción de respaldo para pocos datos"""
-        if expense_df.empty:
-            return self._default_prediction()
-        
         # Usar promedios simples por categoría
-        category_avgs = expense_df.groupby('category')['amount'].mean().to_dict()
+        category_avgs = context.expense_category_means
+        if not category_avgs:
+            return self._default_prediction()
         
         # Aplicar factor conservador
         predictions = {cat: float(avg * 0.8) for cat, avg in category_avgs.items()}
@@ -256,25 +507,54 @@ class ExpensePredictor:
     
     def save_model(self, user_id: str):
         """Guarda el modelo del usuario"""
+        if self.storage is None:
+            return
         try:
-            user_models = {k: v for k, v in self.models.items() if k.startswith(user_id)}
-            user_scalers = {k: v for k, v in self.scalers.items() if k.startswith(user_id)}
-            
-            if user_models:
-                model_path = os.path.join(self.model_dir, f"{user_id}_models.pkl")
-                joblib.dump({"models": user_models, "scalers": user_scalers}, model_path)
+            with self._storage_lock:
+                user_models = self.models.owned(user_id)
+                user_scalers = self.scalers.owned(user_id)
+                
+                if user_models:
+                    versions = sorted({m.version for m in user_models.values() if isinstance(m, CategoryModel)})
+                    # Los modelos se reconstruyen desde el historial: sin backups
+                    self.storage.save_user_models(
+                        user_id, user_models, user_scalers,
+                        metadata={"model_type": "category_regression", "versions": versions},
+                        backup=False,
+                    )
                 
         except Exception as e:
             logging.error(f"Error guardando modelo para {user_id}: {e}")
     
+    def save_model_async(self, user_id: str):
+        """Guarda el modelo del usuario en segundo plano (fuera de la solicitud)"""
+        if self.storage is None:
+            return
+        with self._save_lock:
+            if user_id in self._pending_saves:
+                return
+            self._pending_saves.add(user_id)
+        self._saver.submit(self._background_save, user_id)
+    
+    def _background_save(self, user_id: str):
+        # Se guarda el estado más reciente, aunque haya cambiado desde que se pidió
+        with self._save_lock:
+            self._pending_saves.discard(user_id)
+        self.save_model(user_id)
+    
+    def wait_for_saves(self):
+        """Espera a que terminen los guardados en segundo plano pendientes"""
+        self._saver.submit(lambda: None).result()
+    
     def load_model(self, user_id: str):
         """Carga el modelo del usuario"""
         try:
-            model_path = os.path.join(self.model_dir, f"{user_id}_models.pkl")
-            if os.path.exists(model_path):
-                data = joblib.load(model_path)
-                self.models.update(data.get("models", {}))
-                self.scalers.update(data.get("scalers", {}))
+            data = self.storage.load_user_models(user_id) if self.storage is not None else None
+            if data:
+                for name, model in data.get("models", {}).items():
+                    self.models[self._model_key(user_id, name)] = model
+                for name, scaler in data.get("scalers", {}).items():
+                    self.scalers[self._model_key(user_id, name)] = scaler
                 
         except Exception as e:
-            logging.error(f"Error cargando modelo para {user_id}: {e}")
\ No newline at end of file
+            logging.error(f"Error cargando modelo para {user_id}: {e}")
@@ -1,8 +1,10 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Union
 import logging
+from utils.analysis_context import AnalysisContext
+from utils.metrics import timed_stage
 
 class FinancialRecommender:
     def __init__(self):
@@ -28,10 +30,11 @@ class FinancialRecommender:
             }
         }
     
-    def generate_recommendations(self, transactions_df: pd.DataFrame, 
-                               budgets_df: pd.DataFrame, 
-                               debts_df: pd.DataFrame, 
-                               user_id: str) -> Dict[str, Any]:
+    @timed_stage("recommender")
+    def generate_recommendations(self, data: Union[pd.DataFrame, AnalysisContext], 
+                               budgets_df: Optional[pd.DataFrame] = None, 
+                               debts_df: Optional[pd.DataFrame] = None, 
+                               user_id: Optional[str] = None) -> Dict[str, Any]:
         """
         Genera recomendaciones personalizadas basadas en el análisis financiero
         """
@@ -39,10 +42,14 @@ class FinancialRecommender:
             recommendations = []
             priority_score = 0
             
+            # Con un DataFrame se construye el contexto; con un contexto se usan sus budgets y deudas
+            if isinstance(data, AnalysisContext):
+                context = data
+            else:
+                context = AnalysisContext(data, budgets_df, debts_df)
+            
             # Análisis básico de finanzas
-            financial_analysis = self._analyze_financial_health(
-                transactions_df, budgets_df, debts_df
-            )
+            financial_analysis = self._analyze_financial_health(context)
             
             # 1. Recomendaciones de ahorro
             savings_recs = self._generate_savings_recommendations(financial_analysis)
@@ -82,25 +89,19 @@ class FinancialRecommender:
             logging.error(f"Error generando recomendaciones: {e}")
             return self._default_recommendations()
     
-    def _analyze_financial_health(self, transactions_df: pd.DataFrame, 
-                                 budgets_df: pd.DataFrame, 
-                                 debts_df: pd.DataFrame) -> Dict[str, Any]:
+    def _analyze_financial_health(self, context: AnalysisContext) -> Dict[str, Any]:
         """Análisis completo de la salud financiera"""
         try:
             analysis = {}
             
-            if transactions_df.empty:
+            if context.empty:
                 return {"health_score": 5.0, "total_income": 0, "total_expenses": 0}
             
             # Análisis de ingresos y gastos
-            income_df = transactions_df[transactions_df['type'] == 'income']
-            expense_df = transactions_df[transactions_df['type'] == 'expense']
-            savings_df = transactions_df[transactions_df['type'] == 'saving']
-            
-            total_income = income_df['amount'].sum() if not income_df.empty else 0
-            total_expenses = expense_df['amount'].sum() if not expense_df.empty else 0
-            total_savings = savings_df['amount'].sum() if not savings_df.empty else 0
-            total_debts = debts_df['amount'].sum() if not debts_df.empty else 0
+            total_income = context.total_income
+            total_expenses = context.total_expenses
+            total_savings = context.total_savings
+            total_debts = context.total_debts
             
             # Ratios financieros básicos
             net_income = total_income - total_expenses
@@ -108,15 +109,11 @@ class FinancialRecommender:
             debt_to_income = (total_debts / total_income) if total_income > 0 else 0
             
             # Análisis por categorías
-            category_breakdown = {}
-            if not expense_df.empty:
-                category_breakdown = expense_df.groupby('category')['amount'].sum().to_dict()
-                category_percentages = {
-                    cat: (amount / total_expenses) * 100 
-                    for cat, amount in category_breakdown.items()
-                } if total_expenses > 0 else {}
-            else:
-                category_percentages = {}
+            category_breakdown = context.expense_by_category
+            category_percentages = {
+                cat: (amount / total_expenses) * 100 
+                for cat, amount in category_breakdown.items()
+            } if total_expenses > 0 else {}
             
             # Score de salud financiera (1-10)
             health_score = self._calculate_health_score(
@@ -124,17 +121,7 @@ class FinancialRecommender:
             )
             
             # Análisis de tendencias (últimos 30 días vs anteriores)
-            thirty_days_ago = datetime.now() - timedelta(days=30)
-            recent_expenses = expense_df[expense_df['date'] >= thirty_days_ago]['amount'].sum()
-            older_expenses = expense_df[expense_df['date'] < thirty_days_ago]['amount'].sum()
-            
-            expense_trend = "stable"
-            if older_expenses > 0:
-                trend_ratio = recent_expenses / older_expenses
-                if trend_ratio > 1.2:
-                    expense_trend = "increasing"
-                elif trend_ratio < 0.8:
-                    expense_trend = "decreasing"
+            expense_trend = context.spending_trend
             
             analysis = {
                 "total_income": float(total_income),
@@ -148,8 +135,8 @@ class FinancialRecommender:
                 "category_breakdown": {k: float(v) for k, v in category_breakdown.items()},
                 "category_percentages": {k: float(v) for k, v in category_percentages.items()},
                 "expense_trend": expense_trend,
-                "has_budget": not budgets_df.empty,
-                "has_debts": not debts_df.empty
+                "has_budget": context.has_budgets,
+                "has_debts": context.has_debts
             }
             
             return analysis
@@ -0,0 +1,84 @@
+#ai-service/schemas
+
+from pydantic import BaseModel
+from typing import List, Literal, Optional, Dict, Any
+
+# Modelos de datos usando Pydantic
+class Transaction(BaseModel):
+    id: Optional[str] = None  # Identificador estable para actualizar el historial guardado
+    amount: float
+    category: str
+    description: Optional[str] = None
+    type: str  # "income", "expense", "saving", etc.
+    date: Optional[str] = None  # Si no se proporciona, usa fecha actual
+
+class Budget(BaseModel):
+    category: str
+    amountPlanned: float
+    periodStart: str
+    periodEnd: str
+
+class Debt(BaseModel):
+    type: str
+    amount: float
+    dueDate: Optional[str] = None
+    interestRate: Optional[float] = None
+    description: Optional[str] = None
+
+class UserFinancialData(BaseModel):
+    user_id: str
+    transactions: Optional[List[Transaction]] = None  # None: usar el historial guardado del usuario
+    budgets: Optional[List[Budget]] = []
+    debts: Optional[List[Debt]] = []
+
+class TransactionDelta(BaseModel):
+    """Cambios sobre el historial guardado de un usuario"""
+    transactions: List[Transaction] = []  # Altas, o reemplazos si el id ya existe
+    deleted_ids: List[str] = []
+    budgets: Optional[List[Budget]] = None  # Si se envían, reemplazan a los guardados
+    debts: Optional[List[Debt]] = None
+
+class ColumnarFinancialData(BaseModel):
+    """Payload con las transacciones en formato columnar (Arrow IPC o Parquet)"""
+    user_id: str
+    data: bytes
+    format: str  # "arrow_stream", "arrow_file" o "parquet"
+    budgets: Optional[List[Budget]] = []
+    debts: Optional[List[Debt]] = []
+
+class ForecastRequest(UserFinancialData):
+    """Payload de /predict/forecast: datos del usuario y horizontes a proyectar"""
+    horizons: List[Literal["next_day", "next_week", "next_month", "budget_period"]] = [
+        "next_day", "next_week", "next_month", "budget_period"
+    ]
+
+class BatchFinancialData(BaseModel):
+    users: List[UserFinancialData]
+
+class PredictionResponse(BaseModel):
+    user_id: str
+    period: str
+    predicted_expenses: Dict[str, float]
+    total_predicted: float
+    confidence_score: float
+
+class HorizonForecast(BaseModel):
+    days: int
+    predicted_expenses: Dict[str, float]
+    total_predicted: float
+    confidence_score: float
+
+class ForecastResponse(BaseModel):
+    user_id: str
+    forecasts: Dict[str, HorizonForecast]
+    unavailable: List[str] = []  # Horizontes sin días (budget_period sin presupuesto vigente)
+
+class AnomalyResponse(BaseModel):
+    user_id: str
+    anomalies: List[Dict[str, Any]]
+    risk_score: float
+
+class RecommendationResponse(BaseModel):
+    user_id: str
+    recommendations: List[Dict[str, Any]]
+    priority_score: float
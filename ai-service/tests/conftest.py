@@ -0,0 +1,83 @@
+#tests/conftest
+
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+import pytest
+
+# Configuración aislada antes de importar config/main: pool inline, sin
+# warm-up ni cache de respuestas, y almacenes en un directorio temporal
+_TMP_DIR = tempfile.mkdtemp(prefix="finwise-tests-")
+os.environ.update({
+    "AI_EXECUTOR_MODE": "inline",
+    "AI_WARMUP_ENABLED": "false",
+    "AI_CACHE_ENABLED": "false",
+    "AI_CACHE_DIR": "",
+    "AI_TRANSACTION_STORE_URL": f"sqlite:///{os.path.join(_TMP_DIR, 'transaction_store.db')}",
+    "AI_MODEL_STORAGE_DIR": os.path.join(_TMP_DIR, "model_storage"),
+})
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.generator import TransactionGenerator  # noqa: E402
+
+# Fecha de referencia fija de las pruebas que no dependen del reloj
+NOW = datetime(2026, 1, 15, 12, 0, 0)
+
+
+@pytest.fixture(scope="session")
+def tmp_dir() -> str:
+    return _TMP_DIR
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    import main
+
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def make_payload():
+    """Payload JSON sintético y determinista: make_payload(n, seed=..., user_id=...)"""
+    def build(n: int, seed: int = 7, user_id: str = "test-user", **options):
+        return TransactionGenerator(seed=seed, **options).payload(n, user_id=user_id)
+    return build
+
+
+@pytest.fixture
+def make_context(make_payload):
+    """
+    Contexto de análisis sobre el frame de un payload sintético, con fecha de
+    referencia NOW: make_context(n, seed=..., budgets=..., transactions=...)
+    """
+    from schemas import Transaction
+    from utils import pipeline
+    from utils.analysis_context import AnalysisContext
+
+    def build(n: int = 400, seed: int = 7, budgets=None, transactions=None, **options):
+        if transactions is None:
+            transactions = make_payload(n, seed=seed, reference_date=NOW, **options)["transactions"]
+        df = pipeline.data_processor.process_transactions([Transaction(**t) for t in transactions], NOW)
+        return AnalysisContext(df, budgets_df=budgets, reference_date=NOW)
+    return build
+
+
+@pytest.fixture
+def regression_fits(monkeypatch):
+    """Número de grupos de cada llamada a CategoryRegressions.fit"""
+    from models.category_regression import CategoryRegressions
+
+    calls = []
+    fit = CategoryRegressions.fit
+
+    def spy(cls, *args, **kwargs):
+        calls.append(args[-1])
+        return fit(*args, **kwargs)
+
+    monkeypatch.setattr(CategoryRegressions, "fit", classmethod(spy))
+    return calls
@@ -0,0 +1,97 @@
+#tests/test_admission
+
+import asyncio
+
+import pytest
+
+from utils.admission import DEFAULT, PRIORITY, AdmissionController, AdmissionRejectedError
+
+
+def test_queue_full_is_rejected_with_429():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, max_queue=1, priority_slots=0)
+        first = await controller.acquire()
+        waiting = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0)
+
+        with pytest.raises(AdmissionRejectedError) as error:
+            await controller.acquire()
+        assert error.value.status_code == 429 and error.value.retry_after >= 1
+
+        controller.release(first)
+        second = await waiting
+        controller.release(second)
+        return controller.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["active"] == 0
+    assert stats["admitted"][DEFAULT] == 2
+    assert stats["rejected"][DEFAULT] == 1
+
+
+def test_queue_timeout_is_rejected_with_503():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, queue_timeout=0.05)
+        ticket = await controller.acquire()
+        with pytest.raises(AdmissionRejectedError) as error:
+            await controller.acquire()
+        controller.release(ticket)
+        return error.value.status_code, controller.stats()
+
+    status, stats = asyncio.run(scenario())
+    assert status == 503
+    assert stats["timeouts"][DEFAULT] == 1
+    assert stats["queued"] == {PRIORITY: 0, DEFAULT: 0}
+
+
+def test_priority_lane_goes_first_and_has_reserved_slots():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, priority_slots=1)
+        busy = await controller.acquire(DEFAULT)
+        # El lugar reservado admite una solicitud prioritaria aunque el carril normal esté lleno
+        reserved = await asyncio.wait_for(controller.acquire(PRIORITY), timeout=1)
+
+        order = []
+
+        async def wait(lane):
+            ticket = await controller.acquire(lane)
+            order.append(lane)
+            return ticket
+
+        normal = asyncio.ensure_future(wait(DEFAULT))
+        await asyncio.sleep(0)
+        priority = asyncio.ensure_future(wait(PRIORITY))
+        await asyncio.sleep(0)
+
+        controller.release(busy)
+        controller.release(await priority)
+        controller.release(reserved)
+        controller.release(await normal)
+        return order, controller.stats()["active"]
+
+    order, active = asyncio.run(scenario())
+    assert order == [PRIORITY, DEFAULT]
+    assert active == 0
+
+
+def test_cancelled_waiters_release_their_place():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1)
+        ticket = await controller.acquire()
+        waiting = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0)
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        controller.release(ticket)
+        return controller.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["active"] == 0
+    assert stats["queued"][DEFAULT] == 0
+
+
+def test_middleware_reports_queue_wait_and_skips_probes(client, make_payload):
+    response = client.post("/financial-summary", json=make_payload(50))
+    assert response.status_code == 200
+    assert "x-queue-wait-ms" in response.headers
+    assert "x-queue-wait-ms" not in client.get("/health").headers
@@ -0,0 +1,53 @@
+#tests/test_analysis_context
+
+import random
+
+import numpy as np
+import pytest
+
+from tests.conftest import NOW
+from utils.analysis_context import AnalysisContext, count_suffix_at_most
+
+
+@pytest.mark.parametrize("values", [[], [5], [9, 7, 7, 3, 1, 0], [2, 2, 2], [30, 20, 10]])
+@pytest.mark.parametrize("limit", [-1, 0, 2, 7, 100])
+def test_count_suffix_at_most_matches_count_nonzero(values, limit):
+    array = np.array(values, dtype=np.int32)
+    assert count_suffix_at_most(array, limit) == int(np.count_nonzero(array <= limit))
+
+
+def test_sorted_windows_match_the_unsorted_reference(make_context):
+    df = make_context(800, seed=13, history_days=60).df
+    shuffled = df.sample(frac=1, random_state=0)
+
+    fast, reference = AnalysisContext(df, reference_date=NOW), AnalysisContext(shuffled, reference_date=NOW)
+    assert fast.sorted_by_date and not reference.sorted_by_date
+    for days in (0, 7, 30, 365):
+        assert fast.recent_expense_count(days) == reference.recent_expense_count(days)
+    assert fast.recent_expenses_30d == pytest.approx(reference.recent_expenses_30d)
+    assert fast.older_expenses == pytest.approx(reference.older_expenses)
+    assert fast.valid_until == reference.valid_until
+
+
+def test_results_do_not_depend_on_arrival_order(client, make_payload):
+    # Fechas con hora y sin repetir: el orden por fecha es único
+    payload = make_payload(400, seed=17, date_formats=["%Y-%m-%dT%H:%M:%S"])
+    assert len({t["date"] for t in payload["transactions"]}) == len(payload["transactions"])
+    shuffled = dict(payload, transactions=random.Random(1).sample(payload["transactions"], 400))
+
+    for route in ("/detect/anomalies", "/predict/weekly-expenses", "/recommendations"):
+        assert client.post(route, json=shuffled).json() == client.post(route, json=payload).json()
+
+
+@pytest.mark.parametrize("n", [40, 400])
+def test_rows_with_the_same_date_do_not_depend_on_arrival_order(client, make_payload, n):
+    # Solo la fecha (sin hora): muchas filas empatan y se desempatan por sus columnas;
+    # 40 filas van por el camino de arrays, 400 por el frame
+    payload = make_payload(n, seed=23, date_formats=["%Y-%m-%d"])
+    assert len({t["date"] for t in payload["transactions"]}) < n
+    shuffled = dict(payload, transactions=random.Random(2).sample(payload["transactions"], n))
+
+    for route in ("/detect/anomalies", "/predict/weekly-expenses", "/recommendations", "/financial-summary"):
+        first, second = client.post(route, json=shuffled).json(), client.post(route, json=payload).json()
+        first.pop("analysis_date", None), second.pop("analysis_date", None)
+        assert first == second
@@ -0,0 +1,62 @@
+#tests/test_batch_analysis
+
+import pytest
+
+import main
+
+
+def _without_date(summary):
+    return {k: v for k, v in summary.items() if k != "analysis_date"}
+
+
+def test_batch_results_match_single_user_summaries(client, make_payload):
+    users = [make_payload(n, seed=seed, user_id=f"batch-{seed}") for seed, n in ((1, 120), (2, 40), (3, 300))]
+    response = client.post("/batch/financial-analysis", json={"users": users})
+
+    assert response.status_code == 200
+    results = response.json()["users"]
+    assert [result["user_id"] for result in results] == [user["user_id"] for user in users]
+
+    for user, result in zip(users, results):
+        single = client.post("/financial-summary", json=user).json()
+        summary = result["results"]["summary"]
+        assert _without_date(summary).keys() == _without_date(single).keys()
+        for key in ("total_income", "total_expenses", "net_balance", "recent_expenses_30d"):
+            assert summary[key] == pytest.approx(single[key])
+        assert summary["categories_breakdown"] == pytest.approx(single["categories_breakdown"])
+        assert result["results"]["predictions"]["period"] == "next_week"
+
+
+def test_batch_user_without_transactions_has_no_predictions(client, make_payload):
+    users = [make_payload(50, user_id="batch-full"), {"user_id": "batch-empty", "transactions": []}]
+    results = client.post("/batch/financial-analysis", json={"users": users}).json()["users"]
+
+    assert results[0]["results"]["predictions"] is not None
+    assert results[1]["results"]["predictions"] is None
+
+
+def test_batch_over_the_user_limit_is_rejected(client, make_payload, monkeypatch):
+    monkeypatch.setattr(main.settings, "batch_max_users", 1)
+    users = [make_payload(10, user_id="a"), make_payload(10, user_id="b")]
+    assert client.post("/batch/financial-analysis", json={"users": users}).status_code == 413
+
+
+def test_batch_users_without_transactions_use_their_stored_history(client, make_payload):
+    payload = make_payload(120, seed=4, user_id="batch-stored")
+    client.delete("/users/batch-stored/transactions")
+    client.post("/users/batch-stored/transactions", json={"transactions": payload["transactions"],
+                                                          "budgets": payload["budgets"], "debts": payload["debts"]})
+
+    users = [make_payload(30, user_id="batch-json"), {"user_id": "batch-stored"}, {"user_id": "batch-unknown"}]
+    results = client.post("/batch/financial-analysis", json={"users": users}).json()["users"]
+    assert [result["user_id"] for result in results] == ["batch-json", "batch-stored", "batch-unknown"]
+
+    stored = results[1]["results"]
+    single = client.post("/financial-summary", json={"user_id": "batch-stored"}).json()
+    assert stored["summary"]["total_expenses"] == pytest.approx(single["total_expenses"])
+    assert stored["summary"]["categories_breakdown"] == pytest.approx(single["categories_breakdown"])
+    assert stored["predictions"] is not None
+
+    assert results[2]["results"] is None and "batch-unknown" in results[2]["error"]
+    assert results[0]["results"]["predictions"] is not None
+    client.delete("/users/batch-stored/transactions")
@@ -0,0 +1,50 @@
+#tests/test_benchmarks
+
+from datetime import datetime
+
+from benchmarks.compare import compare
+from benchmarks.generator import TransactionGenerator
+from benchmarks.runner import BenchmarkRunner, summarize
+from schemas import UserFinancialData
+
+
+def test_generator_is_deterministic_per_seed():
+    reference = datetime(2026, 1, 15)
+    first = TransactionGenerator(seed=3, reference_date=reference).payload(200)
+    assert first == TransactionGenerator(seed=3, reference_date=reference).payload(200)
+    assert first != TransactionGenerator(seed=4, reference_date=reference).payload(200)
+    assert first != TransactionGenerator(seed=3, reference_date=reference).payload(200, seed_offset=1)
+
+
+def test_generator_respects_its_options():
+    generator = TransactionGenerator(seed=1, n_categories=3, income_ratio=0.0, saving_ratio=0.0,
+                                     missing_date_rate=1.0)
+    transactions = generator.transactions(300)
+    assert {t["type"] for t in transactions} == {"expense"}
+    assert {t["category"] for t in transactions} <= {"food", "transportation", "entertainment"}
+    assert all(t["date"] is None for t in transactions)
+
+    # El payload es válido para el esquema de la API
+    UserFinancialData(**generator.payload(50))
+
+
+def test_summarize_reports_percentiles_and_throughput():
+    summary = summarize([0.1, 0.2, 0.3, 0.4], size=100)
+    assert summary["runs"] == 4
+    assert summary["min_s"] == 0.1 and summary["max_s"] == 0.4
+    assert abs(summary["p50_s"] - 0.25) < 1e-9
+    assert abs(summary["transactions_per_s"] - 400) < 1e-6
+
+
+def test_runner_measures_selected_targets_and_compare_renders():
+    runner = BenchmarkRunner(sizes=[50], repeat=2, warmup=0, memory=False, routes=False,
+                             serialization=False, frame=False, targets=["process_transactions", "build_context"])
+    results = runner.run()
+
+    cases = {(r["kind"], r["target"], r["size"]) for r in results["results"]}
+    assert {target for _, target, _ in cases} == {"process_transactions", "build_context"}
+    assert all(r["runs"] == 2 for r in results["results"])
+    assert "meta" in results
+
+    table = compare(results, results)
+    assert "+0.0%" in table
@@ -0,0 +1,86 @@
+#tests/test_category_regression
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.differential import sklearn_reference
+from models.category_regression import CategoryRegressions
+from utils import pipeline
+
+START = np.datetime64("2025-06-02T00:00:00", "ns")  # lunes
+DAY = np.timedelta64(1, "D")
+
+
+def _check(groups):
+    """Ajusta todos los grupos juntos y compara cada uno con sklearn"""
+    amounts = np.concatenate([amounts for amounts, _ in groups])
+    dates = np.concatenate([dates for _, dates in groups])
+    codes = np.concatenate([np.full(len(group_amounts), code) for code, (group_amounts, _) in enumerate(groups)])
+    order = np.argsort(dates, kind="stable")
+
+    regressions = CategoryRegressions.fit(amounts[order], dates[order], codes[order], len(groups))
+    forecast, confidence = regressions.forecast(), regressions.confidence()
+    assert forecast.shape == (len(groups), 7) and confidence.shape == (len(groups),)
+
+    for code, (group_amounts, group_dates) in enumerate(groups):
+        expected, expected_confidence = sklearn_reference(group_amounts, group_dates)
+        np.testing.assert_allclose(forecast[code], expected, rtol=1e-6, atol=1e-6)
+        assert confidence[code] == pytest.approx(expected_confidence, rel=1e-6, abs=1e-9)
+
+
+@pytest.mark.parametrize("seed", [1, 7, 2024])
+def test_grouped_fit_matches_sklearn_per_category(seed):
+    rng = np.random.default_rng(seed)
+    groups = []
+    for _ in range(6):
+        n = int(rng.integers(5, 80))
+        offsets = rng.integers(0, 120 * 24 * 3600, n) * np.timedelta64(1, "s")
+        trend = rng.normal(0, 2)
+        days = offsets / DAY
+        groups.append((np.round(rng.gamma(2, 40, n) + trend * days, 2).clip(0.01), START + offsets))
+    _check(groups)
+
+
+def test_degenerate_categories_match_sklearn():
+    week = np.arange(5) * DAY  # lunes a viernes: día de la semana y días desde el inicio colineales
+    _check([
+        # Todas en el mismo instante: ambas features constantes
+        (np.array([10.0, 20.0, 30.0, 40.0, 50.0]), np.full(5, START)),
+        # Mismo día de la semana en semanas distintas
+        (np.array([5.0, 7.0, 9.0, 11.0, 13.0, 20.0]), START + np.arange(6) * 7 * DAY),
+        # Colineales: solución de norma mínima, como lstsq
+        (np.array([3.0, 4.0, 8.0, 1.0, 9.0]), START + week),
+        # Montos constantes: R² = 1
+        (np.full(6, 25.0), START + np.array([0, 2, 3, 9, 15, 40]) * DAY),
+        # Tendencia que el acotado a [0, 3 × promedio] recorta
+        (np.array([500.0, 400.0, 300.0, 200.0, 100.0]), START + np.array([0, 1, 3, 6, 10]) * DAY),
+    ])
+
+
+def test_from_models_reproduces_the_grouped_fit():
+    rng = np.random.default_rng(3)
+    amounts = rng.gamma(2, 30, 200)
+    dates = np.sort(START + rng.integers(0, 90 * 24 * 3600, 200) * np.timedelta64(1, "s"))
+    codes = rng.integers(0, 4, 200)
+
+    fitted = CategoryRegressions.fit(amounts, dates, codes, 4)
+    rebuilt = CategoryRegressions.from_models([fitted.model(code) for code in range(4)])
+    np.testing.assert_allclose(rebuilt.forecast(14), fitted.forecast(14))
+    np.testing.assert_allclose(rebuilt.confidence(), fitted.confidence())
+    assert fitted.forecast(14).shape == (4, 14)
+
+
+def test_predictor_matches_the_per_category_reference(make_context):
+    context = make_context(600, seed=11)
+
+    predictor = pipeline.predictor
+    amounts, dates, codes, categories = predictor._expense_columns(context)
+    forecast, confidence = predictor._ml_predictions("regression-user", None, amounts, dates, codes, categories)
+    for code, category in enumerate(categories):
+        cat_df = context.expenses[context.expenses["category"] == category]
+        if len(cat_df) < 5:
+            continue
+        expected, expected_confidence = sklearn_reference(cat_df["amount"].to_numpy(), cat_df["date"].to_numpy())
+        assert forecast[code].mean() == pytest.approx(expected.mean(), rel=1e-6, abs=1e-6)
+        assert confidence[code] == pytest.approx(expected_confidence, rel=1e-6)
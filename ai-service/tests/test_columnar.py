@@ -0,0 +1,71 @@
+#tests/test_columnar
+
+import io
+import json
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+import pyarrow.ipc  # noqa: E402
+import pyarrow.parquet as pq  # noqa: E402
+
+from utils import columnar  # noqa: E402
+
+
+def _table(payload):
+    transactions = payload["transactions"]
+    table = pa.table({
+        column: [transaction.get(column) for transaction in transactions]
+        for column in ("amount", "category", "description", "type", "date")
+    })
+    return table.replace_schema_metadata({
+        "user_id": payload["user_id"],
+        "budgets": json.dumps(payload["budgets"]),
+        "debts": json.dumps(payload["debts"]),
+    })
+
+
+def _arrow_stream(table) -> bytes:
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def _parquet(table) -> bytes:
+    sink = io.BytesIO()
+    pq.write_table(table, sink)
+    return sink.getvalue()
+
+
+@pytest.mark.parametrize("content_type, encode", [
+    (columnar.ARROW_STREAM, _arrow_stream),
+    (columnar.PARQUET, _parquet),
+])
+def test_columnar_routes_match_json_routes(client, make_payload, content_type, encode):
+    payload = make_payload(200, user_id="columnar-user", date_formats=["%Y-%m-%d"])
+    body = encode(_table(payload))
+
+    for route in ("/predict/weekly-expenses", "/detect/anomalies"):
+        columnar_response = client.post(f"/columnar{route}", content=body,
+                                        headers={"content-type": content_type})
+        assert columnar_response.status_code == 200
+        assert columnar_response.json() == client.post(route, json=payload).json()
+
+
+def test_unsupported_content_type_is_415(client):
+    response = client.post("/columnar/predict/weekly-expenses?user_id=u", content=b"{}",
+                           headers={"content-type": "application/json"})
+    assert response.status_code == 415
+
+
+def test_corrupt_body_is_400(client):
+    response = client.post("/columnar/predict/weekly-expenses?user_id=u", content=b"not arrow",
+                           headers={"content-type": columnar.ARROW_STREAM})
+    assert response.status_code == 400
+
+
+def test_missing_required_columns_are_reported(make_payload):
+    table = _table(make_payload(5)).drop_columns(["amount"])
+    with pytest.raises(columnar.ColumnarFormatError):
+        columnar.table_to_frame(table)
@@ -0,0 +1,117 @@
+#tests/test_data_processor
+
+import random
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from schemas import Transaction
+from tests.conftest import NOW
+from utils import data_processor
+from utils.data_processor import DataProcessor, _VECTORIZED_DATES_MIN_ROWS
+
+
+# Fechas en cada formato aceptado y casos que el camino en bloque no debe tomar
+# (sin ceros a la izquierda, segundo 60, fracciones de distinta longitud)
+DATE_SAMPLES = [
+    "2026-01-02", "2025-12-31T23:59:59", "2025-11-30T08:15:00.5", "2025-11-30T08:15:00.123456",
+    "02/01/2026", "2026-1-5", "2026-01-05T7:05:09", "2026-01-05T10:00:60", "1/2/2026", None, "",
+]
+
+
+class _FrozenDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return NOW
+
+
+@pytest.fixture
+def processor(monkeypatch):
+    # Las fechas inválidas toman datetime.now(): se fija para poder comparar
+    monkeypatch.setattr(data_processor, "datetime", _FrozenDatetime)
+    return DataProcessor()
+
+
+def _dates(n: int, seed: int = 3):
+    rng = random.Random(seed)
+    return [rng.choice(DATE_SAMPLES) for _ in range(n)]
+
+
+@pytest.mark.parametrize("n", [50, _VECTORIZED_DATES_MIN_ROWS * 2])
+def test_vectorized_dates_match_row_by_row_parsing(processor, n):
+    values = _dates(n)
+    parsed = processor._parse_date_values(values, NOW)
+
+    expected = [processor._parse_date(value) if value else NOW for value in values]
+    assert list(parsed) == [pd.Timestamp(value) for value in expected]
+
+
+def test_vectorized_dates_detect_the_first_format(processor):
+    values = ["15/01/2026"] * _VECTORIZED_DATES_MIN_ROWS + ["2026-01-15"]
+    parsed = processor._parse_date_values(values, NOW)
+    assert set(parsed) == {pd.Timestamp("2026-01-15")}
+
+
+def test_frame_and_column_paths_agree(processor):
+    rng = random.Random(5)
+    transactions = [
+        Transaction(id=str(i), amount=round(rng.uniform(-50, 500), 2), category=rng.choice(["Food", "food", ""]),
+                    type=rng.choice(["expense", "Income", "saving"]), date=rng.choice(DATE_SAMPLES[:5]))
+        for i in range(_VECTORIZED_DATES_MIN_ROWS + 100)
+    ]
+    frame = processor.process_transactions(transactions, NOW)
+    columns = processor._transaction_columns(transactions, now=NOW)
+    reference = processor._clean_transaction_data(pd.DataFrame(columns), NOW)
+
+    pd.testing.assert_frame_equal(frame.drop(columns="date"), reference.drop(columns="date"))
+    assert (frame["date"] == reference["date"]).all()
+    assert set(frame["category"]) <= {"food", "other"}
+    assert not ((frame["type"] == "expense") & (frame["amount"] <= 0)).any()
+
+
+def test_compact_dtypes_keep_the_aggregates(processor, make_payload):
+    payload = make_payload(800)
+    transactions = [Transaction(**t) for t in payload["transactions"]]
+    processor.compact_dtypes_min_rows = 0
+    frame = processor.process_transactions(transactions, NOW)
+
+    assert isinstance(frame["category"].dtype, pd.CategoricalDtype)
+    assert isinstance(frame["type"].dtype, pd.CategoricalDtype)
+    assert set(processor.category_mapping) <= set(frame["category"].cat.categories)
+    assert frame["category"].cat.categories.is_monotonic_increasing
+    assert {str(frame[c].dtype) for c in ("day_of_week", "month", "week_of_year")} == {"int8"}
+    assert frame["days_ago"].dtype == "int32" and frame["amount"].dtype == "float64"
+
+    # Mismos grupos y totales que con cadenas
+    plain = frame.astype({"category": str, "type": str})
+    compact_totals = frame.groupby(["type", "category"], observed=True)["amount"].sum()
+    plain_totals = plain.groupby(["type", "category"])["amount"].sum()
+    assert list(compact_totals.index) == list(plain_totals.index)
+    assert (compact_totals.to_numpy() == plain_totals.to_numpy()).all()
+
+
+def test_compact_dtypes_only_from_the_row_threshold(processor, make_payload):
+    transactions = [Transaction(**t) for t in make_payload(300)["transactions"]]
+    processor.compact_dtypes_min_rows = 301
+    plain = processor.process_transactions(transactions, NOW)
+    processor.compact_dtypes_min_rows = 300
+    compact = processor.process_transactions(transactions, NOW)
+
+    assert plain["category"].dtype == object and plain["type"].dtype == object
+    assert isinstance(compact["category"].dtype, pd.CategoricalDtype)
+    pd.testing.assert_frame_equal(plain, compact, check_dtype=False, check_categorical=False)
+
+
+def test_unknown_categories_and_float32_amounts():
+    processor = DataProcessor(float32_amounts=True, compact_dtypes_min_rows=0)
+    transactions = [
+        Transaction(id="1", amount=10.5, category="Crypto", type="expense", date="2026-01-01"),
+        Transaction(id="2", amount=20.25, category="food", type="refund", date="2026-01-02"),
+    ]
+    frame = processor.process_transactions(transactions, NOW)
+
+    assert frame["amount"].dtype == "float32"
+    assert "crypto" in frame["category"].cat.categories
+    assert "refund" in frame["type"].cat.categories
+    assert frame["amount"].sum() == pytest.approx(30.75)
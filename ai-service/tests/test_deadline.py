@@ -0,0 +1,109 @@
+#tests/test_deadline
+
+import time
+
+import pytest
+
+from utils import pipeline
+from utils.deadline import COMPLETE, DEGRADED, FAILED, SKIPPED, Deadline, parse_deadline_ms
+
+
+class _Sized:
+    """Contexto mínimo para plan_section: solo importa el número de transacciones"""
+
+    def __init__(self, n: int):
+        self.n = n
+
+    def __len__(self):
+        return self.n
+
+
+def test_parse_deadline_ms():
+    assert parse_deadline_ms(None) is None
+    assert parse_deadline_ms("") is None
+    for value in ("0", "-5", "abc", "nan"):
+        with pytest.raises(ValueError):
+            parse_deadline_ms(value)
+
+    deadline = parse_deadline_ms("1000", elapsed=0.4)
+    assert deadline.budget_seconds == 1.0
+    assert 0.5 < deadline.remaining() <= 0.6
+    assert deadline.elapsed() >= 0.4
+
+
+def test_deadline_expires_and_reports_stages():
+    deadline = Deadline(0.02)
+    assert deadline.fits(0.01) and not deadline.expired
+    time.sleep(0.03)
+    assert deadline.expired and deadline.remaining() == 0.0 and not deadline.fits(0.001)
+
+    report = deadline.report({
+        "summary": {"status": COMPLETE},
+        "predictions": {"status": DEGRADED},
+        "anomalies": {"status": SKIPPED},
+        "recommendations": {"status": FAILED},
+    })
+    assert report["budget_ms"] == 20.0
+    assert not report["complete"]
+    assert (report["degraded"], report["skipped"], report["failed"]) == (["predictions"], ["anomalies"], ["recommendations"])
+    assert Deadline(1).report({"summary": {"status": COMPLETE}})["complete"]
+
+
+def test_plan_section_degrades_then_skips():
+    context = _Sized(10_000)
+    full_cost = pipeline.estimate_cost("anomalies", "isolation_forest", len(context))
+    degraded_cost = pipeline.estimate_cost("anomalies", "zscore", len(context))
+    assert degraded_cost < full_cost
+
+    assert pipeline.plan_section("anomalies", context, Deadline(full_cost * 2)) == "isolation_forest"
+    assert pipeline.plan_section("anomalies", context, Deadline((full_cost + degraded_cost) / 2)) == "zscore"
+    assert pipeline.plan_section("anomalies", context, Deadline(degraded_cost / 2)) is None
+    # Sin modo degradado se omite; el resumen siempre se calcula
+    assert pipeline.plan_section("recommendations", context, Deadline(1e-6)) is None
+    assert pipeline.plan_section("summary", context, Deadline(1e-6)) == "full"
+
+
+def test_generous_deadline_matches_the_full_analysis(client, make_payload):
+    payload = make_payload(300)
+    response = client.post("/financial-analysis?deadline_ms=60000", json=payload).json()
+    full = client.post("/financial-analysis", json=payload).json()
+
+    assert response["deadline"]["complete"]
+    assert {stage["status"] for stage in response["deadline"]["stages"].values()} == {COMPLETE}
+    assert response["results"]["anomalies"] == full["results"]["anomalies"]
+    assert response["results"]["predictions"] == full["results"]["predictions"]
+
+
+def test_tight_deadline_returns_partial_results(client, make_payload):
+    response = client.post("/financial-analysis", json=make_payload(300), headers={"X-Deadline-Ms": "0.001"})
+    assert response.status_code == 200
+    body = response.json()
+
+    assert not body["deadline"]["complete"]
+    assert body["results"]["summary"] is not None
+    assert sorted(body["deadline"]["skipped"]) == ["anomalies", "predictions", "recommendations"]
+    assert all(body["results"][section] is None for section in body["deadline"]["skipped"])
+
+
+def test_degraded_sections_use_the_cheaper_modes(client, make_payload, monkeypatch):
+    # Modos completos con costo inalcanzable: solo caben los degradados
+    monkeypatch.setitem(pipeline.STAGE_COSTS, ("predictions", "ml"), (1e6, 0))
+    monkeypatch.setitem(pipeline.STAGE_COSTS, ("anomalies", "isolation_forest"), (1e6, 0))
+    modes = []
+    predict = pipeline.predictor.predict_weekly_expenses
+
+    def spy(*args, statistical=False, **kwargs):
+        modes.append(statistical)
+        return predict(*args, statistical=statistical, **kwargs)
+
+    monkeypatch.setattr(pipeline.predictor, "predict_weekly_expenses", spy)
+    body = client.post("/financial-analysis?deadline_ms=60000", json=make_payload(300)).json()
+
+    assert sorted(body["deadline"]["degraded"]) == ["anomalies", "predictions"]
+    assert body["deadline"]["stages"]["anomalies"]["mode"] == "zscore"
+    assert modes == [True]
+    assert body["results"]["predictions"] is not None and body["results"]["anomalies"] is not None
+
+
+def test_invalid_deadline_is_400(client, make_payload):
+    assert client.post("/financial-analysis?deadline_ms=-1", json=make_payload(10)).status_code == 400
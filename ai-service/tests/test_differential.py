@@ -0,0 +1,26 @@
+#tests/test_differential
+
+import pytest
+
+from benchmarks.differential import DifferentialRunner, _without_dates
+from utils import pipeline
+
+
+# Cada caso ajusta IsolationForest y las regresiones dos veces: pocos casos por
+# semilla aquí; la CLI (python -m benchmarks.differential) recorre cientos
+@pytest.mark.parametrize("seed", [42, 2024])
+def test_array_path_matches_the_dataframe_path(seed):
+    results = DifferentialRunner(cases=25, seed=seed, max_rows=64).run()
+    mismatches = {name: cases for name, cases in results["mismatches"].items() if cases}
+    assert mismatches == {}
+
+
+def test_routes_answer_the_same_with_and_without_the_fast_path(client, make_payload, monkeypatch):
+    payload = make_payload(40, seed=5)
+    monkeypatch.setattr(pipeline.data_processor, "small_payload_max_rows", 64)
+    fast = client.post("/financial-analysis", json=payload).json()
+
+    monkeypatch.setattr(pipeline.data_processor, "small_payload_max_rows", 0)
+    frame = client.post("/financial-analysis", json=payload).json()
+
+    assert _without_dates(fast) == _without_dates(frame)
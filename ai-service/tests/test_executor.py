@@ -0,0 +1,70 @@
+#tests/test_executor
+
+import asyncio
+import threading
+
+import pytest
+
+from utils.executor import ExecutorSaturatedError, ModelExecutor
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        ModelExecutor(mode="fork")
+
+
+def test_thread_mode_runs_off_the_event_loop():
+    async def scenario():
+        executor = ModelExecutor(mode="thread", max_workers=1)
+        try:
+            return await executor.run(lambda: threading.current_thread().name)
+        finally:
+            executor.shutdown()
+
+    assert asyncio.run(scenario()).startswith("finwise-model")
+
+
+def test_saturated_pool_rejects_immediately():
+    release = threading.Event()
+
+    async def scenario():
+        executor = ModelExecutor(mode="thread", max_workers=1, queue_depth=1)
+        try:
+            running = [asyncio.ensure_future(executor.run(release.wait, 5)) for _ in range(2)]
+            await asyncio.sleep(0.05)
+            assert executor.available() == 0
+            with pytest.raises(ExecutorSaturatedError):
+                await executor.run(lambda: None)
+            release.set()
+            await asyncio.gather(*running)
+            return executor.stats()
+        finally:
+            executor.shutdown()
+
+    stats = asyncio.run(scenario())
+    assert stats["rejected"] == 1
+    assert stats["completed"] == 2
+
+
+def test_errors_propagate_to_the_caller():
+    async def scenario():
+        executor = ModelExecutor(mode="inline")
+        await executor.run(lambda: 1 / 0)
+
+    with pytest.raises(ZeroDivisionError):
+        asyncio.run(scenario())
+
+
+def test_lifespan_shutdown_does_not_block_the_event_loop(monkeypatch):
+    import main
+
+    loop_threads = []
+    monkeypatch.setattr(main.model_executor, "shutdown",
+                        lambda: loop_threads.append(threading.current_thread()))
+
+    async def scenario():
+        async with main.lifespan(main.app):
+            pass
+
+    asyncio.run(scenario())
+    assert loop_threads and loop_threads[0] is not threading.main_thread()
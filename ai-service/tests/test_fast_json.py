@@ -0,0 +1,75 @@
+#tests/test_fast_json
+
+import importlib
+import json
+import sys
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from config import settings
+from schemas import HorizonForecast
+from utils import fast_json
+
+CONTENT = {
+    "float": np.float64(1.5),
+    "int": np.int64(3),
+    "bool": np.bool_(True),
+    "array": np.array([1, 2, 3]),
+    "when": datetime(2026, 1, 2, 3, 4, 5),
+    "day": date(2026, 1, 2),
+    "timestamp": pd.Timestamp("2026-01-02 03:04:05"),
+    "tags": {"a"},
+    "model": HorizonForecast(days=7, predicted_expenses={"food": 1.0}, total_predicted=1.0, confidence_score=0.5),
+    "text": "añorado",
+}
+
+EXPECTED = {
+    "float": 1.5,
+    "int": 3,
+    "bool": True,
+    "array": [1, 2, 3],
+    "when": "2026-01-02T03:04:05",
+    "day": "2026-01-02",
+    "timestamp": "2026-01-02T03:04:05",
+    "tags": ["a"],
+    "model": {"days": 7, "predicted_expenses": {"food": 1.0}, "total_predicted": 1.0, "confidence_score": 0.5},
+    "text": "añorado",
+}
+
+
+@pytest.fixture
+def json_fallback(monkeypatch):
+    """fast_json recargado sin orjson (usa json con el mismo conversor)"""
+    monkeypatch.setitem(sys.modules, "orjson", None)
+    yield importlib.reload(fast_json)
+    monkeypatch.undo()
+    importlib.reload(fast_json)
+
+
+def test_dumps_converts_numpy_dates_and_models():
+    assert json.loads(fast_json.dumps(CONTENT)) == EXPECTED
+
+
+def test_json_fallback_matches_orjson(json_fallback):
+    assert json_fallback.orjson is None
+    assert json.loads(json_fallback.dumps(CONTENT)) == EXPECTED
+
+
+def test_unknown_types_raise(json_fallback):
+    with pytest.raises(TypeError):
+        fast_json.dumps({"x": object()})
+    with pytest.raises(TypeError):
+        json_fallback.dumps({"x": object()})
+
+
+def test_fast_responses_match_validated_responses(client, make_payload, monkeypatch):
+    payload = make_payload(300)
+    routes = ("/predict/weekly-expenses", "/detect/anomalies", "/recommendations")
+    fast = {route: client.post(route, json=payload).json() for route in routes}
+
+    monkeypatch.setattr(settings, "strict_responses", True)
+    for route in routes:
+        assert client.post(route, json=payload).json() == fast[route]
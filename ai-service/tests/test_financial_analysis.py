@@ -0,0 +1,32 @@
+#tests/test_financial_analysis
+
+from utils import pipeline
+
+
+def test_full_analysis_parses_payload_once(client, make_payload, monkeypatch):
+    calls = []
+    build_context = pipeline.data_processor.build_context
+
+    def counting(*args, **kwargs):
+        calls.append(args)
+        return build_context(*args, **kwargs)
+
+    monkeypatch.setattr(pipeline.data_processor, "build_context", counting)
+    response = client.post("/financial-analysis", json=make_payload(300))
+
+    assert response.status_code == 200
+    assert len(calls) == 1
+    assert set(response.json()["results"]) == {"predictions", "anomalies", "recommendations", "summary"}
+
+
+def test_full_analysis_sections_match_individual_routes(client, make_payload):
+    payload = make_payload(300)
+    results = client.post("/financial-analysis", json=payload).json()["results"]
+
+    assert results["predictions"] == client.post("/predict/weekly-expenses", json=payload).json()
+    assert results["anomalies"] == client.post("/detect/anomalies", json=payload).json()
+    summary = client.post("/financial-summary", json=payload).json()
+    assert {k: v for k, v in results["summary"].items() if k != "analysis_date"} == \
+        {k: v for k, v in summary.items() if k != "analysis_date"}
+    recommendations = client.post("/recommendations", json=payload).json()
+    assert results["recommendations"]["priority_score"] == recommendations["priority_score"]
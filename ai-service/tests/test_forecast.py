@@ -0,0 +1,94 @@
+#tests/test_forecast
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from models.category_regression import CategoryRegressions
+from models.predictor import HORIZON_DAYS, MAX_HORIZON_DAYS, ExpensePredictor
+
+SEED = 19
+
+
+def _budgets(start: str, end: str) -> pd.DataFrame:
+    return pd.DataFrame({"category": ["food"], "period_start": [pd.Timestamp(start)],
+                         "period_end": [pd.Timestamp(end)]})
+
+
+def test_next_week_matches_the_weekly_prediction(make_context):
+    predictor = ExpensePredictor()
+    context = make_context(seed=SEED)
+    forecast = predictor.forecast_expenses(context, "u", ["next_day", "next_week", "next_month"])
+    weekly = predictor.predict_weekly_expenses(context, "u")
+
+    next_week = forecast["forecasts"]["next_week"]
+    assert next_week.pop("days") == 7
+    assert next_week == weekly
+    assert forecast["unavailable"] == []
+
+
+def test_horizons_share_one_fit_and_scale_with_their_days(make_context, regression_fits):
+    predictor = ExpensePredictor()
+    context = make_context(seed=SEED)
+    forecasts = predictor.forecast_expenses(context, "u", list(HORIZON_DAYS))["forecasts"]
+    assert len(regression_fits) == 1
+    assert {horizon: forecast["days"] for horizon, forecast in forecasts.items()} == HORIZON_DAYS
+    assert len({forecast["confidence"] for forecast in forecasts.values()}) == 1
+
+    # Cada horizonte promedia sus primeros días de la misma proyección diaria,
+    # en la escala semanal proporcional a sus días (el ajuste estacional es común)
+    amounts, dates, codes, categories = predictor._expense_columns(context)
+    counts = np.bincount(codes, minlength=len(categories))
+    daily = CategoryRegressions.fit(amounts, dates, codes, len(categories)).forecast(max(HORIZON_DAYS.values()))
+    for code, category in enumerate(categories):
+        expected = {horizon: daily[code, :days].mean() * days / 7 for horizon, days in HORIZON_DAYS.items()}
+        if counts[code] < 5 or expected["next_week"] == 0:
+            continue
+        factor = forecasts["next_week"]["by_category"][category] / expected["next_week"]
+        for horizon in HORIZON_DAYS:
+            assert forecasts[horizon]["by_category"][category] == pytest.approx(expected[horizon] * factor, rel=1e-9)
+
+
+def test_statistical_categories_scale_linearly(make_context):
+    # Pocas filas por categoría: ninguna usa el modelo lineal
+    forecasts = ExpensePredictor().forecast_expenses(make_context(12, seed=SEED), "u", list(HORIZON_DAYS))["forecasts"]
+    weekly = forecasts["next_week"]["by_category"]
+    for horizon, days in HORIZON_DAYS.items():
+        assert forecasts[horizon]["by_category"] == pytest.approx({c: a * days / 7 for c, a in weekly.items()})
+
+
+def test_budget_period_runs_to_the_end_of_the_active_budget(make_context):
+    predictor = ExpensePredictor()
+
+    active = make_context(seed=SEED, budgets=_budgets("2026-01-01", "2026-01-31"))
+    forecast = predictor.forecast_expenses(active, "u", ["budget_period", "next_week", "budget_period"])
+    assert list(forecast["forecasts"]) == ["budget_period", "next_week"]
+    assert forecast["forecasts"]["budget_period"]["days"] == 16
+
+    long = make_context(seed=SEED, budgets=_budgets("2026-01-01", "2030-01-01"))
+    assert predictor.forecast_expenses(long, "u", ["budget_period"])["forecasts"]["budget_period"]["days"] == MAX_HORIZON_DAYS
+
+    ends_today = make_context(seed=SEED, budgets=_budgets("2026-01-01", "2026-01-15"))
+    assert predictor.forecast_expenses(ends_today, "u", ["budget_period"])["forecasts"]["budget_period"]["days"] == 1
+
+    for context in (make_context(seed=SEED), make_context(seed=SEED, budgets=_budgets("2025-12-01", "2025-12-31"))):
+        forecast = predictor.forecast_expenses(context, "u", ["budget_period", "next_day"])
+        assert forecast["unavailable"] == ["budget_period"]
+        assert list(forecast["forecasts"]) == ["next_day"]
+
+
+def test_forecast_route(client, make_payload):
+    payload = make_payload(300, user_id="forecast-user")
+    body = client.post("/predict/forecast", json=payload).json()
+    weekly = client.post("/predict/weekly-expenses", json=payload).json()
+
+    assert set(body["forecasts"]) == {"next_day", "next_week", "next_month", "budget_period"}
+    next_week = body["forecasts"]["next_week"]
+    assert next_week["days"] == 7
+    assert next_week["predicted_expenses"] == pytest.approx(weekly["predicted_expenses"])
+    assert next_week["total_predicted"] == pytest.approx(weekly["total_predicted"])
+    assert next_week["confidence_score"] == pytest.approx(weekly["confidence_score"])
+
+    only = client.post("/predict/forecast", json=dict(payload, horizons=["next_day"], budgets=[])).json()
+    assert list(only["forecasts"]) == ["next_day"] and only["unavailable"] == []
+    assert client.post("/predict/forecast", json=dict(payload, horizons=["next_year"])).status_code == 422
@@ -0,0 +1,101 @@
+#tests/test_incremental_models
+
+import numpy as np
+import pytest
+
+from models.category_regression import CategoryRegressions
+from models.predictor import ExpensePredictor
+from schemas import Transaction
+from tests.conftest import NOW
+from utils import pipeline
+from utils.array_context import TransactionArrays
+
+ISO = ["%Y-%m-%dT%H:%M:%S"]
+
+
+def _sorted_transactions(make_payload, n: int, seed: int):
+    transactions = make_payload(n, seed=seed, date_formats=ISO)["transactions"]
+    return sorted(transactions, key=lambda t: t["date"])
+
+
+def _expense_arrays(transactions) -> TransactionArrays:
+    columns = pipeline.data_processor._transaction_columns([Transaction(**t) for t in transactions], now=NOW)
+    return TransactionArrays.from_columns(columns, NOW).of_type("expense")
+
+
+def _fit_version(predictor: ExpensePredictor, context, version: str):
+    amounts, dates, codes, categories = predictor._expense_columns(context)
+    predictor._ml_predictions("u", version, amounts, dates, codes, categories)
+
+
+@pytest.mark.parametrize("seed", [3, 21])
+def test_update_matches_a_full_refit(make_payload, make_context, seed):
+    transactions = _sorted_transactions(make_payload, 500, seed)
+    head, tail = transactions[:400], transactions[400:]
+    predictor = ExpensePredictor()
+    _fit_version(predictor, make_context(transactions=head), "1")
+
+    assert predictor.update_models("u", _expense_arrays(tail), "1", "2")
+
+    amounts, dates, codes, categories = predictor._expense_columns(make_context(transactions=transactions))
+    updated = predictor._stored_regressions("u", "2", amounts, dates, codes, categories)
+    assert updated is not None  # los modelos actualizados resumen el historial completo
+    refit = CategoryRegressions.fit(amounts, dates, codes, len(categories))
+    np.testing.assert_allclose(updated.forecast(), refit.forecast(), rtol=1e-9, atol=1e-9)
+    np.testing.assert_allclose(updated.confidence(), refit.confidence(), rtol=1e-9, atol=1e-9)
+
+
+def test_new_category_starts_its_own_model(make_payload, make_context):
+    transactions = _sorted_transactions(make_payload, 200, 5)
+    predictor = ExpensePredictor()
+    _fit_version(predictor, make_context(transactions=transactions), "1")
+
+    late = dict(transactions[-1], id="new-1", category="Mascotas", type="expense", amount=30.0)
+    assert predictor.update_models("u", _expense_arrays([late]), "1", "2")
+    model = predictor.models.get(("u", "mascotas"))
+    assert model is not None and model.count == 1 and model.version == "2"
+
+
+def test_earlier_dates_and_unknown_versions_discard_the_models(make_payload, make_context):
+    transactions = _sorted_transactions(make_payload, 200, 9)
+    predictor = ExpensePredictor()
+    _fit_version(predictor, make_context(transactions=transactions[1:]), "1")
+
+    # Sin modelos de la versión anterior no hay nada que actualizar
+    assert not predictor.update_models("u", _expense_arrays(transactions[-1:]), "7", "8")
+
+    # Una fecha anterior al origen de su categoría obliga a reajustar
+    first = next(t for t in transactions if t["type"] == "expense" and t["amount"] > 0)
+    earliest = dict(first, id="early", date="2000-01-01T00:00:00")
+    assert not predictor.update_models("u", _expense_arrays([earliest]), "1", "2")
+    assert not predictor.models.owned("u")
+
+
+def test_delta_inserts_predict_without_refitting(client, make_payload, regression_fits):
+    user = "incremental-user"
+    transactions = _sorted_transactions(make_payload, 400, 13)
+    client.delete(f"/users/{user}/transactions")
+    client.post(f"/users/{user}/transactions", json={"transactions": transactions[:300]})
+    client.post("/predict/weekly-expenses", json={"user_id": user})
+
+    # Solo cuentan los ajustes desde aquí
+    regression_fits.clear()
+    client.post(f"/users/{user}/transactions", json={"transactions": transactions[300:]})
+    incremental = client.post("/predict/weekly-expenses", json={"user_id": user}).json()
+    assert regression_fits == []
+
+    # Igual que ajustar desde cero con el historial completo
+    pipeline.predictor.discard_models(user)
+    refit = client.post("/predict/weekly-expenses", json={"user_id": user}).json()
+    assert len(regression_fits) == 1
+    assert incremental["total_predicted"] == pytest.approx(refit["total_predicted"], rel=1e-9)
+    assert incremental["confidence_score"] == pytest.approx(refit["confidence_score"], rel=1e-9)
+    assert incremental["predicted_expenses"] == pytest.approx(refit["predicted_expenses"], rel=1e-9)
+
+    # Un cambio sobre una transacción existente descarta los modelos
+    changed = dict(transactions[0], amount=transactions[0]["amount"] + 100)
+    client.post(f"/users/{user}/transactions", json={"transactions": [changed]})
+    assert not pipeline.predictor.models.owned(user)
+    client.post("/predict/weekly-expenses", json={"user_id": user})
+    assert len(regression_fits) == 2
+    client.delete(f"/users/{user}/transactions")
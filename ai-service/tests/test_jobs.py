@@ -0,0 +1,116 @@
+#tests/test_jobs
+
+import asyncio
+import time
+
+import pytest
+
+from utils.jobs import COMPLETED, DONE, FAILED, PENDING, JobCapacityError, JobManager
+
+
+def _wait_job(client, status_url: str, timeout: float = 30.0):
+    started = time.monotonic()
+    while time.monotonic() - started < timeout:
+        job = client.get(status_url).json()
+        if job["status"] in (COMPLETED, FAILED):
+            return job
+        time.sleep(0.02)
+    raise AssertionError("El trabajo no terminó a tiempo")
+
+
+def test_job_runs_stages_and_same_key_reuses_it():
+    async def scenario():
+        manager = JobManager()
+
+        async def run(job):
+            job.start_stage("a")
+            await asyncio.sleep(0.01)
+            job.finish_stage("a")
+            return {"ok": True}
+
+        job, created = manager.submit("k", "u", ["a", "b"], run)
+        again, created_again = manager.submit("k", "u", ["a", "b"], run)
+        progress_before = job.progress
+        await job.task
+        return job, created, again, created_again, progress_before
+
+    job, created, again, created_again, progress_before = asyncio.run(scenario())
+    assert created and not created_again and again is job
+    assert progress_before == 0.0
+    assert job.status == COMPLETED and job.result == {"ok": True}
+    assert job.stages["a"]["status"] == DONE and "seconds" in job.stages["a"]
+    assert job.stages["b"]["status"] == PENDING
+    assert job.progress == 0.5
+
+
+def test_failed_job_reports_error_and_can_be_resubmitted():
+    async def scenario():
+        manager = JobManager()
+
+        async def failing(job):
+            job.start_stage("a")
+            raise ValueError("boom")
+
+        job, _ = manager.submit("k", "u", ["a"], failing)
+        await asyncio.gather(job.task, return_exceptions=True)
+        retry, created = manager.submit("k", "u", ["a"], failing)
+        await asyncio.gather(retry.task, return_exceptions=True)
+        return job, retry, created
+
+    job, retry, created = asyncio.run(scenario())
+    assert job.status == FAILED and job.error == "boom"
+    assert job.stages["a"]["status"] == FAILED
+    assert created and retry is not job
+
+
+def test_finished_jobs_expire_and_make_room():
+    async def scenario():
+        manager = JobManager(ttl_seconds=0, max_jobs=1)
+
+        async def run(job):
+            return 1
+
+        job, _ = manager.submit("k1", "u", [], run)
+        await job.task
+        assert manager.get(job.id) is None  # ttl 0: expira al terminar
+
+        manager = JobManager(ttl_seconds=60, max_jobs=1)
+        first, _ = manager.submit("k1", "u", [], run)
+        await first.task
+        manager.submit("k2", "u", [], run)  # descarta el terminado más antiguo
+        assert manager.get(first.id) is None
+
+        blocker = asyncio.Event()
+
+        async def slow(job):
+            await blocker.wait()
+
+        manager = JobManager(ttl_seconds=60, max_jobs=1)
+        manager.submit("k1", "u", [], slow)
+        with pytest.raises(JobCapacityError):
+            manager.submit("k2", "u", [], slow)
+        manager.cancel_all()
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+
+
+def test_job_route_returns_the_full_analysis(client, make_payload):
+    payload = make_payload(300, user_id="job-user")
+    submitted = client.post("/jobs/financial-analysis", json=payload)
+    assert submitted.status_code == 202
+
+    job = _wait_job(client, submitted.json()["status_url"])
+    assert job["status"] == COMPLETED and job["progress"] == 1.0
+    assert set(job["stages"]) == {"parse", "summarize", "predict", "detect", "recommend"}
+
+    results = client.post("/financial-analysis", json=payload).json()["results"]
+    assert list(job["result"]["results"]) == list(results)
+    assert job["result"]["results"]["predictions"] == results["predictions"]
+    assert job["result"]["results"]["anomalies"] == results["anomalies"]
+
+
+def test_job_route_errors(client):
+    assert client.get("/jobs/missing").status_code == 404
+    response = client.post("/jobs/financial-analysis", json={"user_id": "job-missing-user"})
+    assert response.status_code == 404
@@ -0,0 +1,65 @@
+#tests/test_metrics
+
+import pytest
+
+from utils import metrics
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = metrics.Histogram("test_latency", "doc", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value, route="/x")
+
+    lines = histogram.render()
+    assert 'test_latency_bucket{route="/x",le="0.1"} 1' in lines
+    assert 'test_latency_bucket{route="/x",le="1.0"} 2' in lines
+    assert 'test_latency_bucket{route="/x",le="+Inf"} 3' in lines
+    assert 'test_latency_count{route="/x"} 3' in lines
+    assert 'test_latency_sum{route="/x"} 5.55' in lines
+
+
+def test_counter_escapes_label_values():
+    counter = metrics.Counter("test_total", "doc", ("route",))
+    counter.inc(route='a"b')
+    counter.inc(2, route='a"b')
+    assert 'test_total{route="a\\"b"} 3.0' in counter.render()
+
+
+def test_run_collecting_returns_samples_instead_of_recording():
+    before = metrics.stage_latency.render()
+
+    def work():
+        with metrics.stage_timer("test_stage"):
+            return 42
+
+    result, samples = metrics.run_collecting(work)
+    assert result == 42
+    assert [(name, labels) for name, _, labels in samples] == [
+        (metrics.stage_latency.name, {"stage": "test_stage"})
+    ]
+    assert metrics.stage_latency.render() == before
+
+    metrics.record_samples(samples)
+    assert any('stage="test_stage"' in line for line in metrics.stage_latency.render())
+
+
+def test_run_collecting_attaches_samples_to_errors():
+    def failing():
+        with metrics.stage_timer("test_failing_stage"):
+            raise ValueError("boom")
+
+    with pytest.raises(ValueError) as error:
+        metrics.run_collecting(failing)
+    assert len(error.value.metric_samples) == 1
+
+
+def test_metrics_endpoint_exposes_routes_and_stages(client, make_payload):
+    client.post("/predict/weekly-expenses", json=make_payload(200))
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert 'finwise_http_requests_total{method="POST",route="/predict/weekly-expenses",status="200"}' in body
+    assert 'finwise_stage_duration_seconds_count{stage="process_transactions"}' in body
+    assert 'finwise_payload_transactions_count{source="json"}' in body
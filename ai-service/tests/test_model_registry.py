@@ -0,0 +1,81 @@
+#tests/test_model_registry
+
+import pickle
+import time
+
+from models.anomaly_detector import AnomalyDetector
+from utils.model_registry import ModelRegistry
+
+BLOB = b"x" * 1000
+BLOB_SIZE = len(pickle.dumps(BLOB, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def test_views_are_separate_namespaces():
+    registry = ModelRegistry()
+    models, scalers = registry.view("predictor.models"), registry.view("predictor.scalers")
+    models[("u", "food")] = 1
+    scalers[("u", "food")] = 2
+
+    assert models[("u", "food")] == 1 and scalers[("u", "food")] == 2
+    assert list(models) == [("u", "food")] and len(scalers) == 1
+    models.discard("u")
+    assert ("u", "food") not in models and ("u", "food") in scalers
+    assert registry.stats()["namespaces"] == {"predictor.scalers": 1}
+
+
+def test_lru_evicts_least_recently_used_within_the_byte_budget():
+    registry = ModelRegistry(max_bytes=BLOB_SIZE * 2, ttl_seconds=0)
+    view = registry.view("predictor.models")
+    view[("u1", "a")] = BLOB
+    view[("u2", "a")] = BLOB
+    assert view.get(("u1", "a")) == BLOB  # u1 pasa a ser el más reciente
+
+    view[("u3", "a")] = BLOB
+    assert ("u2", "a") not in view
+    assert ("u1", "a") in view and ("u3", "a") in view
+    stats = registry.stats()
+    assert stats["evictions"] == 1 and stats["bytes"] == BLOB_SIZE * 2
+
+    # Una entrada mayor que el presupuesto no se guarda ni desaloja a las demás
+    view[("u4", "a")] = BLOB * 3
+    assert ("u4", "a") not in view and len(view) == 2
+
+
+def test_ttl_and_invalidation():
+    registry = ModelRegistry(ttl_seconds=1)
+    view = registry.view("predictor.models")
+    view[("u", "a")] = 1
+    view[("u", "b")] = 2
+    view[("v", "a")] = 3
+
+    assert registry.invalidate("u") == 2
+    assert view.owned("u") == {} and view.owned("v") == {"a": 3}
+
+    registry._entries[("predictor.models", "v", "a")] = (3, 1, time.monotonic() - 2)
+    assert ("v", "a") not in view
+    stats = registry.stats()
+    assert (stats["invalidations"], stats["expirations"], stats["entries"]) == (2, 1, 0)
+
+
+def test_hits_and_misses_are_counted():
+    registry = ModelRegistry()
+    view = registry.view("predictor.models")
+    view[("u", "a")] = 1
+    assert view.get(("u", "a")) == 1 and view.get(("u", "b")) is None
+    assert ("u", "a") in view  # sin contar
+    stats = registry.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+def test_detector_is_stateless():
+    assert vars(AnomalyDetector()) == {}
+
+
+def test_registry_route_lists_only_predictor_namespaces(client, make_payload):
+    payload = make_payload(300, user_id="registry-user")
+    client.post("/predict/weekly-expenses", json=payload)
+    client.post("/detect/anomalies", json=payload)
+
+    stats = client.get("/models/registry").json()
+    assert stats["entries"] > 0 and stats["bytes"] <= stats["max_bytes"]
+    assert set(stats["namespaces"]) == {"predictor.models"}
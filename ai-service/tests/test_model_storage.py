@@ -0,0 +1,84 @@
+#tests/test_model_storage
+
+import os
+
+import pytest
+
+from data.model_storage import ModelStorage
+from models.category_regression import CategoryModel
+from models.predictor import ExpensePredictor
+from utils import pipeline
+
+
+def test_same_payload_does_not_refit(make_context, regression_fits):
+    predictor = ExpensePredictor()
+    context = make_context()
+    first = predictor.predict_weekly_expenses(context, "u")
+    assert predictor.predict_weekly_expenses(make_context(), "u") == first
+    assert len(regression_fits) == 1
+
+    # Otros datos: otra huella, nuevo ajuste
+    predictor.predict_weekly_expenses(make_context(seed=8), "u")
+    assert len(regression_fits) == 2
+
+
+def test_fingerprint_depends_on_every_training_row(make_context):
+    predictor = ExpensePredictor()
+    amounts, dates, codes, categories = predictor._expense_columns(make_context())
+    fingerprint = predictor._training_fingerprint(amounts, dates, codes, categories)
+    assert fingerprint == predictor._training_fingerprint(amounts.copy(), dates.copy(), codes.copy(), categories)
+
+    changed = amounts.copy()
+    changed[-1] += 0.01
+    assert predictor._training_fingerprint(changed, dates, codes, categories) != fingerprint
+    assert predictor._training_fingerprint(amounts, dates[::-1], codes, categories) != fingerprint
+
+
+def test_models_persist_across_predictor_instances(make_context, regression_fits, tmp_path):
+    storage_dir = str(tmp_path / "models")
+    writer = ExpensePredictor(storage=ModelStorage(storage_dir))
+    expected = writer.predict_weekly_expenses(make_context(), "u")
+    writer.wait_for_saves()
+    assert os.path.exists(os.path.join(storage_dir, "models", "u_model.pkl"))
+    stored = ModelStorage(storage_dir).load_user_models("u")
+    assert stored and all(isinstance(model, CategoryModel) for model in stored["models"].values())
+
+    # Otro proceso (otra instancia) carga los modelos guardados y no ajusta
+    reader = ExpensePredictor(storage=ModelStorage(storage_dir))
+    assert reader.predict_weekly_expenses(make_context(), "u") == expected
+    assert len(regression_fits) == 1
+
+    reader.discard_models("u")
+    assert not os.path.exists(os.path.join(storage_dir, "models", "u_model.pkl"))
+    assert ModelStorage(storage_dir).load_user_models("u") is None
+    reader.predict_weekly_expenses(make_context(), "u")
+    assert len(regression_fits) == 2
+
+
+@pytest.mark.parametrize("user_id", ["../escape", "../../models/u", "a/b", "..", ""])
+def test_user_ids_stay_inside_the_storage_dirs(tmp_path, user_id):
+    storage = ModelStorage(str(tmp_path / "storage"))
+    assert storage.save_user_models(user_id, {"food": 1}, {}, {"source": "test"})
+    assert storage.save_user_models(user_id, {"food": 2}, {}, {"source": "test"})
+
+    files = [os.path.relpath(os.path.join(root, name), tmp_path)
+             for root, _, names in os.walk(tmp_path) for name in names]
+    assert len(files) == 3
+    for path in files:
+        directory, filename = os.path.split(path)
+        assert directory in ("storage/models", "storage/metadata", "storage/backups")
+        assert filename.startswith("sha256.")
+
+    assert ModelStorage(str(tmp_path / "storage")).load_user_models(user_id)["models"] == {"food": 2}
+    assert [info["user_id"] for info in storage.list_user_models()] == [user_id]
+    assert storage.delete_user_models(user_id, backup=False)
+    assert storage.load_user_models(user_id) is None
+
+
+def test_route_user_id_with_parent_dirs(client, make_payload, tmp_dir):
+    user_id = "../../route-escape"
+    assert client.post("/predict/weekly-expenses", json=make_payload(200, user_id=user_id)).status_code == 200
+    pipeline.predictor.wait_for_saves()
+
+    assert not [name for _, _, names in os.walk(tmp_dir) for name in names if "route-escape" in name]
+    assert pipeline.predictor.storage.load_user_models(user_id) is not None
@@ -0,0 +1,122 @@
+#tests/test_response_cache
+
+import os
+import time
+from datetime import datetime, timedelta
+
+import main
+from schemas import Transaction
+from utils.response_cache import ResponseCache, payload_fingerprint
+
+
+def test_expires_at_valid_until_before_ttl():
+    cache = ResponseCache(ttl_seconds=300)
+    cache.put("a", {"x": 1}, valid_until=datetime.now() + timedelta(milliseconds=50))
+    assert cache.get("a") == {"x": 1}
+    time.sleep(0.1)
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+    # Un valid_until ya pasado no se guarda
+    cache.put("b", 1, valid_until=datetime.now() - timedelta(seconds=1))
+    assert cache.get("b") is None
+
+
+def test_memory_lru_respects_byte_budget():
+    cache = ResponseCache(max_bytes=3000)
+    for i in range(5):
+        cache.put(f"k{i}", "x" * 1000)
+    stats = cache.stats()
+    assert stats["bytes"] <= 3000
+    assert stats["evictions"] >= 2
+    assert cache.get("k4") is not None
+    assert cache.get("k0") is None
+
+
+def test_invalidate_removes_only_the_owner_entries():
+    cache = ResponseCache()
+    cache.put("u1:a", 1, owner="u1")
+    cache.put("u1:b", 2, owner="u1")
+    cache.put("u2:a", 3, owner="u2")
+
+    assert cache.invalidate("u1") == 2
+    assert cache.get("u1:a") is None and cache.get("u1:b") is None
+    assert cache.get("u2:a") == 3
+    assert cache.invalidate("u1") == 0
+
+
+def test_fingerprint_changes_with_day_and_extra():
+    day = datetime(2026, 1, 1)
+    base = payload_fingerprint("u", "{}", day, extra="v1")
+    assert base == payload_fingerprint("u", "{}", day, extra="v1")
+    assert base != payload_fingerprint("u", "{}", day, extra="v2")
+    assert base != payload_fingerprint("u", "{}", day + timedelta(days=1), extra="v1")
+
+
+def test_disk_tier_is_shared_between_instances(tmp_path):
+    ResponseCache(disk_dir=str(tmp_path)).put("k", {"x": 1})
+    other = ResponseCache(disk_dir=str(tmp_path))
+    assert other.get("k") == {"x": 1}
+    assert other.stats()["disk_hits"] == 1
+
+
+def test_invalidate_reaches_entries_promoted_from_disk(tmp_path):
+    ResponseCache(disk_dir=str(tmp_path)).put("k", {"x": 1}, owner="u")
+    fresh = ResponseCache(disk_dir=str(tmp_path))
+    assert fresh.get("k") == {"x": 1}
+
+    assert fresh.invalidate("u") == 1
+    assert fresh.get("k") is None
+    assert ResponseCache(disk_dir=str(tmp_path)).get("k") is None
+
+
+def test_disk_sweep_removes_expired_and_enforces_size(tmp_path):
+    cache = ResponseCache(disk_dir=str(tmp_path), disk_max_bytes=5000, sweep_interval_seconds=0)
+    cache.put("expired", "x", valid_until=datetime.now() + timedelta(milliseconds=50))
+    time.sleep(0.1)
+    for i in range(10):
+        cache.put(f"k{i}", "x" * 1000)
+        time.sleep(0.01)  # mtime distinto para que el orden de expulsión sea estable
+
+    files = [f for f in os.listdir(tmp_path) if f.endswith(".pkl")]
+    assert sum(os.path.getsize(tmp_path / f) for f in files) <= 5000
+    stats = cache.stats()
+    assert stats["disk_expirations"] == 1
+    assert stats["disk_evictions"] > 0
+
+    fresh = ResponseCache(disk_dir=str(tmp_path))
+    assert fresh.get("k9") is not None
+    assert fresh.get("k0") is None
+
+
+def test_disk_sweep_is_throttled(tmp_path):
+    cache = ResponseCache(disk_dir=str(tmp_path), disk_max_bytes=0, sweep_interval_seconds=3600)
+    cache.put("a", 1)  # Primer barrido: deja el directorio vacío
+    cache.put("b", 2)  # Dentro del intervalo: no barre
+    assert len(os.listdir(tmp_path)) == 1
+
+
+def test_delete_does_not_serve_the_old_history_from_cache(client, monkeypatch):
+    monkeypatch.setattr(main, "response_cache", ResponseCache())
+    user = "cache-delete-user"
+
+    def expenses(amount):
+        return [Transaction(id=f"t{i}", amount=amount, category="food", type="expense",
+                            date="2026-01-01").model_dump() for i in range(10)]
+
+    def total_expenses():
+        response = client.post("/financial-analysis", json={"user_id": user})
+        return response.json()["results"]["summary"]["total_expenses"]
+
+    client.delete(f"/users/{user}/transactions")
+    client.post(f"/users/{user}/transactions", json={"transactions": expenses(10)})
+    assert total_expenses() == 100
+    assert main.response_cache.stats()["entries"] == 1
+
+    assert client.delete(f"/users/{user}/transactions").status_code == 200
+    assert main.response_cache.stats()["entries"] == 0
+
+    client.post(f"/users/{user}/transactions", json={"transactions": expenses(999)})
+    assert total_expenses() == 9990
+    assert total_expenses() == 9990
+    assert main.response_cache.stats()["hits"] == 1
@@ -0,0 +1,116 @@
+#tests/test_single_flight
+
+import asyncio
+
+import pytest
+
+import main
+from schemas import UserFinancialData
+from utils.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    async def scenario():
+        flight = SingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return {"value": 42}
+
+        results = await asyncio.gather(*[flight.do("k", work) for _ in range(5)])
+        return flight, calls, results
+
+    flight, calls, results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert flight.stats() == {"in_flight": 0, "executions": 1, "coalesced": 4}
+
+
+def test_errors_are_shared_and_the_key_is_released():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        outcomes = await asyncio.gather(*[flight.do("k", failing) for _ in range(3)], return_exceptions=True)
+        again = await flight.do("k", _value("ok"))
+        return flight, outcomes, again
+
+    flight, outcomes, again = asyncio.run(scenario())
+    assert all(isinstance(outcome, ValueError) for outcome in outcomes)
+    assert again == "ok"
+    assert flight.executions == 2
+
+
+def test_cancelling_the_initiator_does_not_cancel_the_others():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        first = asyncio.ensure_future(flight.do("k", work))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(flight.do("k", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second, first.cancelled()
+
+    assert asyncio.run(scenario()) == ("done", True)
+
+
+def test_join_without_execution_returns_none():
+    assert asyncio.run(SingleFlight().join("missing")) is None
+
+
+def _value(value):
+    async def fn():
+        return value
+    return fn
+
+
+@pytest.fixture
+def slow_executor(monkeypatch):
+    """Pool falso y lento que cuenta las ejecuciones por función"""
+    calls = []
+
+    async def run(fn, *args):
+        calls.append(fn.name)
+        await asyncio.sleep(0.05)
+        if fn.name == "run_task" and args[0] == "financial_analysis":
+            return {"results": {"summary": {"from": "full"}}}
+        return {"from": args[0]}
+
+    monkeypatch.setattr(main.model_executor, "run", run)
+    monkeypatch.setattr(main, "response_cache", None)
+    return calls
+
+
+def test_identical_requests_are_computed_once(slow_executor):
+    data = UserFinancialData(user_id="flight-user", transactions=[])
+
+    async def scenario():
+        return await asyncio.gather(*[main._run_cached("error", "summary", data) for _ in range(4)])
+
+    results = asyncio.run(scenario())
+    assert results == [{"from": "summary"}] * 4
+    assert slow_executor == ["run_task"]
+
+
+def test_sections_join_a_full_analysis_in_flight(slow_executor):
+    data = UserFinancialData(user_id="flight-user", transactions=[])
+
+    async def scenario():
+        full = asyncio.ensure_future(main._run_cached("error", "financial_analysis", data))
+        await asyncio.sleep(0.01)
+        summary = await main._run_cached("error", "summary", data)
+        return await full, summary
+
+    full, summary = asyncio.run(scenario())
+    assert summary == {"from": "full"}
+    assert slow_executor == ["run_task"]
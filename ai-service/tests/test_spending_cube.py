@@ -0,0 +1,76 @@
+#tests/test_spending_cube
+
+import pandas as pd
+import pytest
+
+from schemas import Transaction
+from utils import pipeline
+from utils.analysis_context import AnalysisContext
+from utils.spending_cube import CubeCache, SpendingCube
+
+
+def _expenses(make_payload, n: int = 600, seed: int = 11) -> pd.DataFrame:
+    payload = make_payload(n, seed=seed)
+    df = pipeline.data_processor.process_transactions([Transaction(**t) for t in payload["transactions"]])
+    return df[df["type"] == "expense"]
+
+
+def test_cube_aggregates_match_groupby(make_payload):
+    expenses = _expenses(make_payload)
+    cube = SpendingCube.from_expenses(expenses)
+
+    by_category = expenses.groupby("category", observed=True)["amount"].agg(["sum", "count"])
+    stats = cube.category_stats()
+    assert list(stats.index) == list(by_category.index)
+    assert stats["sum"].to_numpy() == pytest.approx(by_category["sum"].to_numpy())
+    assert (stats["count"].to_numpy() == by_category["count"].to_numpy()).all()
+
+    daily = expenses.groupby(expenses["date"].dt.date)["amount"].sum()
+    assert list(cube.daily_stats().index) == list(daily.index)
+    assert cube.daily_stats()["amount"].to_numpy() == pytest.approx(daily.to_numpy())
+
+    day = expenses["date"].iloc[0].date()
+    expected = expenses[expenses["date"].dt.date == day]["category"].unique().tolist()
+    assert cube.day_categories(day) == expected
+
+
+def test_cube_cache_keeps_one_version_per_user(make_payload):
+    expenses = _expenses(make_payload, 200)
+    cache = CubeCache()
+    first = cache.get_or_build("u", "1", expenses)
+    assert cache.get_or_build("u", "1", expenses) is first
+    cache.get_or_build("u", "2", expenses)
+    cache.get_or_build("other", "1", expenses)
+
+    assert set(cache._entries) == {("u", "2"), ("other", "1")}
+    cache.discard("u")
+    assert set(cache._entries) == {("other", "1")}
+    assert cache.stats()["hits"] == 1
+
+
+def test_a_worker_that_missed_the_delete_does_not_serve_the_old_cube(client, monkeypatch):
+    cube_cache = CubeCache()
+    monkeypatch.setattr(AnalysisContext, "cube_cache", cube_cache)
+    # Como si el borrado lo hubiera atendido otro worker: este conserva sus cubos
+    monkeypatch.setattr(cube_cache, "discard", lambda user_id: None)
+    user = "cube-delete-user"
+
+    def store(amount):
+        transactions = [Transaction(id=f"t{i}", amount=amount, category="food", type="expense",
+                                    date="2026-01-01").model_dump() for i in range(10)]
+        client.post(f"/users/{user}/transactions", json={"transactions": transactions})
+
+    def breakdown():
+        summary = client.post("/financial-analysis", json={"user_id": user}).json()["results"]["summary"]
+        return summary["categories_breakdown"]
+
+    client.delete(f"/users/{user}/transactions")
+    store(10)
+    assert breakdown() == {"food": 100}
+    old_keys = {key for key in cube_cache._entries if key[0] == user}
+
+    assert client.delete(f"/users/{user}/transactions").status_code == 200
+    store(999)
+    assert breakdown() == {"food": 9990}
+    new_keys = {key for key in cube_cache._entries if key[0] == user}
+    assert len(old_keys) == len(new_keys) == 1 and old_keys != new_keys
@@ -0,0 +1,58 @@
+#tests/test_startup
+
+import json
+import os
+import pickle
+import subprocess
+import sys
+import textwrap
+
+from utils.lazy_import import DeferredFunction, DeferredModule
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENGINE_MODULES = ("pandas", "sklearn", "utils.pipeline")
+
+
+def test_deferred_function_is_picklable_and_imports_on_call():
+    fn = pickle.loads(pickle.dumps(DeferredModule("json").dumps))
+    assert isinstance(fn, DeferredFunction)
+    assert fn({"a": 1}) == '{"a": 1}'
+
+
+def test_process_mode_keeps_the_engines_out_of_the_main_process(tmp_dir, make_payload):
+    # Proceso aparte: el de las pruebas ya importó los motores (modo inline)
+    script = textwrap.dedent(f"""
+        import json, sys, time
+        from fastapi.testclient import TestClient
+        import main
+
+        payload = json.loads(sys.stdin.read())
+        with TestClient(main.app) as client:
+            while client.get("/ready").status_code != 200:
+                time.sleep(0.05)
+            assert client.post("/financial-analysis", json=payload).status_code == 200
+            assert client.post("/financial-analysis?stream=true", json=payload).status_code == 200
+            job = client.post("/jobs/financial-analysis", json=payload).json()
+            while client.get(job["status_url"]).json()["status"] not in ("completed", "failed"):
+                time.sleep(0.05)
+            assert client.get(job["status_url"]).json()["status"] == "completed"
+            delta = {{"transactions": payload["transactions"][:20]}}
+            assert client.post("/users/startup-user/transactions", json=delta).status_code == 200
+            assert client.post("/recommendations", json={{"user_id": "startup-user"}}).status_code == 200
+            assert client.delete("/users/startup-user/transactions").status_code == 200
+        print(json.dumps([name for name in {ENGINE_MODULES!r} if name in sys.modules]))
+    """)
+    env = {
+        **os.environ,
+        "AI_EXECUTOR_MODE": "process",
+        "AI_EXECUTOR_WORKERS": "1",
+        "AI_WARMUP_ENABLED": "true",
+        "AI_CACHE_ENABLED": "false",
+        "AI_TRANSACTION_STORE_URL": f"sqlite:///{os.path.join(tmp_dir, 'startup_store.db')}",
+    }
+    completed = subprocess.run(
+        [sys.executable, "-c", script], cwd=SERVICE_DIR, env=env, input=json.dumps(make_payload(200)),
+        capture_output=True, text=True, timeout=300,
+    )
+    assert completed.returncode == 0, completed.stderr
+    assert json.loads(completed.stdout.strip().splitlines()[-1]) == []
@@ -0,0 +1,117 @@
+#tests/test_stream
+
+import asyncio
+import json
+
+import pytest
+
+import main
+from schemas import UserFinancialData
+from utils import pipeline
+from utils.response_cache import ResponseCache
+from utils.sections import STREAM_SECTIONS
+
+
+def _lines(response):
+    return [json.loads(line) for line in response.text.splitlines() if line]
+
+
+def _without_date(section):
+    return {k: v for k, v in section.items() if k != "analysis_date"}
+
+
+def test_stream_sends_every_section_then_end(client, make_payload):
+    payload = make_payload(300)
+    response = client.post("/financial-analysis?stream=true", json=payload)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = _lines(response)
+    assert sorted(line["section"] for line in lines[:-1]) == sorted(STREAM_SECTIONS)
+    assert lines[-1]["section"] == "end" and "analysis_date" in lines[-1]
+    assert all(line["user_id"] == payload["user_id"] and "error" not in line for line in lines)
+
+
+def test_stream_sections_match_the_full_response(client, make_payload):
+    payload = make_payload(300)
+    lines = _lines(client.post("/financial-analysis", json=payload, headers={"Accept": "application/x-ndjson"}))
+    streamed = {line["section"]: line["result"] for line in lines[:-1]}
+    results = client.post("/financial-analysis", json=payload).json()["results"]
+
+    for section in ("predictions", "anomalies", "recommendations"):
+        assert streamed[section] == results[section]
+    assert _without_date(streamed["summary"]) == _without_date(results["summary"])
+
+
+def test_stream_replays_a_cached_analysis(client, make_payload, monkeypatch):
+    monkeypatch.setattr(main, "response_cache", ResponseCache())
+    payload = make_payload(200)
+    results = client.post("/financial-analysis", json=payload).json()["results"]
+
+    lines = _lines(client.post("/financial-analysis?stream=true", json=payload))
+    assert [line["section"] for line in lines] == STREAM_SECTIONS + ["end"]
+    assert {line["section"]: line["result"] for line in lines[:-1]} == results
+    assert main.response_cache.stats()["hits"] == 1
+
+
+def test_stream_without_stored_history_is_404(client):
+    response = client.post("/financial-analysis?stream=true", json={"user_id": "stream-missing-user"})
+    assert response.status_code == 404
+
+
+def test_stream_parses_once_and_fills_the_cache(client, make_payload, monkeypatch):
+    monkeypatch.setattr(main, "response_cache", ResponseCache())
+    contexts = []
+    build_context = pipeline.build_context
+
+    def spy(*args, **kwargs):
+        contexts.append(1)
+        return build_context(*args, **kwargs)
+
+    monkeypatch.setattr(pipeline, "build_context", spy)
+    payload = make_payload(250, seed=3)
+    lines = _lines(client.post("/financial-analysis?stream=true", json=payload))
+    assert len(contexts) == 1
+
+    # El análisis sin streaming sale del cache que dejó el stream
+    results = client.post("/financial-analysis", json=payload).json()["results"]
+    assert len(contexts) == 1 and main.response_cache.stats()["hits"] == 1
+    assert {line["section"]: line["result"] for line in lines[:-1]} == results
+
+
+@pytest.fixture
+def slow_sections(monkeypatch):
+    """Pool falso y lento: parseo y secciones, contando las ejecuciones"""
+    calls = []
+
+    async def run(fn, *args):
+        calls.append(fn.name)
+        await asyncio.sleep(0.05)
+        if fn.name == "run_parse":
+            return "context", None
+        return {"from": args[0]}
+
+    monkeypatch.setattr(main.model_executor, "run", run)
+    monkeypatch.setattr(main, "response_cache", None)
+    return calls
+
+
+def test_stream_and_full_analysis_share_one_execution(slow_sections):
+    data = UserFinancialData(user_id="stream-flight-user", transactions=[])
+
+    async def scenario():
+        response = await main._stream_financial_analysis(data)
+
+        async def consume():
+            return [json.loads(chunk) async for chunk in response.body_iterator]
+
+        streamed = asyncio.ensure_future(consume())
+        await asyncio.sleep(0.01)
+        full = await main._run_cached("error", "financial_analysis", data)
+        return await streamed, full
+
+    lines, full = asyncio.run(scenario())
+    assert slow_sections.count("run_parse") == 1
+    assert sorted(slow_sections[1:]) == ["run_context_section"] * len(STREAM_SECTIONS)
+    assert {line["section"]: line["result"] for line in lines[:-1]} == full["results"]
+    assert list(full["results"]) == ["predictions", "anomalies", "recommendations", "summary"]
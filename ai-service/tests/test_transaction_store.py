@@ -0,0 +1,144 @@
+#tests/test_transaction_store
+
+import os
+import threading
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from data.transaction_store import TransactionStore
+from schemas import Transaction
+from tests.conftest import NOW
+
+
+@pytest.fixture
+def store(tmp_path):
+    return TransactionStore(f"sqlite:///{tmp_path / 'store.db'}")
+
+
+def _expenses(amount: float, n: int, prefix: str = "t"):
+    return [Transaction(id=f"{prefix}{i}", amount=amount, category="food", type="expense",
+                        date="2026-01-01") for i in range(n)]
+
+
+def test_delta_inserts_replaces_and_deletes_by_id(store):
+    first = store.apply_delta("u", _expenses(10, 3))
+    assert (first["inserted"], first["version"]) == (3, 1)
+
+    second = store.apply_delta("u", [Transaction(id="t0", amount=99, category="food", type="expense",
+                                                 date="2026-01-02")], deleted_ids=["t1"])
+    assert (second["updated"], second["deleted"], second["total_transactions"]) == (1, 1, 2)
+    assert second["version"] == 2
+    assert sorted(store.load_transactions("u")["amount"]) == [10, 99]
+
+
+def test_concurrent_deltas_get_distinct_versions(store):
+    store.apply_delta("u", _expenses(1, 1))
+    versions, errors = [], []
+
+    def apply(worker: int):
+        try:
+            for i in range(5):
+                # Deltas de solo budgets y de altas, mezclados
+                delta = [] if i % 2 else _expenses(1, 1, prefix=f"w{worker}-{i}-")
+                versions.append(store.apply_delta("u", delta, budgets=[{"category": f"c{worker}"}])["version"])
+        except Exception as e:  # pragma: no cover - se reporta abajo
+            errors.append(e)
+
+    threads = [threading.Thread(target=apply, args=(worker,)) for worker in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert sorted(versions) == list(range(2, 32))
+    assert store.load_profile("u")["version"] == 31
+
+
+def test_ids_inserted_after_the_existing_read_are_replaced(store):
+    store.apply_delta("u", _expenses(10, 2))
+    rows = {
+        "t1": dict(store._transaction_row(_expenses(50, 2)[1], NOW), user_id="u", transaction_id="t1"),
+        "t9": dict(store._transaction_row(_expenses(70, 1)[0], NOW), user_id="u", transaction_id="t9"),
+    }
+    with store.engine.begin() as conn:
+        assert store._insert_rows(conn, "u", rows) == (1, 1)
+    assert sorted(store.load_transactions("u")["amount"]) == [10, 50, 70]
+
+
+def test_budgets_and_debts_are_kept_until_replaced(store):
+    store.apply_delta("u", [], budgets=[{"category": "food"}], debts=[{"type": "loan"}])
+    store.apply_delta("u", _expenses(1, 1))
+    profile = store.load_profile("u")
+    assert profile["budgets"] == [{"category": "food"}]
+    assert profile["debts"] == [{"type": "loan"}]
+
+
+def test_versions_never_repeat_across_deletes(store):
+    store.apply_delta("u", _expenses(10, 10), budgets=[{"category": "food"}])
+    assert store.load_profile("u")["version"] == 1
+
+    assert store.delete_user("u")
+    assert store.load_profile("u") is None
+    assert store.load_transactions("u").empty
+    assert not store.delete_user("u")
+
+    recreated = store.apply_delta("u", _expenses(999, 10))
+    assert recreated["version"] == 3
+    profile = store.load_profile("u")
+    assert profile["version"] == 3
+    assert profile["budgets"] == []
+    assert store.load_transactions("u")["amount"].sum() == 9990
+
+
+def test_existing_databases_get_the_tombstone_column(tmp_path):
+    path = tmp_path / "old.db"
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE user_histories (user_id VARCHAR(128) PRIMARY KEY, "
+                          "version INTEGER NOT NULL, budgets TEXT, debts TEXT, updated_at DATETIME NOT NULL)"))
+        conn.execute(text("INSERT INTO user_histories VALUES ('u', 4, NULL, NULL, '2026-01-01 00:00:00')"))
+    engine.dispose()
+
+    store = TransactionStore(f"sqlite:///{path}")
+    assert store.load_profile("u")["version"] == 4
+    assert store.delete_user("u")
+    assert store.apply_delta("u", _expenses(1, 1))["version"] == 6
+    assert os.path.exists(path)
+
+
+def test_startup_tolerates_tables_created_by_another_worker(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path / 'shared.db'}"
+    TransactionStore(url).apply_delta("u", _expenses(1, 1))
+
+    # Este worker comprobó el esquema antes de que el otro lo creara: su primer
+    # CREATE TABLE falla con "already exists"
+    dialect = type(create_engine(url).dialect)
+    has_table = dialect.has_table
+    stale = []
+
+    def stale_has_table(self, *args, **kwargs):
+        if not stale:
+            stale.append(args)
+            return False
+        return has_table(self, *args, **kwargs)
+
+    monkeypatch.setattr(dialect, "has_table", stale_has_table)
+    store = TransactionStore(url)
+    assert store.apply_delta("u", _expenses(1, 1, prefix="n"))["version"] == 2
+    assert stale
+
+
+def test_delete_route_then_new_history_uses_the_new_transactions(client):
+    user = "store-route-user"
+    client.delete(f"/users/{user}/transactions")
+    client.post(f"/users/{user}/transactions", json={"transactions": [t.model_dump() for t in _expenses(10, 10)]})
+    assert client.post("/financial-summary", json={"user_id": user}).json()["total_expenses"] == 100
+
+    assert client.delete(f"/users/{user}/transactions").status_code == 200
+    assert client.post("/financial-summary", json={"user_id": user}).status_code == 404
+    assert client.delete(f"/users/{user}/transactions").status_code == 404
+
+    client.post(f"/users/{user}/transactions", json={"transactions": [t.model_dump() for t in _expenses(999, 10)]})
+    assert client.post("/financial-summary", json={"user_id": user}).json()["total_expenses"] == 9990
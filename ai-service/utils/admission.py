@@ -0,0 +1,230 @@
+#utils/admission
+
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Collection, Deque, Dict, Optional
+from starlette.datastructures import MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from utils import metrics
+
+PRIORITY = "priority"
+DEFAULT = "default"
+LANES = (PRIORITY, DEFAULT)
+
+
+class AdmissionRejectedError(RuntimeError):
+    """La solicitud no se admitió: cola llena (429) o espera agotada (503)"""
+
+    def __init__(self, message: str, status_code: int, retry_after: int):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """Tiempos de una solicitud admitida: espera en cola y cómputo, por separado"""
+
+    def __init__(self, lane: str):
+        self.lane = lane
+        self.queued_at = time.perf_counter()
+        self.started_at = self.queued_at
+        self.finished_at: Optional[float] = None
+
+    @property
+    def queue_wait(self) -> float:
+        return self.started_at - self.queued_at
+
+    @property
+    def compute(self) -> float:
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+
+class AdmissionController:
+    """
+    Control de admisión delante de las rutas de análisis.
+
+    - Como máximo ``max_concurrency`` solicitudes del carril normal en curso;
+      el carril prioritario dispone además de ``priority_slots`` reservados.
+    - Hasta ``max_queue`` solicitudes esperando (entre ambos carriles); con la
+      cola llena se rechaza de inmediato (429) y si la espera supera
+      ``queue_timeout`` segundos, también (503). Ambos con Retry-After.
+    - Al liberarse un lugar se atiende primero el carril prioritario; dentro de
+      cada carril, por orden de llegada.
+    """
+
+    def __init__(self, max_concurrency: int = 1, max_queue: int = 32,
+                 priority_slots: int = 1, queue_timeout: float = 10.0):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.priority_slots = priority_slots
+        self.queue_timeout = queue_timeout
+
+        self._active = 0
+        self._queues: Dict[str, Deque[asyncio.Future]] = {lane: deque() for lane in LANES}
+
+        self.admitted = {lane: 0 for lane in LANES}
+        self.rejected = {lane: 0 for lane in LANES}
+        self.timeouts = {lane: 0 for lane in LANES}
+        # Media móvil del cómputo, para estimar Retry-After
+        self._avg_compute = 0.5
+
+    @asynccontextmanager
+    async def admit(self, lane: str = DEFAULT):
+        """Espera un lugar (o falla con AdmissionRejectedError) y lo libera al salir"""
+        ticket = await self.acquire(lane)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    async def acquire(self, lane: str = DEFAULT) -> Ticket:
+        ticket = Ticket(lane)
+
+        if self._can_start(lane) and not self._waiting_ahead(lane):
+            return self._start(ticket)
+
+        if self.queued >= self.max_queue:
+            self.rejected[lane] += 1
+            raise AdmissionRejectedError(
+                "Cola de análisis llena, intenta más tarde", 429, self.retry_after()
+            )
+
+        future = asyncio.get_running_loop().create_future()
+        self._queues[lane].append(future)
+        try:
+            await asyncio.wait_for(future, timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._discard(lane, future)
+            self.timeouts[lane] += 1
+            raise AdmissionRejectedError(
+                "Tiempo de espera en cola agotado, intenta más tarde", 503, self.retry_after()
+            )
+        except asyncio.CancelledError:
+            # Cliente desconectado: si el lugar ya se había concedido, devolverlo
+            if future.done() and not future.cancelled():
+                self._active -= 1
+                self._dispatch()
+            else:
+                self._discard(lane, future)
+            raise
+
+        return self._start(ticket, counted=True)
+
+    def release(self, ticket: Ticket):
+        ticket.finished_at = time.perf_counter()
+        self._avg_compute = 0.8 * self._avg_compute + 0.2 * ticket.compute
+        self._active -= 1
+        self._dispatch()
+
+    @property
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def retry_after(self) -> int:
+        """Segundos estimados hasta que haya lugar: cola actual por cómputo medio"""
+        pending = self.queued + 1
+        return max(1, math.ceil(pending * self._avg_compute / max(1, self.max_concurrency)))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": self._active,
+            "max_concurrency": self.max_concurrency,
+            "priority_slots": self.priority_slots,
+            "queued": {lane: len(queue) for lane, queue in self._queues.items()},
+            "max_queue": self.max_queue,
+            "admitted": dict(self.admitted),
+            "rejected": dict(self.rejected),
+            "timeouts": dict(self.timeouts),
+            "avg_compute_seconds": round(self._avg_compute, 4),
+        }
+
+    def _limit(self, lane: str) -> int:
+        return self.max_concurrency + (self.priority_slots if lane == PRIORITY else 0)
+
+    def _can_start(self, lane: str) -> bool:
+        return self._active < self._limit(lane)
+
+    def _waiting_ahead(self, lane: str) -> bool:
+        # El carril normal también cede ante el prioritario
+        if lane == PRIORITY:
+            return bool(self._queues[PRIORITY])
+        return self.queued > 0
+
+    def _start(self, ticket: Ticket, counted: bool = False) -> Ticket:
+        if not counted:
+            self._active += 1
+        self.admitted[ticket.lane] += 1
+        ticket.started_at = time.perf_counter()
+        return ticket
+
+    def _dispatch(self):
+        """Concede los lugares libres, primero al carril prioritario"""
+        for lane in LANES:
+            queue = self._queues[lane]
+            while queue and self._can_start(lane):
+                future = queue.popleft()
+                if future.done():
+                    continue
+                self._active += 1
+                future.set_result(None)
+
+    def _discard(self, lane: str, future: asyncio.Future):
+        try:
+            self._queues[lane].remove(future)
+        except ValueError:
+            pass
+
+
+class AdmissionMiddleware:
+    """
+    Middleware ASGI que pasa cada solicitud de análisis por el AdmissionController.
+    El lugar se conserva hasta que la respuesta termina de enviarse (incluido el
+    streaming NDJSON) y se libera aunque el cliente se desconecte. Las consultas
+    (GET) y las rutas exentas no pasan por la cola.
+    """
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController,
+                 exempt_paths: Collection[str] = (), priority_paths: Collection[str] = ()):
+        self.app = app
+        self.controller = controller
+        self.exempt_paths = set(exempt_paths)
+        self.priority_paths = set(priority_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if (scope["type"] != "http" or scope["path"] in self.exempt_paths
+                or scope["method"] in ("GET", "HEAD", "OPTIONS")):
+            await self.app(scope, receive, send)
+            return
+
+        lane = PRIORITY if scope["path"] in self.priority_paths else DEFAULT
+        try:
+            ticket = await self.controller.acquire(lane)
+        except AdmissionRejectedError as e:
+            metrics.admission_rejected.inc(lane=lane, status=e.status_code)
+            response = JSONResponse(
+                status_code=e.status_code,
+                content={"detail": str(e)},
+                headers={"Retry-After": str(e.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+
+        metrics.admission_wait.observe(ticket.queue_wait, lane=lane)
+        # Disponible en request.state para descontarla del plazo de la solicitud
+        scope.setdefault("state", {})["queue_wait"] = ticket.queue_wait
+
+        async def send_with_queue_wait(message: Message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append("X-Queue-Wait-Ms", f"{ticket.queue_wait * 1000:.1f}")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_queue_wait)
+        finally:
+            self.controller.release(ticket)
+            metrics.admission_compute.observe(ticket.compute, lane=lane)
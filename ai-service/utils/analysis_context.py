@@ -0,0 +1,301 @@
+#utils/analysis_context
+
+import numpy as np
+import pandas as pd
+from datetime import date, datetime, time, timedelta
+from functools import cached_property
+from typing import Any, Dict, List, Optional, Union
+from utils.spending_cube import CubeCache, SpendingCube
+
+
+def _as_frame(data: Any) -> pd.DataFrame:
+    """Normaliza entradas opcionales (None, listas vacías) a un DataFrame"""
+    return data if isinstance(data, pd.DataFrame) else pd.DataFrame()
+
+
+def count_suffix_at_most(values: np.ndarray, limit: int) -> int:
+    """
+    Número de valores <= limit en un array que no crece (los que cumplen forman
+    un sufijo). Búsqueda binaria sin copiar el array: bisect con ``key`` pide
+    Python 3.10 y searchsorted necesitaría el array negado.
+    """
+    lo, hi = 0, len(values)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if values[mid] <= limit:
+            hi = mid
+        else:
+            lo = mid + 1
+    return len(values) - lo
+
+
+class AnalysisContext:
+    """
+    Contexto de análisis compartido por los motores de IA.
+
+    Se construye una sola vez por petición a partir del DataFrame procesado y
+    guarda los subconjuntos por tipo y los agregados comunes. Cada agregado se
+    calcula la primera vez que se pide y se reutiliza en el resto de motores.
+    """
+
+    # Cubos día × categoría compartidos entre solicitudes del mismo usuario (uno por proceso)
+    cube_cache: Optional[CubeCache] = None
+
+    def __init__(self, transactions_df: pd.DataFrame,
+                 budgets_df: Optional[pd.DataFrame] = None,
+                 debts_df: Optional[pd.DataFrame] = None,
+                 reference_date: Optional[datetime] = None,
+                 user_id: Optional[str] = None,
+                 history_version: Optional[str] = None):
+        self.df = _as_frame(transactions_df)
+        self.budgets_df = _as_frame(budgets_df)
+        self.debts_df = _as_frame(debts_df)
+        self.reference_date = reference_date or datetime.now()
+        # Usuario y versión del historial guardado: con ambos el cubo se reutiliza entre solicitudes
+        self.user_id = user_id
+        self.history_version = history_version
+
+    @classmethod
+    def from_aggregates(cls, transaction_count: int,
+                        budgets_df: Optional[pd.DataFrame] = None,
+                        debts_df: Optional[pd.DataFrame] = None,
+                        reference_date: Optional[datetime] = None,
+                        **aggregates: Any) -> "AnalysisContext":
+        """
+        Crea un contexto a partir de agregados ya calculados (por ejemplo en lote).
+
+        Los agregados se guardan como valores ya resueltos de las propiedades
+        cacheadas; el contexto no tiene filas, así que solo sirve para los
+        consumidores que leen agregados (resumen y salud financiera).
+        """
+        context = cls(pd.DataFrame(), budgets_df, debts_df, reference_date)
+        context.__dict__.update(aggregates, transaction_count=transaction_count)
+        return context
+
+    @classmethod
+    def ensure(cls, data: Union["AnalysisContext", pd.DataFrame]) -> "AnalysisContext":
+        """Acepta un contexto o un DataFrame procesado y devuelve un contexto"""
+        if isinstance(data, cls):
+            return data
+        return cls(data)
+
+    @cached_property
+    def transaction_count(self) -> int:
+        return len(self.df)
+
+    def __len__(self) -> int:
+        return self.transaction_count
+
+    @property
+    def empty(self) -> bool:
+        return self.transaction_count == 0
+
+    # Subconjuntos por tipo de transacción
+
+    def _by_type(self, transaction_type: str) -> pd.DataFrame:
+        if self.df.empty:
+            return self.df
+        return self.df[self.df['type'] == transaction_type]
+
+    @cached_property
+    def expenses(self) -> pd.DataFrame:
+        return self._by_type('expense')
+
+    @cached_property
+    def income(self) -> pd.DataFrame:
+        return self._by_type('income')
+
+    @cached_property
+    def savings(self) -> pd.DataFrame:
+        return self._by_type('saving')
+
+    @property
+    def has_budgets(self) -> bool:
+        return not self.budgets_df.empty
+
+    @property
+    def has_debts(self) -> bool:
+        return not self.debts_df.empty
+
+    @cached_property
+    def expense_count(self) -> int:
+        return len(self.expenses)
+
+    # Totales
+
+    @cached_property
+    def total_income(self) -> float:
+        return self.income['amount'].sum() if not self.income.empty else 0
+
+    @cached_property
+    def total_expenses(self) -> float:
+        return self.expenses['amount'].sum() if not self.expenses.empty else 0
+
+    @cached_property
+    def total_savings(self) -> float:
+        return self.savings['amount'].sum() if not self.savings.empty else 0
+
+    @cached_property
+    def total_debts(self) -> float:
+        return self.debts_df['amount'].sum() if not self.debts_df.empty else 0
+
+    @cached_property
+    def expense_mean(self) -> float:
+        return self.expenses['amount'].mean() if not self.expenses.empty else 0
+
+    # Agregados por día, categoría y día de la semana (solo gastos). Salen del
+    # cubo día × categoría; el frame solo se recorre si el cubo no cabe
+
+    @cached_property
+    def spending_cube(self) -> Optional[SpendingCube]:
+        """Cubo día × categoría de los gastos (None si las fechas están demasiado dispersas)"""
+        if self.cube_cache is not None and self.user_id is not None and self.history_version is not None:
+            return self.cube_cache.get_or_build(self.user_id, self.history_version, self.expenses)
+        return SpendingCube.from_expenses(self.expenses)
+
+    @cached_property
+    def expense_category_stats(self) -> pd.DataFrame:
+        """Suma, conteo y promedio de gastos por categoría"""
+        if self.expenses.empty:
+            return pd.DataFrame(columns=['sum', 'count', 'mean'])
+        if self.spending_cube is not None:
+            return self.spending_cube.category_stats()
+        return self.expenses.groupby('category', observed=True)['amount'].agg(['sum', 'count', 'mean'])
+
+    @cached_property
+    def expense_by_category(self) -> Dict[str, Any]:
+        if self.expenses.empty:
+            return {}
+        return self.expense_category_stats['sum'].to_dict()
+
+    @cached_property
+    def expense_category_means(self) -> Dict[str, float]:
+        if self.expenses.empty:
+            return {}
+        return self.expense_category_stats['mean'].to_dict()
+
+    @cached_property
+    def expense_weekday_stats(self) -> pd.DataFrame:
+        """Suma y promedio de gastos por día de la semana"""
+        if self.expenses.empty:
+            return pd.DataFrame(columns=['sum', 'mean'])
+        if self.spending_cube is not None:
+            return self.spending_cube.weekday_stats()
+        return self.expenses.groupby('day_of_week')['amount'].agg(['sum', 'mean'])
+
+    @cached_property
+    def expense_weekday_means(self) -> Dict[int, float]:
+        if self.expenses.empty:
+            return {}
+        return self.expense_weekday_stats['mean'].to_dict()
+
+    @cached_property
+    def expense_daily_stats(self) -> pd.DataFrame:
+        """Suma y número de gastos de cada día con gastos, indexado por fecha"""
+        if self.expenses.empty:
+            return pd.DataFrame(columns=['amount', 'transaction_count'])
+        if self.spending_cube is not None:
+            return self.spending_cube.daily_stats()
+        return self.expenses.groupby(self.expenses['date'].dt.date).agg({
+            'amount': 'sum',
+            'category': 'count'
+        }).rename(columns={'category': 'transaction_count'})
+
+    def expense_day_categories(self, day: date) -> List[str]:
+        """Categorías con gastos en un día, en orden de aparición"""
+        if self.spending_cube is not None:
+            return self.spending_cube.day_categories(day)
+        if self.sorted_by_date:
+            start = datetime.combine(day, time.min)
+            rows = self._expense_rows(start, start + timedelta(days=1))
+            return self.expenses['category'].iloc[rows].unique().tolist()
+        return self.expenses[self.expenses['date'].dt.date == day]['category'].unique().tolist()
+
+    # Ventanas de tiempo. DataProcessor entrega el frame ordenado por fecha, así
+    # que cada ventana es un tramo contiguo que se ubica por búsqueda binaria
+    # (un frame sin ordenar, p. ej. construido a mano, se filtra con máscaras)
+
+    @cached_property
+    def sorted_by_date(self) -> bool:
+        return 'date' in self.df.columns and self.df['date'].is_monotonic_increasing
+
+    @cached_property
+    def expense_dates(self) -> np.ndarray:
+        return self.expenses['date'].to_numpy()
+
+    def _expense_rows(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> slice:
+        """Tramo de gastos con start <= fecha < end (frame ordenado)"""
+        dates = self.expense_dates
+        lo = 0 if start is None else int(np.searchsorted(dates, np.datetime64(start, 'ns'), side='left'))
+        hi = len(dates) if end is None else int(np.searchsorted(dates, np.datetime64(end, 'ns'), side='left'))
+        return slice(lo, hi)
+
+    def recent_expense_count(self, days: int) -> int:
+        """Número de gastos con days_ago <= days"""
+        if self.expenses.empty:
+            return 0
+        days_ago = self.expenses['days_ago'].to_numpy()
+        if self.sorted_by_date:
+            # days_ago no crece a lo largo del frame ordenado: los que cumplen son un sufijo
+            return count_suffix_at_most(days_ago, days)
+        return int(np.count_nonzero(days_ago <= days))
+
+    # Tendencia de los últimos 30 días frente a los anteriores
+
+    @cached_property
+    def thirty_days_ago(self) -> datetime:
+        return self.reference_date - timedelta(days=30)
+
+    @cached_property
+    def recent_expenses_30d(self) -> float:
+        if self.expenses.empty:
+            return 0
+        if self.sorted_by_date:
+            return self.expenses['amount'].iloc[self._expense_rows(start=self.thirty_days_ago)].sum()
+        return self.expenses[self.expenses['date'] >= self.thirty_days_ago]['amount'].sum()
+
+    @cached_property
+    def older_expenses(self) -> float:
+        if self.expenses.empty:
+            return 0
+        if self.sorted_by_date:
+            return self.expenses['amount'].iloc[self._expense_rows(end=self.thirty_days_ago)].sum()
+        return self.expenses[self.expenses['date'] < self.thirty_days_ago]['amount'].sum()
+
+    @cached_property
+    def spending_trend(self) -> str:
+        trend = "stable"
+        if self.older_expenses > 0:
+            trend_ratio = self.recent_expenses_30d / self.older_expenses
+            if trend_ratio > 1.2:
+                trend = "increasing"
+            elif trend_ratio < 0.8:
+                trend = "decreasing"
+        return trend
+
+    # Vigencia de los resultados
+
+    @cached_property
+    def valid_until(self) -> datetime:
+        """
+        Primer instante en que cambiaría algún resultado dependiente de la fecha:
+        el cambio de día (día de la semana actual), la salida de una transacción
+        de la ventana days_ago <= 7 o de la ventana de los últimos 30 días.
+        """
+        horizon = datetime.combine(self.reference_date.date() + timedelta(days=1), time.min)
+
+        if not self.df.empty and 'date' in self.df.columns:
+            dates = self.df['date']
+            for window in (timedelta(days=8), timedelta(days=30)):
+                if self.sorted_by_date:
+                    # Primera transacción con fecha + ventana > referencia
+                    first = int(np.searchsorted(dates.to_numpy(), np.datetime64(self.reference_date - window, 'ns'),
+                                                side='right'))
+                    upcoming = dates.iloc[first:first + 1] + window
+                else:
+                    edges = dates + window
+                    upcoming = edges[edges > self.reference_date]
+                if not upcoming.empty:
+                    horizon = min(horizon, upcoming.min().to_pydatetime())
+
+        return horizon
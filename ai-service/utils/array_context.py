@@ -0,0 +1,274 @@
+#utils/array_context
+
+import numpy as np
+import pandas as pd
+from datetime import datetime, time, timedelta
+from functools import cached_property
+from typing import Any, Dict, List, Optional
+from utils.analysis_context import AnalysisContext, count_suffix_at_most
+from utils.spending_cube import SpendingCube
+
+
+# Reducciones con las mismas operaciones (y el mismo redondeo) que Series.mean
+# y Series.std de pandas sobre una columna float64 sin nulos
+
+def series_mean(values: np.ndarray) -> float:
+    if len(values) == 0:
+        return np.nan
+    return values.sum(dtype=np.float64) / np.float64(len(values))
+
+
+def series_std(values: np.ndarray) -> float:
+    """Desviación estándar muestral (ddof=1), NaN con menos de dos valores"""
+    count = np.float64(len(values))
+    if count <= 1:
+        return np.nan
+    avg = values.sum(dtype=np.float64) / count
+    return np.sqrt(((avg - values) ** 2).sum(dtype=np.float64) / (count - 1))
+
+
+class TransactionArrays:
+    """
+    Transacciones ya limpias (mismas reglas que DataProcessor._clean_transaction_data)
+    como arrays de NumPy, en el mismo orden que las filas del frame equivalente.
+    """
+
+    def __init__(self, amount: np.ndarray, category: np.ndarray, type: np.ndarray,
+                 date: np.ndarray, days_ago: np.ndarray, day_of_week: np.ndarray):
+        self.amount = amount
+        self.category = category
+        self.type = type
+        self.date = date
+        self.days_ago = days_ago
+        self.day_of_week = day_of_week
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, Any], reference_date: datetime) -> "TransactionArrays":
+        """
+        Columnas de DataProcessor._transaction_columns (fechas ya parseadas) a arrays
+        limpios: sin gastos de monto <= 0, categorías normalizadas y columnas de tiempo
+        """
+        amount = columns['amount']
+        types = np.array(columns['type'], dtype=object)
+        is_expense = types == 'expense'
+        keep = ~(is_expense & (amount <= 0))
+
+        amount = np.where(is_expense, np.abs(amount), amount)
+        categories = np.array([category.lower().strip() for category in columns['category']], dtype=object)
+
+        # Filas conservadas, en el orden del frame (TRANSACTION_SORT_KEYS de
+        # DataProcessor; lexsort toma la última clave como la principal)
+        rows = np.flatnonzero(keep)
+        rows = rows[np.lexsort((np.array(columns['description'], dtype=object)[rows], types[rows],
+                                categories[rows], amount[rows], columns['date'][rows]))]
+
+        amount = amount[rows]
+        dates = columns['date'][rows]
+        days = dates.astype('datetime64[D]').astype(np.int64)
+
+        return cls(
+            amount=amount,
+            category=categories[rows],
+            type=types[rows],
+            date=dates,
+            days_ago=(np.datetime64(reference_date, 'ns') - dates) // np.timedelta64(1, 'D'),
+            # 1970-01-01 fue jueves (3 con lunes = 0)
+            day_of_week=(days + 3) % 7,
+        )
+
+    @classmethod
+    def empty(cls) -> "TransactionArrays":
+        no_rows = np.array([], dtype=object)
+        return cls(np.array([], dtype=np.float64), no_rows, no_rows, np.array([], dtype='datetime64[ns]'),
+                   np.array([], dtype=np.int64), np.array([], dtype=np.int64))
+
+    def __len__(self) -> int:
+        return len(self.amount)
+
+    def where(self, mask: np.ndarray) -> "TransactionArrays":
+        return TransactionArrays(self.amount[mask], self.category[mask], self.type[mask],
+                                 self.date[mask], self.days_ago[mask], self.day_of_week[mask])
+
+    def of_type(self, transaction_type: str) -> "TransactionArrays":
+        return self.where(self.type == transaction_type)
+
+    def isoformat(self, index: int) -> str:
+        """Fecha de una transacción en el mismo formato que Timestamp.isoformat()"""
+        return self.date[index].astype('datetime64[us]').item().isoformat()
+
+
+class ArrayAnalysisContext(AnalysisContext):
+    """
+    Contexto de análisis de un payload pequeño respaldado por arrays de NumPy.
+
+    Los agregados que leen el resumen, la salud financiera y los caminos
+    estadísticos de predicción y anomalías se calculan sobre los arrays, con
+    resultados idénticos a los del frame. El DataFrame (y los de budgets y
+    deudas) se construye solo si algún motor lo pide, a partir de las mismas
+    columnas ya parseadas.
+    """
+
+    def __init__(self, arrays: TransactionArrays, columns: Optional[Dict[str, Any]],
+                 processor: Any, budgets: Optional[List[Any]] = None,
+                 debts: Optional[List[Any]] = None,
+                 reference_date: Optional[datetime] = None,
+                 user_id: Optional[str] = None):
+        self.arrays = arrays
+        # Columnas sin limpiar, para construir el frame con DataProcessor si hace falta
+        self._columns = columns
+        self._processor = processor
+        self._budgets = budgets or []
+        self._debts = debts or []
+        self.reference_date = reference_date or datetime.now()
+        self.user_id = user_id
+        self.history_version = None
+
+    # Frames, construidos solo bajo demanda
+
+    @cached_property
+    def df(self) -> pd.DataFrame:
+        if not self._columns:
+            return pd.DataFrame()
+        return self._processor._clean_transaction_data(pd.DataFrame(self._columns), self.reference_date)
+
+    @cached_property
+    def budgets_df(self) -> pd.DataFrame:
+        return self._processor.process_budgets(self._budgets) if self._budgets else pd.DataFrame()
+
+    @cached_property
+    def debts_df(self) -> pd.DataFrame:
+        return self._processor.process_debts(self._debts) if self._debts else pd.DataFrame()
+
+    @property
+    def has_budgets(self) -> bool:
+        return bool(self._budgets)
+
+    @property
+    def has_debts(self) -> bool:
+        return bool(self._debts)
+
+    @cached_property
+    def transaction_count(self) -> int:
+        return len(self.arrays)
+
+    # Subconjuntos por tipo de transacción
+
+    @cached_property
+    def expense_arrays(self) -> TransactionArrays:
+        return self.arrays.of_type('expense')
+
+    @cached_property
+    def income_arrays(self) -> TransactionArrays:
+        return self.arrays.of_type('income')
+
+    @cached_property
+    def saving_arrays(self) -> TransactionArrays:
+        return self.arrays.of_type('saving')
+
+    @cached_property
+    def expense_count(self) -> int:
+        return len(self.expense_arrays)
+
+    # Totales
+
+    @cached_property
+    def total_income(self) -> float:
+        return self.income_arrays.amount.sum() if len(self.income_arrays) else 0
+
+    @cached_property
+    def total_expenses(self) -> float:
+        return self.expense_arrays.amount.sum() if len(self.expense_arrays) else 0
+
+    @cached_property
+    def total_savings(self) -> float:
+        return self.saving_arrays.amount.sum() if len(self.saving_arrays) else 0
+
+    @cached_property
+    def total_debts(self) -> float:
+        if not self._debts:
+            return 0
+        return np.array([float(debt.amount) for debt in self._debts]).sum()
+
+    @cached_property
+    def expense_mean(self) -> float:
+        return series_mean(self.expense_arrays.amount) if len(self.expense_arrays) else 0
+
+    # Agregados por categoría y día de la semana, desde el cubo día × categoría
+
+    @cached_property
+    def spending_cube(self) -> Optional[SpendingCube]:
+        expenses = self.expense_arrays
+        categories, category_index = np.unique(expenses.category, return_inverse=True)
+        return SpendingCube.from_arrays(expenses.date, category_index.astype(np.int64),
+                                        categories.tolist(), expenses.amount)
+
+    @cached_property
+    def expense_by_category(self) -> Dict[str, Any]:
+        if not len(self.expense_arrays):
+            return {}
+        if self.spending_cube is None:
+            return super().expense_by_category
+        sums, _ = self.spending_cube.category_totals()
+        return dict(zip(self.spending_cube.categories, sums.tolist()))
+
+    @cached_property
+    def expense_category_means(self) -> Dict[str, float]:
+        if not len(self.expense_arrays):
+            return {}
+        if self.spending_cube is None:
+            return super().expense_category_means
+        sums, counts = self.spending_cube.category_totals()
+        return dict(zip(self.spending_cube.categories, (sums / np.where(counts > 0, counts, 1)).tolist()))
+
+    @cached_property
+    def expense_weekday_means(self) -> Dict[int, float]:
+        if not len(self.expense_arrays):
+            return {}
+        if self.spending_cube is None:
+            return super().expense_weekday_means
+        weekdays, sums, counts = self.spending_cube.weekday_totals()
+        return dict(zip(weekdays.tolist(), (sums / counts).tolist()))
+
+    # Ventanas de tiempo: los arrays están ordenados por fecha
+
+    @cached_property
+    def sorted_by_date(self) -> bool:
+        return True
+
+    @cached_property
+    def expense_dates(self) -> np.ndarray:
+        return self.expense_arrays.date
+
+    def recent_expense_count(self, days: int) -> int:
+        days_ago = self.expense_arrays.days_ago
+        return count_suffix_at_most(days_ago, days)
+
+    # Tendencia de los últimos 30 días frente a los anteriores
+
+    @cached_property
+    def recent_expenses_30d(self) -> float:
+        if not len(self.expense_arrays):
+            return 0
+        return self.expense_arrays.amount[self._expense_rows(start=self.thirty_days_ago)].sum()
+
+    @cached_property
+    def older_expenses(self) -> float:
+        if not len(self.expense_arrays):
+            return 0
+        return self.expense_arrays.amount[self._expense_rows(end=self.thirty_days_ago)].sum()
+
+    # Vigencia de los resultados
+
+    @cached_property
+    def valid_until(self) -> datetime:
+        horizon = datetime.combine(self.reference_date.date() + timedelta(days=1), time.min)
+
+        dates = self.arrays.date
+        for window in (timedelta(days=8), timedelta(days=30)):
+            # Primera transacción con fecha + ventana > referencia
+            first = int(np.searchsorted(dates, np.datetime64(self.reference_date - window, 'ns'), side='right'))
+            if first < len(dates):
+                edge = dates[first] + np.timedelta64(window)
+                horizon = min(horizon, edge.astype('datetime64[us]').item())
+
+        return horizon
@@ -0,0 +1,130 @@
+#utils/batch_analysis
+
+import pandas as pd
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+import logging
+from utils.analysis_context import AnalysisContext
+
+
+class BatchAnalyzer:
+    """
+    Análisis de muchos usuarios en un solo DataFrame.
+
+    Todas las transacciones del lote se concatenan en un frame con la columna
+    'user_key' y los agregados (totales, desglose por categoría, tendencia de
+    30 días, predicción estadística) se calculan con groupby. Con esos agregados
+    se construye un AnalysisContext por usuario para reutilizar el resumen y
+    las recomendaciones de siempre.
+    """
+
+    def __init__(self, data_processor, predictor, recommender):
+        self.data_processor = data_processor
+        self.predictor = predictor
+        self.recommender = recommender
+
+    def analyze(self, users: List[Any],
+                stored_transactions: Optional[Dict[int, pd.DataFrame]] = None) -> List[Dict[str, Any]]:
+        """
+        Devuelve un resultado por usuario, en el mismo orden del lote.
+        stored_transactions tiene el historial guardado (en columnas) de los
+        usuarios sin transacciones en el payload, por posición en el lote
+        """
+        reference_date = datetime.now()
+        df = self.data_processor.process_batch_transactions(users, reference_date, stored_transactions)
+
+        aggregates = self._aggregate(df, reference_date)
+        expense_df = df[df['type'] == 'expense'] if not df.empty else df
+        predictions = self.predictor.predict_weekly_expenses_batch(expense_df, 'user_key', reference_date)
+
+        results = []
+        for user_key, financial_data in enumerate(users):
+            context = AnalysisContext.from_aggregates(
+                budgets_df=self.data_processor.process_budgets(financial_data.budgets) if financial_data.budgets else None,
+                debts_df=self.data_processor.process_debts(financial_data.debts) if financial_data.debts else None,
+                reference_date=reference_date,
+                **aggregates.get(user_key, {"transaction_count": 0})
+            )
+            results.append(self._user_result(financial_data.user_id, context, predictions.get(user_key)))
+
+        return results
+
+    def _aggregate(self, df: pd.DataFrame, reference_date: datetime) -> Dict[int, Dict[str, Any]]:
+        """Agregados de todos los usuarios del lote, calculados con operaciones agrupadas"""
+        if df.empty:
+            return {}
+
+        transaction_count = df.groupby('user_key').size()
+        totals = df.groupby(['user_key', 'type'], observed=True)['amount'].sum().unstack(fill_value=0)
+
+        expense_df = df[df['type'] == 'expense']
+        expense_mean = expense_df.groupby('user_key')['amount'].mean()
+        by_category = expense_df.groupby(['user_key', 'category'], observed=True)['amount'].sum()
+
+        # Tendencia: últimos 30 días frente a los anteriores
+        is_recent = expense_df['date'] >= reference_date - timedelta(days=30)
+        split = expense_df.groupby(['user_key', is_recent.rename('recent')])['amount'].sum().unstack(fill_value=0)
+
+        def column(frame: pd.DataFrame, name: Any) -> pd.Series:
+            if name in frame.columns:
+                return frame[name]
+            return pd.Series(0, index=frame.index)
+
+        income = column(totals, 'income')
+        expenses = column(totals, 'expense')
+        savings = column(totals, 'saving')
+        recent = column(split, True)
+        older = column(split, False)
+
+        category_groups = {
+            user_key: group.droplevel(0).to_dict()
+            for user_key, group in by_category.groupby(level=0, sort=False)
+        }
+
+        aggregates = {}
+        for user_key, count in transaction_count.items():
+            aggregates[user_key] = {
+                "transaction_count": int(count),
+                "total_income": income.get(user_key, 0),
+                "total_expenses": expenses.get(user_key, 0),
+                "total_savings": savings.get(user_key, 0),
+                "expense_mean": expense_mean.get(user_key, 0),
+                "expense_by_category": category_groups.get(user_key, {}),
+                "recent_expenses_30d": recent.get(user_key, 0),
+                "older_expenses": older.get(user_key, 0),
+            }
+
+        return aggregates
+
+    def _user_result(self, user_id: str, context: AnalysisContext,
+                     prediction: Dict[str, Any]) -> Dict[str, Any]:
+        results = {}
+
+        # Predicciones (estadísticas) si hay transacciones
+        if context.empty:
+            results["predictions"] = None
+        else:
+            prediction = prediction or self.predictor._default_prediction()
+            results["predictions"] = {
+                "user_id": user_id,
+                "period": "next_week",
+                "predicted_expenses": prediction["by_category"],
+                "total_predicted": prediction["total"],
+                "confidence_score": prediction["confidence"],
+                "model_type": prediction["model_type"]
+            }
+
+        try:
+            recommendations = self.recommender.generate_recommendations(context, user_id=user_id)
+            results["recommendations"] = {
+                "user_id": user_id,
+                "recommendations": recommendations["recommendations"],
+                "priority_score": recommendations["priority_score"]
+            }
+        except Exception as e:
+            logging.error(f"Error generando recomendaciones en lote para {user_id}: {e}")
+            results["recommendations"] = None
+
+        results["summary"] = self.data_processor.generate_financial_summary(context)
+
+        return {"user_id": user_id, "results": results}
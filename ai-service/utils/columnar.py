@@ -0,0 +1,124 @@
+#utils/columnar
+
+import json
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+if TYPE_CHECKING:  # pandas se carga con pyarrow al convertir la tabla
+    import pandas as pd
+
+# Tipos de contenido aceptados por los endpoints columnares
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+ARROW_FILE = "application/vnd.apache.arrow.file"
+PARQUET = "application/vnd.apache.parquet"
+
+CONTENT_TYPES = {
+    ARROW_STREAM: "arrow_stream",
+    ARROW_FILE: "arrow_file",
+    PARQUET: "parquet",
+    "application/x-parquet": "parquet",
+}
+
+REQUIRED_COLUMNS = ["amount", "type"]
+TRANSACTION_COLUMNS = ["amount", "category", "description", "type", "date"]
+
+
+class ColumnarFormatError(ValueError):
+    """El cuerpo columnar no se puede leer o no tiene el esquema esperado"""
+
+
+class UnsupportedFormatError(ColumnarFormatError):
+    """Tipo de contenido no soportado o pyarrow no disponible"""
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        return pyarrow
+    except ImportError:
+        raise UnsupportedFormatError("La ingesta columnar requiere pyarrow instalado")
+
+
+def format_from_content_type(content_type: Optional[str]) -> str:
+    """Devuelve el formato interno a partir del header Content-Type"""
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type not in CONTENT_TYPES:
+        raise UnsupportedFormatError(
+            f"Content-Type no soportado: '{media_type}'. Usa {ARROW_STREAM}, {ARROW_FILE} o {PARQUET}"
+        )
+    return CONTENT_TYPES[media_type]
+
+
+def read_table(data: bytes, fmt: str):
+    """Lee un pyarrow.Table desde los bytes del cuerpo sin copiar el buffer"""
+    pa = _require_pyarrow()
+    buffer = pa.py_buffer(data)
+
+    try:
+        if fmt == "arrow_stream":
+            import pyarrow.ipc as ipc
+            return ipc.open_stream(buffer).read_all()
+        if fmt == "arrow_file":
+            import pyarrow.ipc as ipc
+            return ipc.open_file(buffer).read_all()
+        if fmt == "parquet":
+            import pyarrow.parquet as pq
+            return pq.read_table(pa.BufferReader(buffer))
+    except Exception as e:
+        raise ColumnarFormatError(f"No se pudo leer el cuerpo {fmt}: {e}")
+
+    raise UnsupportedFormatError(f"Formato columnar no soportado: {fmt}")
+
+
+def read_schema(data: bytes, fmt: str):
+    """Lee solo el esquema (cabecera IPC o footer Parquet), sin decodificar columnas"""
+    pa = _require_pyarrow()
+    buffer = pa.py_buffer(data)
+
+    try:
+        if fmt == "arrow_stream":
+            import pyarrow.ipc as ipc
+            return ipc.open_stream(buffer).schema
+        if fmt == "arrow_file":
+            import pyarrow.ipc as ipc
+            return ipc.open_file(buffer).schema
+        if fmt == "parquet":
+            import pyarrow.parquet as pq
+            return pq.read_schema(pa.BufferReader(buffer))
+    except Exception as e:
+        raise ColumnarFormatError(f"No se pudo leer el esquema {fmt}: {e}")
+
+    raise UnsupportedFormatError(f"Formato columnar no soportado: {fmt}")
+
+
+def schema_metadata(schema) -> Dict[str, Any]:
+    """
+    Lee user_id, budgets y debts opcionales de los metadatos del esquema.
+    budgets y debts se guardan como JSON con la misma forma que en los endpoints JSON.
+    """
+    raw = schema.metadata or {}
+    metadata: Dict[str, Any] = {}
+
+    if b"user_id" in raw:
+        metadata["user_id"] = raw[b"user_id"].decode("utf-8")
+
+    for key in ("budgets", "debts"):
+        if key.encode() in raw:
+            try:
+                metadata[key] = json.loads(raw[key.encode()])
+            except ValueError:
+                raise ColumnarFormatError(f"Metadato '{key}' no es JSON válido")
+
+    return metadata
+
+
+def table_to_frame(table) -> "pd.DataFrame":
+    """
+    Convierte las columnas de transacciones a pandas. Las columnas numéricas y
+    de fecha sin nulos se convierten sin copias intermedias.
+    """
+    missing = [column for column in REQUIRED_COLUMNS if column not in table.column_names]
+    if missing:
+        raise ColumnarFormatError(f"Faltan columnas obligatorias: {', '.join(missing)}")
+
+    columns: List[str] = [column for column in TRANSACTION_COLUMNS if column in table.column_names]
+    return table.select(columns).to_pandas(date_as_object=False)
@@ -3,11 +3,54 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Sequence, Union
 import logging
+from utils.analysis_context import AnalysisContext
+from utils.array_context import ArrayAnalysisContext, TransactionArrays
+from utils import columnar
+from utils.metrics import timed_stage
+
+# Formatos de fecha aceptados, en el orden en que se prueban
+DATE_FORMATS = ['%Y-%m-%d', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M:%S.%f', '%d/%m/%Y']
+
+# Forma canónica (con ceros a la izquierda y horas, minutos y segundos en rango)
+# de cada formato. Solo las fechas con esta forma se convierten en bloque con
+# pandas, que para ellas coincide con strptime; las demás pasan por _parse_date
+# fila a fila (p. ej. pandas acepta el segundo 60, strptime no)
+_DATE = r'[0-9]{4}-[0-9]{2}-[0-9]{2}'
+_TIME = r'(?:[01][0-9]|2[0-3]):[0-5][0-9]:[0-5][0-9]'
+_CANONICAL_DATE_PATTERNS = {
+    '%Y-%m-%d': _DATE,
+    '%Y-%m-%dT%H:%M:%S': _DATE + 'T' + _TIME,
+    '%Y-%m-%dT%H:%M:%S.%f': _DATE + 'T' + _TIME + r'\.[0-9]{1,6}',
+    '%d/%m/%Y': r'[0-9]{2}/[0-9]{2}/[0-9]{4}',
+}
+
+# Tipos de transacción conocidos (vocabulario base de la columna categórica 'type')
+TRANSACTION_TYPES = ['expense', 'income', 'saving']
+
+# Por debajo de este tamaño el costo fijo de las operaciones en bloque supera
+# al parseo fila a fila
+_VECTORIZED_DATES_MIN_ROWS = 500
+
+# Orden de las filas limpias: por fecha y, entre las del mismo instante, por el
+# resto de columnas, para que el resultado no dependa del orden del payload
+# (filas iguales en todas ellas son intercambiables para los motores)
+TRANSACTION_SORT_KEYS = ['date', 'amount', 'category', 'type', 'description']
+
+# Frames desde este número de filas usan el esquema compacto (categóricas); con
+# menos, convertir las columnas cuesta más de lo que ahorran los groupby
+COMPACT_DTYPES_MIN_ROWS = 10_000
 
 class DataProcessor:
-    def __init__(self):
+    def __init__(self, float32_amounts: bool = False, small_payload_max_rows: int = 0,
+                 compact_dtypes_min_rows: int = COMPACT_DTYPES_MIN_ROWS):
+        # Montos en float32 (la mitad de memoria, a costa de precisión en sumas grandes)
+        self.float32_amounts = float32_amounts
+        # Payloads JSON de hasta este tamaño se analizan sobre arrays de NumPy (0 lo desactiva)
+        self.small_payload_max_rows = small_payload_max_rows
+        # Frames desde este tamaño usan el esquema compacto (0: siempre)
+        self.compact_dtypes_min_rows = compact_dtypes_min_rows
         self.category_mapping = {
             # Mapeo de categorías de transacciones a categorías de budget
             'food': 'FOOD',
@@ -24,28 +67,76 @@ class DataProcessor:
             'debt_repayment': 'DEBT_REPAYMENT'
         }
     
-    def process_transactions(self, transactions: List[Any]) -> pd.DataFrame:
+    def build_context(self, financial_data: Any, raw_transactions: Optional[pd.DataFrame] = None,
+                      history_version: Optional[str] = None) -> AnalysisContext:
+        """
+        Procesa el payload una sola vez y construye el contexto de análisis compartido.
+        raw_transactions permite pasar un historial ya en columnas (p. ej. el guardado),
+        y history_version su versión, para reutilizar los agregados entre solicitudes.
+        """
+        reference_date = datetime.now()
+        if raw_transactions is None and self._is_small_payload(financial_data):
+            return self.build_array_context(financial_data, reference_date)
+        if raw_transactions is not None:
+            transactions_df = self.process_transaction_frame(raw_transactions, reference_date)
+        elif hasattr(financial_data, 'transactions'):
+            transactions_df = self.process_transactions(financial_data.transactions, reference_date)
+        else:
+            transactions_df = self.process_columnar_transactions(
+                financial_data.data, financial_data.format, reference_date
+            )
+        budgets_df = self.process_budgets(financial_data.budgets) if financial_data.budgets else pd.DataFrame()
+        debts_df = self.process_debts(financial_data.debts) if financial_data.debts else pd.DataFrame()
+        
+        return AnalysisContext(transactions_df, budgets_df, debts_df, reference_date,
+                               user_id=financial_data.user_id, history_version=history_version)
+    
+    def _is_small_payload(self, financial_data: Any) -> bool:
+        """
+        Payload JSON con pocas transacciones (y montos en float64, que es lo que
+        reproducen los kernels de NumPy)
+        """
+        transactions = getattr(financial_data, 'transactions', None)
+        return (not self.float32_amounts and bool(transactions)
+                and len(transactions) <= self.small_payload_max_rows)
+    
+    def build_array_context(self, financial_data: Any,
+                            reference_date: Optional[datetime] = None) -> ArrayAnalysisContext:
+        """
+        Contexto sobre arrays de NumPy para payloads pequeños: mismas reglas de
+        limpieza que el frame, que solo se construye si algún motor lo pide
+        """
+        reference_date = reference_date or datetime.now()
+        columns = self.process_transaction_columns(financial_data.transactions)
+        arrays = TransactionArrays.from_columns(columns, reference_date) if columns else TransactionArrays.empty()
+        
+        return ArrayAnalysisContext(arrays, columns, self, financial_data.budgets, financial_data.debts,
+                                    reference_date, user_id=financial_data.user_id)
+    
+    @timed_stage("process_transaction_columns")
+    def process_transaction_columns(self, transactions: List[Any]) -> Optional[Dict[str, Any]]:
+        """Columnas normalizadas de las transacciones, con las fechas parseadas fila a fila"""
+        try:
+            if not transactions:
+                return None
+            return self._transaction_columns(transactions, datetime.now())
+            
+        except Exception as e:
+            logging.error(f"Error procesando transacciones: {e}")
+            return None
+    
+    @timed_stage("process_transactions")
+    def process_transactions(self, transactions: List[Any], reference_date: Optional[datetime] = None) -> pd.DataFrame:
         """Procesa las transacciones y las convierte en DataFrame para análisis"""
         try:
             if not transactions:
                 return pd.DataFrame()
             
-            # Convertir transacciones a lista de diccionarios
-            trans_data = []
-            for trans in transactions:
-                trans_dict = {
-                    'amount': float(trans.amount) if trans.amount else 0.0,
-                    'category': trans.category.lower() if trans.category else 'other',
-                    'description': trans.description or '',
-                    'type': trans.type.lower(),
-                    'date': self._parse_date(trans.date) if trans.date else datetime.now()
-                }
-                trans_data.append(trans_dict)
-            
-            df = pd.DataFrame(trans_data)
+            # Extraer los campos en columnas (una sola pasada sobre los objetos)
+            df = self._transactions_to_frame(transactions)
             
             # Limpiar y procesar datos
-            df = self._clean_transaction_data(df)
+            df = self._clean_transaction_data(df, reference_date)
             
             return df
             
@@ -53,6 +144,173 @@ class DataProcessor:
             logging.error(f"Error procesando transacciones: {e}")
             return pd.DataFrame()
     
+    def process_columnar_transactions(self, data: bytes, fmt: str,
+                                      reference_date: Optional[datetime] = None) -> pd.DataFrame:
+        """Procesa transacciones recibidas como Arrow IPC o Parquet"""
+        table = columnar.read_table(data, fmt)
+        return self.process_transaction_frame(columnar.table_to_frame(table), reference_date)
+    
+    @timed_stage("process_transaction_frame")
+    def process_transaction_frame(self, raw_df: pd.DataFrame,
+                                  reference_date: Optional[datetime] = None) -> pd.DataFrame:
+        """
+        Normaliza un DataFrame de transacciones ya en columnas, con las mismas
+        reglas que process_transactions, sin pasar por objetos por fila
+        """
+        try:
+            if raw_df.empty:
+                return pd.DataFrame()
+            
+            df = self._normalize_transaction_frame(raw_df, datetime.now())
+            return self._clean_transaction_data(df, reference_date)
+            
+        except Exception as e:
+            logging.error(f"Error procesando transacciones columnares: {e}")
+            return pd.DataFrame()
+    
+    def _normalize_transaction_frame(self, raw_df: pd.DataFrame, now: datetime) -> pd.DataFrame:
+        """Columnas normalizadas de un frame de transacciones, antes de la limpieza"""
+        return pd.DataFrame({
+            'amount': raw_df['amount'].astype(float).fillna(0.0),
+            'category': self._column_or_default(raw_df, 'category').fillna('').astype(str).str.lower().replace('', 'other'),
+            'description': self._column_or_default(raw_df, 'description').fillna('').astype(str),
+            'type': raw_df['type'].fillna('').astype(str).str.lower(),
+            'date': self._normalize_date_column(self._column_or_default(raw_df, 'date', None), now)
+        })
+
+    def _column_or_default(self, df: pd.DataFrame, column: str, default: Any = '') -> pd.Series:
+        if column in df.columns:
+            return df[column]
+        return pd.Series(default, index=df.index, dtype=object)
+    
+    def _normalize_date_column(self, dates: pd.Series, now: datetime) -> pd.Series:
+        """Fechas como datetime64 sin zona horaria; las vacías toman la fecha actual"""
+        if pd.api.types.is_datetime64_any_dtype(dates):
+            if getattr(dates.dt, 'tz', None) is not None:
+                dates = dates.dt.tz_localize(None)
+            return dates.astype('datetime64[ns]').fillna(now)
+        
+        return pd.Series(self._parse_date_values(dates, now).to_numpy(), index=dates.index)
+    
+    def _parse_date_values(self, values: Union[Sequence[Any], pd.Series], now: datetime) -> pd.Series:
+        """
+        Parsea una columna de fechas con las mismas reglas que _parse_date por fila
+        (las vacías toman ``now``). El formato se detecta una vez con la primera
+        fecha y se convierte en bloque; los otros formatos se prueban solo sobre
+        las que no coincidieron, y lo que queda se parsea fila a fila.
+        """
+        dates = pd.Series(values, dtype=object).reset_index(drop=True)
+        if len(dates) < _VECTORIZED_DATES_MIN_ROWS:
+            return pd.Series(pd.to_datetime([self._parse_date(value) if value else now for value in dates]))
+        
+        parsed = pd.Series(pd.NaT, index=dates.index, dtype='datetime64[ns]')
+        
+        # Misma condición que "if value" en el camino por fila
+        empty = ~dates.astype(bool)
+        pending = ~empty
+        
+        if pending.any():
+            detected = self._detect_date_format(dates[pending].iloc[0])
+            formats = ([detected] if detected else []) + [fmt for fmt in DATE_FORMATS if fmt != detected]
+            
+            for fmt in formats:
+                candidates = dates[pending]
+                matches = candidates.str.fullmatch(_CANONICAL_DATE_PATTERNS[fmt], na=False)
+                if not matches.any():
+                    continue
+                
+                converted = pd.to_datetime(candidates[matches], format=fmt, errors='coerce')
+                converted = converted[converted.notna()]
+                parsed[converted.index] = converted
+                pending[converted.index] = False
+                if not pending.any():
+                    break
+            
+            # Restos (fechas no canónicas o inválidas): mismo resultado que antes
+            for idx in pending[pending].index:
+                parsed[idx] = self._parse_date(dates[idx])
+        
+        parsed[empty] = now
+        return parsed
+    
+    def _detect_date_format(self, value: Any) -> Optional[str]:
+        """Primer formato de DATE_FORMATS que acepta el valor (None si ninguno)"""
+        for fmt in DATE_FORMATS:
+            try:
+                datetime.strptime(value, fmt)
+                return fmt
+            except (TypeError, ValueError):
+                continue
+        return None
+    
+    def process_batch_transactions(self, users: List[Any], reference_date: Optional[datetime] = None,
+                                   stored_transactions: Optional[Dict[int, pd.DataFrame]] = None) -> pd.DataFrame:
+        """
+        Procesa las transacciones de varios usuarios en un único DataFrame.
+        La columna 'user_key' guarda la posición del usuario dentro del lote.
+        stored_transactions agrega historiales ya en columnas (por posición).
+        """
+        try:
+            transactions, user_keys = [], []
+            for user_key, financial_data in enumerate(users):
+                user_transactions = financial_data.transactions or []
+                transactions.extend(user_transactions)
+                user_keys.extend([user_key] * len(user_transactions))
+            
+            frames = []
+            if transactions:
+                df = self._transactions_to_frame(transactions)
+                df['user_key'] = user_keys
+                frames.append(df)
+            
+            now = datetime.now()
+            for user_key, raw_df in (stored_transactions or {}).items():
+                if not raw_df.empty:
+                    frames.append(self._normalize_transaction_frame(raw_df, now).assign(user_key=user_key))
+            
+            if not frames:
+                return pd.DataFrame()
+            
+            df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+            return self._clean_transaction_data(df, reference_date)
+            
+        except Exception as e:
+            logging.error(f"Error procesando transacciones en lote: {e}")
+            return pd.DataFrame()
+    
+    def _transactions_to_frame(self, transactions: List[Any]) -> pd.DataFrame:
+        """
+        Convierte las transacciones en columnas normalizadas: montos vacíos a 0,
+        categoría en minúsculas ('other' si falta), tipo en minúsculas y fechas
+        parseadas en bloque (las vacías toman la fecha actual)
+        """
+        columns = self._transaction_columns(transactions)
+        columns['date'] = self._parse_date_values(columns['date'], datetime.now())
+        return pd.DataFrame(columns)
+    
+    def _transaction_columns(self, transactions: List[Any], now: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Extrae los campos de las transacciones en una sola pasada. Con ``now`` las
+        fechas se parsean fila a fila a datetime64 (las vacías toman ``now``);
+        sin él se devuelven tal como llegan
+        """
+        amounts, categories, descriptions, types, dates = zip(*[
+            (trans.amount, trans.category, trans.description, trans.type, trans.date)
+            for trans in transactions
+        ])
+        
+        amount = np.array(amounts, dtype=float)
+        if now is not None:
+            dates = np.array([self._parse_date(value) if value else now for value in dates], dtype='datetime64[ns]')
+        
+        return {
+            'amount': np.where(amount == 0, 0.0, amount),
+            'category': [category.lower() if category else 'other' for category in categories],
+            'description': [description or '' for description in descriptions],
+            'type': [trans_type.lower() for trans_type in types],
+            'date': dates
+        }
+    
     def process_budgets(self, budgets: List[Any]) -> pd.DataFrame:
         """Procesa los presupuestos"""
         try:
@@ -102,9 +360,7 @@ class DataProcessor:
         """Parsea fechas en diferentes formatos"""
         try:
             # Intentar diferentes formatos de fecha
-            formats = ['%Y-%m-%d', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M:%S.%f', '%d/%m/%Y']
-            
-            for fmt in formats:
+            for fmt in DATE_FORMATS:
                 try:
                     return datetime.strptime(date_str, fmt)
                 except ValueError:
@@ -116,37 +372,75 @@ class DataProcessor:
         except:
             return datetime.now()
     
-    def _clean_transaction_data(self, df: pd.DataFrame) -> pd.DataFrame:
+    @timed_stage("clean_transaction_data")
+    def _clean_transaction_data(self, df: pd.DataFrame, reference_date: Optional[datetime] = None) -> pd.DataFrame:
         """Limpia y valida los datos de transacciones"""
         try:
             if df.empty:
                 return df
             
             # Remover transacciones con montos negativos o zero para expenses
-            df = df[~((df['type'] == 'expense') & (df['amount'] <= 0))]
-            
-            # Convertir amounts negativos a positivos para expenses
-            df.loc[df['type'] == 'expense', 'amount'] = df.loc[df['type'] == 'expense', 'amount'].abs()
-            
-            # Agregar columnas de tiempo
-            df['day_of_week'] = df['date'].dt.dayofweek
-            df['month'] = df['date'].dt.month
-            df['week_of_year'] = df['date'].dt.isocalendar().week
-            df['days_ago'] = (datetime.now() - df['date']).dt.days
-            
-            # Normalizar categorías
-            df['category'] = df['category'].str.lower().str.strip()
-            
+            is_expense = df['type'] == 'expense'
+            keep = ~(is_expense & (df['amount'] <= 0))
+            df, is_expense = df[keep], is_expense[keep]
+            
+            # Columnas nuevas en un frame propio (assign), no sobre la selección
+            df = df.assign(
+                # Convertir amounts negativos a positivos para expenses
+                amount=df['amount'].where(~is_expense, df['amount'].abs()),
+                # Agregar columnas de tiempo
+                day_of_week=df['date'].dt.dayofweek,
+                month=df['date'].dt.month,
+                week_of_year=df['date'].dt.isocalendar().week,
+                days_ago=((reference_date or datetime.now()) - df['date']).dt.days,
+                # Normalizar categorías
+                category=df['category'].str.lower().str.strip(),
+            )
+            
+            # Ordenar por fecha (TRANSACTION_SORT_KEYS para desempatar) para que las
+            # ventanas de tiempo sean tramos contiguos
+            df = df.sort_values(TRANSACTION_SORT_KEYS, kind='stable', ignore_index=True)
+            
+            if len(df) >= self.compact_dtypes_min_rows:
+                return self._compact_dtypes(df)
+            if self.float32_amounts:
+                return df.astype({'amount': 'float32'})
             return df
             
         except Exception as e:
             logging.error(f"Error limpiando datos: {e}")
             return df
     
-    def generate_financial_summary(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def _compact_dtypes(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Esquema compacto del frame de transacciones: 'category' y 'type' como
+        categóricas (los groupby trabajan sobre códigos enteros en lugar de hashear
+        cadenas), columnas de tiempo en enteros pequeños y, opcionalmente, montos
+        en float32. El vocabulario se ordena alfabéticamente para que el orden de
+        los grupos sea el mismo que con cadenas.
+        """
+        return df.astype({
+            'category': self._categorical(df['category'], self.category_mapping.keys()),
+            'type': self._categorical(df['type'], TRANSACTION_TYPES),
+            'day_of_week': 'int8',
+            'month': 'int8',
+            'week_of_year': 'int8',
+            'days_ago': 'int32',
+            'amount': 'float32' if self.float32_amounts else 'float64',
+        })
+    
+    def _categorical(self, values: pd.Series, vocabulary: Any) -> pd.CategoricalDtype:
+        """Tipo categórico con el vocabulario conocido más los valores nuevos del lote"""
+        categories = set(vocabulary)
+        categories.update(values.dropna().unique())
+        return pd.CategoricalDtype(sorted(categories))
+    
+    def generate_financial_summary(self, data: Union[pd.DataFrame, AnalysisContext]) -> Dict[str, Any]:
         """Genera un resumen financiero basado en las transacciones"""
         try:
-            if df.empty:
+            context = AnalysisContext.ensure(data)
+            
+            if context.empty:
                 return {
                     "total_income": 0,
                     "total_expenses": 0,
@@ -156,40 +450,22 @@ class DataProcessor:
                     "average_expense": 0
                 }
             
-            # Calcular métricas básicas
-            income_df = df[df['type'] == 'income']
-            expense_df = df[df['type'] == 'expense']
-            
-            total_income = income_df['amount'].sum() if not income_df.empty else 0
-            total_expenses = expense_df['amount'].sum() if not expense_df.empty else 0
-            
-            # Breakdown por categorías
-            categories_breakdown = {}
-            if not expense_df.empty:
-                categories_breakdown = expense_df.groupby('category')['amount'].sum().to_dict()
-            
-            # Cálculos adicionales
-            avg_expense = expense_df['amount'].mean() if not expense_df.empty else 0
+            # Métricas básicas y breakdown por categorías desde el contexto compartido
+            total_income = context.total_income
+            total_expenses = context.total_expenses
+            categories_breakdown = context.expense_by_category
+            avg_expense = context.expense_mean
             
             # Tendencia de gastos (últimos 30 días vs anteriores)
-            thirty_days_ago = datetime.now() - timedelta(days=30)
-            recent_expenses = expense_df[expense_df['date'] >= thirty_days_ago]['amount'].sum()
-            older_expenses = expense_df[expense_df['date'] < thirty_days_ago]['amount'].sum()
-            
-            spending_trend = "stable"
-            if older_expenses > 0:
-                trend_ratio = recent_expenses / older_expenses
-                if trend_ratio > 1.2:
-                    spending_trend = "increasing"
-                elif trend_ratio < 0.8:
-                    spending_trend = "decreasing"
+            recent_expenses = context.recent_expenses_30d
+            spending_trend = context.spending_trend
             
             return {
                 "total_income": float(total_income),
                 "total_expenses": float(total_expenses),
                 "net_balance": float(total_income - total_expenses),
                 "categories_breakdown": {k: float(v) for k, v in categories_breakdown.items()},
-                "transaction_count": len(df),
+                "transaction_count": len(context),
                 "average_expense": float(avg_expense),
                 "recent_expenses_30d": float(recent_expenses),
                 "spending_trend": spending_trend,
@@ -200,18 +476,15 @@ class DataProcessor:
             logging.error(f"Error generando resumen: {e}")
             return {"error": "No se pudo generar el resumen financiero"}
     
-    def get_weekly_patterns(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def get_weekly_patterns(self, data: Union[pd.DataFrame, AnalysisContext]) -> Dict[str, Any]:
         """Analiza patrones de gasto por día de la semana"""
         try:
-            if df.empty:
-                return {}
-            
-            expense_df = df[df['type'] == 'expense']
-            if expense_df.empty:
+            context = AnalysisContext.ensure(data)
+            if context.expenses.empty:
                 return {}
             
             # Gastos por día de la semana
-            weekly_pattern = expense_df.groupby('day_of_week')['amount'].mean().to_dict()
+            weekly_pattern = context.expense_weekday_stats['mean'].to_dict()
             
             # Mapear números a nombres de días
             day_names = {0: 'monday', 1: 'tuesday', 2: 'wednesday', 3: 'thursday', 
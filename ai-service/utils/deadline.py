@@ -0,0 +1,64 @@
+#utils/deadline
+
+import time
+from typing import Any, Dict, Optional
+
+# Estado de cada etapa en el informe de un análisis con plazo
+COMPLETE = "complete"
+DEGRADED = "degraded"
+SKIPPED = "skipped"
+FAILED = "failed"
+CACHED = "cached"
+
+
+class Deadline:
+    """
+    Plazo de una solicitud. El instante límite se guarda en tiempo de reloj
+    (time.time) para que siga siendo válido en los workers del pool de procesos.
+    """
+
+    def __init__(self, budget_seconds: float, elapsed: float = 0.0):
+        self.budget_seconds = budget_seconds
+        # Lo ya consumido antes de crear el plazo (p. ej. la espera en la cola de admisión)
+        self.started_at = time.time() - elapsed
+        self.expires_at = self.started_at + budget_seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.time())
+
+    def elapsed(self) -> float:
+        return time.time() - self.started_at
+
+    @property
+    def expired(self) -> bool:
+        return time.time() >= self.expires_at
+
+    def fits(self, estimated_seconds: float) -> bool:
+        """Indica si una etapa con ese costo estimado termina antes del plazo"""
+        return self.remaining() >= estimated_seconds
+
+    def report(self, stages: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """Informe del análisis: estado de cada etapa y tiempo empleado"""
+        def with_status(status: str):
+            return [section for section, stage in stages.items() if stage["status"] == status]
+
+        degraded, skipped, failed = with_status(DEGRADED), with_status(SKIPPED), with_status(FAILED)
+        return {
+            "budget_ms": round(self.budget_seconds * 1000, 1),
+            "elapsed_ms": round(self.elapsed() * 1000, 1),
+            "complete": not (degraded or skipped or failed),
+            "degraded": degraded,
+            "skipped": skipped,
+            "failed": failed,
+            "stages": stages,
+        }
+
+
+def parse_deadline_ms(value: Optional[Any], elapsed: float = 0.0) -> Optional[Deadline]:
+    """Plazo a partir de milisegundos (query o header); ValueError si no es un número positivo"""
+    if value is None or value == "":
+        return None
+    budget_ms = float(value)
+    if not budget_ms > 0:
+        raise ValueError("El plazo debe ser un número positivo de milisegundos")
+    return Deadline(budget_ms / 1000, elapsed=elapsed)
@@ -0,0 +1,12 @@
+#utils/errors
+
+# Errores de las tareas de análisis. Viven en un módulo liviano para que el
+# proceso principal pueda traducirlos a HTTP sin importar pandas/scikit-learn.
+
+
+class InsufficientDataError(ValueError):
+    """No hay datos suficientes para ejecutar un motor (se traduce a HTTP 400)"""
+
+
+class HistoryNotFoundError(LookupError):
+    """El usuario no tiene historial guardado (se traduce a HTTP 404)"""
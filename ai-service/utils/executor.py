@@ -0,0 +1,145 @@
+#utils/executor
+
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+from utils import metrics
+
+
+class ExecutorSaturatedError(RuntimeError):
+    """Se lanza cuando el pool y su cola de espera están llenos"""
+
+
+def _warm_worker(run_warm_up: bool = False):
+    """Importa los motores al arrancar cada proceso del pool y, si se pide, los calienta"""
+    import utils.pipeline
+    if run_warm_up:
+        try:
+            utils.pipeline.warm_up()
+        except Exception as e:
+            logging.error(f"Error en el warm-up del worker {os.getpid()}: {e}")
+
+
+def _worker_pid() -> int:
+    return os.getpid()
+
+
+class ModelExecutor:
+    """
+    Ejecuta el trabajo de los modelos (pandas, scikit-learn) fuera del event loop.
+
+    Modos:
+        - "process": ProcessPoolExecutor acotado (por defecto)
+        - "thread": ThreadPoolExecutor acotado
+        - "inline": ejecuta en el propio event loop (depuración)
+
+    Como máximo hay ``max_workers + queue_depth`` tareas pendientes; a partir
+    de ahí ``run`` falla de inmediato con ``ExecutorSaturatedError``.
+    """
+
+    def __init__(self, mode: str = "process", max_workers: int = 1, queue_depth: int = 0,
+                 warm_up: bool = False):
+        if mode not in ("process", "thread", "inline"):
+            raise ValueError(f"Modo de ejecución no soportado: {mode}")
+
+        self.mode = mode
+        self.max_workers = max_workers
+        self.queue_depth = queue_depth
+        self.max_pending = max_workers + queue_depth
+        self.warm_up_workers = warm_up
+
+        self._pool: Optional[Executor] = None
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+
+    def start(self):
+        """Crea el pool si todavía no existe"""
+        if self._pool is not None or self.mode == "inline":
+            return
+
+        if self.mode == "process":
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_warm_worker,
+                initargs=(self.warm_up_workers,),
+            )
+        else:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="finwise-model",
+            )
+        logging.info(f"Pool de modelos iniciado: modo={self.mode}, workers={self.max_workers}, cola={self.queue_depth}")
+
+    def shutdown(self):
+        """Libera el pool esperando a que terminen las tareas en curso"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Ejecuta ``fn`` en el pool y espera su resultado sin bloquear el event loop"""
+        if self._pending >= self.max_pending:
+            self._rejected += 1
+            raise ExecutorSaturatedError("El servicio está procesando demasiadas solicitudes")
+
+        self._pending += 1
+        try:
+            # Las métricas por etapa registradas en el worker vuelven con el resultado
+            if self.mode == "inline":
+                result, samples = metrics.run_collecting(fn, *args, **kwargs)
+            else:
+                self.start()
+                loop = asyncio.get_running_loop()
+                result, samples = await loop.run_in_executor(
+                    self._pool, partial(metrics.run_collecting, fn, *args, **kwargs)
+                )
+            metrics.record_samples(samples)
+            return result
+        except Exception as e:
+            metrics.record_samples(getattr(e, "metric_samples", []))
+            raise
+        finally:
+            self._pending -= 1
+            self._completed += 1
+
+    async def warm_up(self) -> Dict[str, Any]:
+        """
+        Deja el pool listo para atender: con procesos, arranca todos los workers
+        (cada uno se calienta en su inicializador); con hilos o inline, calienta
+        los motores del propio proceso en un hilo aparte.
+        """
+        loop = asyncio.get_running_loop()
+
+        if self.mode != "process":
+            from utils import pipeline
+            # Las mediciones del warm-up no cuentan en /metrics
+            _, _ = await loop.run_in_executor(None, partial(metrics.run_collecting, pipeline.warm_up))
+            return {"workers": 1}
+
+        self.start()
+        # Una tarea por worker fuerza a arrancarlos todos; cada uno solo toma
+        # tareas después de terminar su inicializador
+        pids = await asyncio.gather(*[
+            loop.run_in_executor(self._pool, _worker_pid) for _ in range(self.max_workers)
+        ])
+        return {"workers": len(set(pids))}
+
+    def available(self) -> int:
+        """Tareas que todavía se pueden encolar antes de rechazar"""
+        return max(0, self.max_pending - self._pending)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "max_workers": self.max_workers,
+            "queue_depth": self.queue_depth,
+            "pending": self._pending,
+            "completed": self._completed,
+            "rejected": self._rejected,
+        }
@@ -0,0 +1,57 @@
+#utils/fast_json
+
+import json
+import sys
+from datetime import date, datetime
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional: sin él se usa json con el mismo conversor
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    """Tipos que el codificador no conoce: modelos pydantic y tipos de NumPy/pandas"""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+
+    # NumPy se consulta sin importarlo: si no está cargado, obj no puede ser de NumPy
+    np = sys.modules.get("numpy")
+    if np is not None:
+        if isinstance(obj, np.generic):
+            return obj.item()
+        if isinstance(obj, np.ndarray):
+            return obj.tolist()
+    if isinstance(obj, (datetime, date)):  # incluye pandas.Timestamp
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Tipo no serializable a JSON: {type(obj).__name__}")
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps(content: Any) -> bytes:
+        """Serializa a JSON compacto en UTF-8 (NumPy, fechas y modelos pydantic incluidos)"""
+        return orjson.dumps(content, default=_default, option=_ORJSON_OPTIONS)
+else:
+    def dumps(content: Any) -> bytes:
+        """Serializa a JSON compacto en UTF-8 (NumPy, fechas y modelos pydantic incluidos)"""
+        return json.dumps(
+            content, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Respuesta JSON que serializa directamente la salida de los motores, sin
+    pasar por jsonable_encoder ni por la validación del response_model.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,177 @@
+#utils/jobs
+
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+PENDING = "pending"
+DONE = "done"
+CACHED = "cached"  # La etapa no se ejecutó: el resultado salió del cache de respuestas
+
+
+class JobCapacityError(RuntimeError):
+    """No hay lugar para más trabajos (todos los guardados siguen en curso)"""
+
+
+class Job:
+    """Estado de un análisis asíncrono: etapas, progreso, resultado o error"""
+
+    def __init__(self, key: str, user_id: str, stages: List[str]):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.user_id = user_id
+        self.status = QUEUED
+        self.created_at = datetime.now()
+        self.updated_at = self.created_at
+        self.finished_at: Optional[datetime] = None
+        self.stages: Dict[str, Dict[str, Any]] = {stage: {"status": PENDING} for stage in stages}
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def start_stage(self, stage: str):
+        self.status = RUNNING
+        self.stages[stage] = {"status": RUNNING, "_started": time.perf_counter()}
+        self.updated_at = datetime.now()
+
+    def finish_stage(self, stage: str, status: str = DONE):
+        started = self.stages[stage].get("_started")
+        self.stages[stage] = {"status": status}
+        if started is not None:
+            self.stages[stage]["seconds"] = round(time.perf_counter() - started, 4)
+        self.updated_at = datetime.now()
+
+    @property
+    def progress(self) -> float:
+        done = sum(1 for stage in self.stages.values() if stage["status"] in (DONE, CACHED, FAILED))
+        return round(done / len(self.stages), 4) if self.stages else 1.0
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (COMPLETED, FAILED)
+
+    def to_dict(self, ttl: timedelta) -> Dict[str, Any]:
+        data = {
+            "job_id": self.id,
+            "user_id": self.user_id,
+            "status": self.status,
+            "progress": self.progress,
+            "stages": {
+                name: {k: v for k, v in stage.items() if not k.startswith("_")}
+                for name, stage in self.stages.items()
+            },
+            "created_at": self.created_at.isoformat(),
+            "updated_at": self.updated_at.isoformat(),
+        }
+        if self.finished_at is not None:
+            data["expires_at"] = (self.finished_at + ttl).isoformat()
+        if self.status == COMPLETED:
+            data["result"] = self.result
+        if self.status == FAILED:
+            data["error"] = self.error
+        return data
+
+
+class JobManager:
+    """
+    Trabajos de análisis en segundo plano, en memoria.
+
+    Los trabajos terminados se conservan ``ttl_seconds`` para que los
+    reintentos y las recargas de página consulten el mismo resultado; enviar
+    de nuevo el mismo payload (misma clave) mientras el trabajo existe
+    devuelve ese trabajo en lugar de crear otro. Como máximo se guardan
+    ``max_jobs``: se descartan primero los terminados más antiguos.
+    """
+
+    def __init__(self, ttl_seconds: int = 3600, max_jobs: int = 1000):
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.max_jobs = max_jobs
+        self._jobs: Dict[str, Job] = {}
+        self._by_key: Dict[str, str] = {}
+
+    def submit(self, key: str, user_id: str, stages: List[str],
+               run: Callable[[Job], Awaitable[Any]]) -> Tuple[Job, bool]:
+        """
+        Crea el trabajo y lanza ``run(job)`` en segundo plano. Devuelve el trabajo
+        y si es nuevo (False cuando se reutiliza uno existente con la misma clave).
+        """
+        self._purge()
+
+        existing = self._jobs.get(self._by_key.get(key, ""))
+        if existing is not None and existing.status != FAILED:
+            return existing, False
+
+        self._make_room()
+        job = Job(key, user_id, stages)
+        self._jobs[job.id] = job
+        self._by_key[key] = job.id
+        job.task = asyncio.ensure_future(self._execute(job, run))
+        return job, True
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._purge()
+        return self._jobs.get(job_id)
+
+    def cancel_all(self):
+        for job in self._jobs.values():
+            if job.task is not None and not job.task.done():
+                job.task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        counts: Dict[str, int] = {}
+        for job in self._jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {"jobs": len(self._jobs), "by_status": counts, "ttl_seconds": int(self.ttl.total_seconds())}
+
+    async def _execute(self, job: Job, run: Callable[[Job], Awaitable[Any]]):
+        try:
+            job.result = await run(job)
+            job.status = COMPLETED
+        except asyncio.CancelledError:
+            job.status = FAILED
+            job.error = "Trabajo cancelado"
+            raise
+        except Exception as e:
+            logging.error(f"Error en el trabajo {job.id}: {e}")
+            job.status = FAILED
+            job.error = getattr(e, "detail", None) or str(e)
+        finally:
+            for name, stage in job.stages.items():
+                if stage["status"] == RUNNING:
+                    job.finish_stage(name, FAILED)
+            job.finished_at = job.updated_at = datetime.now()
+
+    def _purge(self):
+        now = datetime.now()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and now >= job.finished_at + self.ttl
+        ]
+        for job_id in expired:
+            self._remove(job_id)
+
+    def _make_room(self):
+        if len(self._jobs) < self.max_jobs:
+            return
+
+        finished = sorted(
+            (job for job in self._jobs.values() if job.finished),
+            key=lambda job: job.finished_at,
+        )
+        if not finished:
+            raise JobCapacityError("Demasiados trabajos en curso, intenta más tarde")
+        for job in finished[:len(self._jobs) - self.max_jobs + 1]:
+            self._remove(job.id)
+
+    def _remove(self, job_id: str):
+        job = self._jobs.pop(job_id, None)
+        if job is not None and self._by_key.get(job.key) == job_id:
+            del self._by_key[job.key]
@@ -0,0 +1,39 @@
+#utils/lazy_import
+
+import importlib
+from typing import Any
+
+
+class DeferredFunction:
+    """
+    Referencia serializable a una función de módulo (nombre del módulo + nombre
+    de la función). El módulo se importa al llamarla, no al crear la referencia:
+    el proceso principal puede pasarla al pool sin importar el módulo y solo el
+    worker que la ejecuta lo carga.
+    """
+
+    def __init__(self, module: str, name: str):
+        self.module = module
+        self.name = name
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        return getattr(importlib.import_module(self.module), self.name)(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        return f"DeferredFunction({self.module}.{self.name})"
+
+
+class DeferredModule:
+    """
+    Representante de un módulo que no se importa en este proceso: cada atributo
+    es una DeferredFunction. Solo sirve para funciones; las constantes que el
+    proceso principal necesita deben vivir en un módulo liviano.
+    """
+
+    def __init__(self, module: str):
+        self._module = module
+
+    def __getattr__(self, name: str) -> DeferredFunction:
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return DeferredFunction(self._module, name)
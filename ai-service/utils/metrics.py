@@ -0,0 +1,212 @@
+#utils/metrics
+
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# Buckets de latencia en segundos (de 1 ms a 30 s)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Buckets de tamaño de historial (número de transacciones)
+SIZE_BUCKETS = (0, 10, 50, 100, 500, 1000, 5000, 10000, 50000, 100000)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Contador monótono con etiquetas"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: Any):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Histograma acumulativo con etiquetas (formato de exposición de Prometheus)"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series: Dict[LabelValues, List[float]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            counts = self._series.get(key)
+            if counts is None:
+                counts = self._series[key] = [0] * len(self.buckets)
+                self._sums[key] = 0.0
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._sums[key] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key in sorted(self._series):
+                counts = self._series[key]
+                for bound, count in zip(self.buckets, counts):
+                    le = f'le="{_format_value(bound)}"'
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {count}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(self._sums[key])}")
+                lines.append(f"{self.name}_count{labels} {counts[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    """Conjunto de métricas del proceso, expuesto en /metrics"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._metrics.setdefault(name, Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(name, documentation, labelnames, buckets))
+
+    def get(self, name: str) -> Optional[Any]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_requests = registry.counter(
+    "finwise_http_requests_total", "Solicitudes HTTP atendidas", ("method", "route", "status"))
+http_latency = registry.histogram(
+    "finwise_http_request_duration_seconds", "Latencia de las solicitudes HTTP por ruta", ("method", "route"))
+coalesced_requests = registry.counter(
+    "finwise_coalesced_requests_total", "Solicitudes que compartieron una ejecución en curso", ("task",))
+stage_latency = registry.histogram(
+    "finwise_stage_duration_seconds", "Duración de cada etapa del análisis (parseo, limpieza, detectores, ajustes)",
+    ("stage",))
+admission_wait = registry.histogram(
+    "finwise_admission_queue_wait_seconds", "Espera en la cola de admisión por carril", ("lane",))
+admission_compute = registry.histogram(
+    "finwise_admission_compute_seconds", "Tiempo de atención una vez admitida la solicitud, por carril", ("lane",))
+admission_rejected = registry.counter(
+    "finwise_admission_rejected_total", "Solicitudes rechazadas por la admisión", ("lane", "status"))
+payload_size = registry.histogram(
+    "finwise_payload_transactions", "Transacciones por análisis (tamaño del historial)", ("source",), SIZE_BUCKETS)
+deadline_stages = registry.counter(
+    "finwise_deadline_stages_total", "Etapas de análisis con plazo por estado (complete, degraded, skipped, failed, cached)",
+    ("section", "status"))
+
+
+# Las etapas pueden ejecutarse en un worker del pool (otro proceso). Mientras
+# una tarea se ejecuta con run_collecting, las observaciones se acumulan en el
+# hilo actual y vuelven al proceso principal junto con el resultado.
+
+Sample = Tuple[str, float, Dict[str, str]]
+
+_local = threading.local()
+
+
+def observe(metric: str, value: float, **labels: Any):
+    """Registra una observación en un histograma del registro (o en la tarea en curso)"""
+    samples = getattr(_local, "samples", None)
+    if samples is not None:
+        samples.append((metric, value, {k: str(v) for k, v in labels.items()}))
+        return
+
+    histogram = registry.get(metric)
+    if histogram is not None:
+        histogram.observe(value, **labels)
+
+
+def record_samples(samples: List[Sample]):
+    """Vuelca en el registro del proceso principal las observaciones de una tarea"""
+    for metric, value, labels in samples:
+        histogram = registry.get(metric)
+        if histogram is not None:
+            histogram.observe(value, **labels)
+
+
+def run_collecting(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Tuple[Any, List[Sample]]:
+    """
+    Ejecuta ``fn`` y devuelve su resultado junto con las observaciones que generó.
+    Si ``fn`` falla, las observaciones viajan en el atributo ``metric_samples``
+    de la excepción.
+    """
+    previous = getattr(_local, "samples", None)
+    _local.samples = []
+    try:
+        result = fn(*args, **kwargs)
+        return result, _local.samples
+    except Exception as e:
+        e.metric_samples = _local.samples
+        raise
+    finally:
+        _local.samples = previous
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """Mide la duración de un bloque como etapa del análisis"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage_latency.name, time.perf_counter() - start, stage=stage)
+
+
+def timed_stage(stage: str):
+    """Decorador equivalente a stage_timer para métodos completos"""
+    def decorator(fn: Callable[..., Any]) -> Callable[..., Any]:
+        @wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with stage_timer(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def observe_payload(transaction_count: int, source: str):
+    observe(payload_size.name, transaction_count, source=source)
@@ -0,0 +1,222 @@
+#utils/model_registry
+
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, MutableMapping, Set, Tuple
+
+# Clave de una entrada dentro de una vista: (usuario, nombre del modelo)
+ModelKey = Tuple[str, str]
+
+
+class ModelRegistry:
+    """
+    Modelos ajustados de los motores del proceso (el predictor; el detector de
+    anomalías no guarda estado), con memoria acotada.
+
+    - LRU con presupuesto en bytes (tamaño serializado de cada entrada).
+    - TTL desde el último acceso: los modelos de usuarios inactivos caducan.
+    - Invalidación explícita de todas las entradas de un usuario cuando cambian
+      sus datos.
+
+    Cada motor usa una vista por espacio de nombres (``view("predictor.models")``)
+    que se comporta como un diccionario con claves (usuario, nombre).
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl_seconds: int = 3600):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+
+        # (espacio, usuario, nombre) -> (valor, tamaño, último acceso), en orden de acceso
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[Any, int, float]]" = OrderedDict()
+        self._owners: Dict[str, Set[Tuple[str, str, str]]] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def view(self, namespace: str) -> "RegistryView":
+        return RegistryView(self, namespace)
+
+    def invalidate(self, user_id: str) -> int:
+        """Elimina las entradas de un usuario en todos los espacios; devuelve cuántas"""
+        with self._lock:
+            keys = list(self._owners.get(user_id, ()))
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._owners.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._expire(time.monotonic())
+            lookups = self.hits + self.misses
+            namespaces: Dict[str, int] = {}
+            for namespace, _, _ in self._entries:
+                namespaces[namespace] = namespaces.get(namespace, 0) + 1
+            return {
+                "entries": len(self._entries),
+                "users": len(self._owners),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "namespaces": namespaces,
+            }
+
+    # Operaciones de las vistas
+
+    def _get(self, key: Tuple[str, str, str], count: bool = True) -> Tuple[bool, Any]:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(key)
+            if entry is None:
+                if count:
+                    self.misses += 1
+                return False, None
+            value, size, _ = entry
+            self._entries[key] = (value, size, now)
+            self._entries.move_to_end(key)
+            if count:
+                self.hits += 1
+            return True, value
+
+    def _put(self, key: Tuple[str, str, str], value: Any):
+        try:
+            size = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception as e:
+            logging.error(f"Modelo no serializable para el registro: {e}")
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                return
+
+            self._entries[key] = (value, size, now)
+            self._owners.setdefault(key[1], set()).add(key)
+            self._bytes += size
+
+            # Caducadas primero; después, las menos usadas hasta respetar el presupuesto
+            self._expire(now)
+            while self._bytes > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _delete(self, key: Tuple[str, str, str]) -> bool:
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._remove(key)
+            return True
+
+    def _keys(self, namespace: str) -> List[ModelKey]:
+        with self._lock:
+            return [(user, name) for space, user, name in self._entries if space == namespace]
+
+    def _owned(self, namespace: str, user_id: str) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            owned = {}
+            for key in self._owners.get(user_id, ()):
+                if key[0] == namespace:
+                    value, size, _ = self._entries[key]
+                    self._entries[key] = (value, size, now)
+                    self._entries.move_to_end(key)
+                    owned[key[2]] = value
+            return owned
+
+    def _discard(self, namespace: str, user_id: str):
+        with self._lock:
+            for key in [key for key in self._owners.get(user_id, ()) if key[0] == namespace]:
+                self._remove(key)
+
+    # Con el lock tomado
+
+    def _expire(self, now: float):
+        """Quita las entradas sin acceso durante el TTL (las primeras en orden de acceso)"""
+        if self.ttl_seconds <= 0:
+            return
+        while self._entries:
+            key = next(iter(self._entries))
+            if now - self._entries[key][2] < self.ttl_seconds:
+                break
+            self._remove(key)
+            self.expirations += 1
+
+    def _remove(self, key: Tuple[str, str, str]):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+        owned = self._owners.get(key[1])
+        if owned is not None:
+            owned.discard(key)
+            if not owned:
+                del self._owners[key[1]]
+
+
+class RegistryView(MutableMapping):
+    """Diccionario de un espacio de nombres del registro, con claves (usuario, nombre)"""
+
+    def __init__(self, registry: ModelRegistry, namespace: str):
+        self.registry = registry
+        self.namespace = namespace
+
+    def _key(self, key: ModelKey) -> Tuple[str, str, str]:
+        user_id, name = key
+        return (self.namespace, user_id, name)
+
+    def __getitem__(self, key: ModelKey) -> Any:
+        found, value = self.registry._get(self._key(key))
+        if not found:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: ModelKey, value: Any):
+        self.registry._put(self._key(key), value)
+
+    def __delitem__(self, key: ModelKey):
+        if not self.registry._delete(self._key(key)):
+            raise KeyError(key)
+
+    def __contains__(self, key: Any) -> bool:
+        # Sin contar como acierto ni fallo
+        return isinstance(key, tuple) and len(key) == 2 and self.registry._get(self._key(key), count=False)[0]
+
+    def __iter__(self) -> Iterator[ModelKey]:
+        return iter(self.registry._keys(self.namespace))
+
+    def __len__(self) -> int:
+        return len(self.registry._keys(self.namespace))
+
+    def owned(self, user_id: str) -> Dict[str, Any]:
+        """Entradas de un usuario en este espacio, por nombre"""
+        return self.registry._owned(self.namespace, user_id)
+
+    def discard(self, user_id: str):
+        """Elimina las entradas de un usuario en este espacio"""
+        self.registry._discard(self.namespace, user_id)
+
+    def clear(self):
+        for key in list(self):
+            self.registry._delete(self._key(key))
@@ -0,0 +1,510 @@
+#utils/pipeline
+
+import logging
+import os
+import pickle
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple, Union
+from models.predictor import ExpensePredictor
+from models.anomaly_detector import AnomalyDetector
+from models.recommender import FinancialRecommender
+from utils.data_processor import DataProcessor
+from utils.analysis_context import AnalysisContext
+from utils.array_context import TransactionArrays
+from utils.spending_cube import CubeCache
+from utils.model_registry import ModelRegistry
+from utils.batch_analysis import BatchAnalyzer
+from data.model_storage import ModelStorage
+from data.transaction_store import TransactionStore
+from config import settings
+from utils import metrics
+from utils.deadline import Deadline, COMPLETE, DEGRADED, SKIPPED, FAILED
+from utils.sections import STREAM_SECTIONS
+from utils.errors import InsufficientDataError, HistoryNotFoundError
+from schemas import (
+    BatchFinancialData,
+    Budget,
+    ColumnarFinancialData,
+    Debt,
+    ForecastRequest,
+    ForecastResponse,
+    HorizonForecast,
+    Transaction,
+    TransactionDelta,
+    UserFinancialData,
+    PredictionResponse,
+    AnomalyResponse,
+    RecommendationResponse,
+)
+
+# Payload JSON o columnar: DataProcessor.build_context acepta ambos
+FinancialPayload = Union[UserFinancialData, ColumnarFinancialData]
+
+
+# Cubos día × categoría compartidos por los contextos de este proceso
+if settings.cube_cache_max_bytes:
+    AnalysisContext.cube_cache = CubeCache(settings.cube_cache_max_bytes)
+
+# Modelos ajustados del predictor, con memoria acotada
+model_registry = ModelRegistry(settings.model_registry_max_bytes, settings.model_registry_ttl_seconds)
+
+# Motores de IA, uno por proceso (en el proceso principal o en cada worker del pool)
+predictor = ExpensePredictor(
+    model_registry,
+    ModelStorage(settings.model_storage_dir) if settings.model_storage_dir else None,
+)
+anomaly_detector = AnomalyDetector()
+recommender = FinancialRecommender()
+data_processor = DataProcessor(float32_amounts=settings.float32_amounts,
+                               small_payload_max_rows=settings.small_payload_max_rows,
+                               compact_dtypes_min_rows=settings.compact_dtypes_min_rows)
+batch_analyzer = BatchAnalyzer(data_processor, predictor, recommender)
+transaction_store = TransactionStore(settings.transaction_store_url, parse_date=data_processor._parse_date)
+
+
+def build_context(financial_data: FinancialPayload, record_size: bool = True) -> AnalysisContext:
+    """
+    Contexto de análisis para un payload. Si el payload no trae transacciones
+    se usa el historial guardado del usuario (y sus budgets/deudas si el
+    payload no envía otros).
+    """
+    if getattr(financial_data, "transactions", []) is not None:
+        context = data_processor.build_context(financial_data)
+        source = "json" if hasattr(financial_data, "transactions") else "columnar"
+        if record_size:
+            metrics.observe_payload(len(context), source)
+        return context
+
+    stored, transactions, version = load_stored_history(financial_data)
+    context = data_processor.build_context(stored, transactions, history_version=version)
+    if record_size:
+        metrics.observe_payload(len(context), "stored")
+    return context
+
+
+def load_stored_history(financial_data: UserFinancialData) -> Tuple[UserFinancialData, Any, Optional[str]]:
+    """
+    Historial guardado de un payload sin transacciones: el payload con los
+    budgets/deudas guardados (si no envía otros), las transacciones en columnas
+    y la versión (None si el historial cambió mientras se leía)
+    """
+    profile = transaction_store.load_profile(financial_data.user_id)
+    if profile is None:
+        raise HistoryNotFoundError(f"No hay historial guardado para el usuario {financial_data.user_id}")
+
+    stored = financial_data.model_copy(update={
+        "budgets": financial_data.budgets or [Budget(**b) for b in profile["budgets"]],
+        "debts": financial_data.debts or [Debt(**d) for d in profile["debts"]],
+    })
+    transactions = transaction_store.load_transactions(financial_data.user_id)
+    # Los agregados se comparten por versión solo si el historial no cambió mientras se leía
+    current = transaction_store.load_profile(financial_data.user_id)
+    version = str(profile["version"]) if current and current["version"] == profile["version"] else None
+    return stored, transactions, version
+
+
+def build_prediction_response(context: AnalysisContext, user_id: str, degraded: bool = False) -> PredictionResponse:
+    """Genera la respuesta de predicción a partir del contexto de análisis"""
+    if len(context) == 0:
+        raise InsufficientDataError("No hay suficientes datos para realizar predicciones")
+
+    # Generar predicciones (solo estadísticas en modo degradado)
+    predictions = predictor.predict_weekly_expenses(context, user_id, statistical=degraded)
+
+    return PredictionResponse(
+        user_id=user_id,
+        period="next_week",
+        predicted_expenses=predictions["by_category"],
+        total_predicted=predictions["total"],
+        confidence_score=predictions["confidence"]
+    )
+
+
+def build_forecast_response(context: AnalysisContext, user_id: str,
+                            horizons: Optional[List[str]] = None) -> ForecastResponse:
+    """Proyección de gastos para varios horizontes con un solo ajuste de modelos"""
+    if len(context) == 0:
+        raise InsufficientDataError("No hay suficientes datos para realizar predicciones")
+
+    horizons = horizons or ForecastRequest.model_fields["horizons"].default
+    forecast = predictor.forecast_expenses(context, user_id, horizons)
+
+    return ForecastResponse(
+        user_id=user_id,
+        forecasts={
+            horizon: HorizonForecast(
+                days=prediction["days"],
+                predicted_expenses=prediction["by_category"],
+                total_predicted=prediction["total"],
+                confidence_score=prediction["confidence"]
+            )
+            for horizon, prediction in forecast["forecasts"].items()
+        },
+        unavailable=forecast["unavailable"]
+    )
+
+
+def build_anomaly_response(context: AnalysisContext, user_id: str, degraded: bool = False) -> AnomalyResponse:
+    """Genera la respuesta de anomalías a partir del contexto de análisis"""
+    if len(context) < 5:  # Necesitamos al menos 5 transacciones
+        return AnomalyResponse(
+            user_id=user_id,
+            anomalies=[],
+            risk_score=0.0
+        )
+
+    anomalies = anomaly_detector.detect_anomalies(context, user_id, statistical=degraded)
+
+    return AnomalyResponse(
+        user_id=user_id,
+        anomalies=anomalies["anomalies"],
+        risk_score=anomalies["risk_score"]
+    )
+
+
+def build_recommendation_response(context: AnalysisContext, user_id: str) -> RecommendationResponse:
+    """Genera la respuesta de recomendaciones a partir del contexto de análisis"""
+    recommendations = recommender.generate_recommendations(context, user_id=user_id)
+
+    return RecommendationResponse(
+        user_id=user_id,
+        recommendations=recommendations["recommendations"],
+        priority_score=recommendations["priority_score"]
+    )
+
+
+def build_summary(context: AnalysisContext, user_id: str) -> Dict[str, Any]:
+    """Resumen financiero general (la sección más barata)"""
+    return data_processor.generate_financial_summary(context)
+
+
+# Secciones del análisis completo, en el orden de la respuesta combinada
+# (utils.sections.ANALYSIS_SECTIONS); el orden en streaming es STREAM_SECTIONS
+SECTION_BUILDERS = {
+    "predictions": build_prediction_response,
+    "anomalies": build_anomaly_response,
+    "recommendations": build_recommendation_response,
+    "summary": build_summary,
+}
+
+
+# Modo de cada sección según el plazo: completo y, si lo hay, uno degradado
+# más barato. Las secciones sin modo degradado se omiten si no caben.
+SECTION_MODES = {
+    "summary": ("full", None),
+    "recommendations": ("full", None),
+    "predictions": ("ml", "statistical"),
+    "anomalies": ("isolation_forest", "zscore"),
+}
+
+# Costo estimado (segundos fijos, segundos por transacción) de cada modo, medido
+# con `python -m benchmarks` y redondeado hacia arriba
+STAGE_COSTS = {
+    ("summary", "full"): (0.005, 1e-6),
+    ("recommendations", "full"): (0.01, 2e-6),
+    ("predictions", "ml"): (0.06, 2e-6),
+    ("predictions", "statistical"): (0.02, 2e-6),
+    ("anomalies", "isolation_forest"): (0.25, 3.5e-5),
+    ("anomalies", "zscore"): (0.025, 7e-6),
+}
+
+
+def estimate_cost(section: str, mode: str, transaction_count: int) -> float:
+    fixed, per_transaction = STAGE_COSTS[(section, mode)]
+    return fixed + per_transaction * transaction_count
+
+
+def plan_section(section: str, context: AnalysisContext, deadline: Deadline) -> Optional[str]:
+    """
+    Modo en que se ejecuta una sección con el tiempo que queda: el completo si
+    cabe, si no el degradado, y None para omitirla. El resumen siempre se calcula.
+    """
+    full, degraded = SECTION_MODES[section]
+    if section == "summary" or deadline.fits(estimate_cost(section, full, len(context))):
+        return full
+    if degraded and deadline.fits(estimate_cost(section, degraded, len(context))):
+        return degraded
+    return None
+
+
+def build_section(section: str, context: AnalysisContext, user_id: str) -> Any:
+    """
+    Una sección del análisis completo. Como en la respuesta combinada, un
+    error en predicciones, anomalías o recomendaciones deja la sección en None.
+    """
+    if section == "summary":
+        return build_summary(context, user_id)
+
+    try:
+        return SECTION_BUILDERS[section](context, user_id)
+    except Exception as e:
+        logging.error(f"Error en la sección {section} del análisis para {user_id}: {e}")
+        return None
+
+
+def run_stage(section: str, context: AnalysisContext, user_id: str,
+              deadline: Deadline) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Una sección con plazo. Devuelve el resultado (None si se omitió o falló)
+    y el estado de la etapa para el informe de la respuesta.
+    """
+    mode = plan_section(section, context, deadline)
+    if mode is None:
+        return None, {"status": SKIPPED}
+
+    is_degraded = mode != SECTION_MODES[section][0]
+    stage = {"status": DEGRADED if is_degraded else COMPLETE, "mode": mode}
+    start = time.perf_counter()
+    try:
+        if is_degraded:
+            result = SECTION_BUILDERS[section](context, user_id, degraded=True)
+        else:
+            result = SECTION_BUILDERS[section](context, user_id)
+    except Exception as e:
+        if section == "summary":
+            raise
+        logging.error(f"Error en la sección {section} del análisis para {user_id}: {e}")
+        result = None
+        stage = {"status": FAILED, "mode": mode, "error": str(e)}
+    stage["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return result, stage
+
+
+def build_financial_analysis(context: AnalysisContext, user_id: str,
+                             deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+    """
+    Análisis completo sobre un contexto ya construido. Con un plazo, las
+    secciones se ejecutan de la más barata a la más costosa, degradándose u
+    omitiéndose según el tiempo restante, y la respuesta incluye el informe
+    "deadline" con el estado de cada una.
+    """
+    if deadline is None:
+        results = {
+            section: build_section(section, context, user_id)
+            for section in SECTION_BUILDERS
+        }
+
+        return {
+            "user_id": user_id,
+            "analysis_date": datetime.now().isoformat(),
+            "results": results
+        }
+
+    results, stages = {}, {}
+    for section in STREAM_SECTIONS:
+        results[section], stages[section] = run_stage(section, context, user_id, deadline)
+
+    return {
+        "user_id": user_id,
+        "analysis_date": datetime.now().isoformat(),
+        "results": {section: results[section] for section in SECTION_BUILDERS},
+        "deadline": deadline.report(stages)
+    }
+
+
+TASKS = {
+    "summary": build_summary,
+    "prediction": build_prediction_response,
+    "forecast": build_forecast_response,
+    "anomalies": build_anomaly_response,
+    "recommendations": build_recommendation_response,
+    "financial_analysis": build_financial_analysis,
+}
+
+
+# Tareas completas (parseo + motor). Son funciones de módulo para que el
+# pool de procesos pueda serializarlas y ejecutarlas fuera del event loop.
+
+def run_task(task: str, financial_data: FinancialPayload, with_validity: bool = False,
+             deadline: Optional[Deadline] = None) -> Any:
+    """
+    Ejecuta una tarea de TASKS con un único contexto. Con with_validity devuelve
+    también el instante hasta el que el resultado sigue siendo válido. El plazo
+    solo lo admite el análisis completo y los horizontes, la proyección.
+    """
+    context = build_context(financial_data)
+    if deadline is not None:
+        result = TASKS[task](context, financial_data.user_id, deadline=deadline)
+    elif isinstance(financial_data, ForecastRequest):
+        result = TASKS[task](context, financial_data.user_id, horizons=financial_data.horizons)
+    else:
+        result = TASKS[task](context, financial_data.user_id)
+    return (result, context.valid_until) if with_validity else result
+
+
+def run_prediction(financial_data: FinancialPayload) -> PredictionResponse:
+    return run_task("prediction", financial_data)
+
+
+def run_anomaly_detection(financial_data: FinancialPayload) -> AnomalyResponse:
+    return run_task("anomalies", financial_data)
+
+
+def run_recommendations(financial_data: FinancialPayload) -> RecommendationResponse:
+    return run_task("recommendations", financial_data)
+
+
+def run_financial_analysis(financial_data: FinancialPayload) -> Dict[str, Any]:
+    """Análisis completo con un solo parseo y un solo contexto compartido"""
+    return run_task("financial_analysis", financial_data)
+
+
+def run_parse(financial_data: FinancialPayload,
+              packed: bool = False) -> Tuple[Union[AnalysisContext, bytes], datetime]:
+    """
+    Etapa de parseo de los trabajos asíncronos y del streaming: el contexto
+    viaja a las secciones. Con ``packed`` viaja ya serializado, para que el proceso principal
+    lo reenvíe a los workers sin deserializarlo (ni importar pandas).
+    """
+    context = build_context(financial_data)
+    if packed:
+        return pickle.dumps(context, protocol=pickle.HIGHEST_PROTOCOL), context.valid_until
+    return context, context.valid_until
+
+
+def run_context_section(section: str, context: Union[AnalysisContext, bytes], user_id: str) -> Any:
+    """Una sección del análisis completo sobre un contexto ya parseado"""
+    if isinstance(context, bytes):
+        context = pickle.loads(context)
+    return build_section(section, context, user_id)
+
+
+def run_context_stage(section: str, context: Union[AnalysisContext, bytes], user_id: str,
+                      deadline: Deadline) -> Tuple[Any, Dict[str, Any]]:
+    """Como run_context_section, con plazo: devuelve también el estado de la etapa"""
+    if isinstance(context, bytes):
+        context = pickle.loads(context)
+    return run_stage(section, context, user_id, deadline)
+
+
+def run_batch_analysis(batch: BatchFinancialData) -> Dict[str, Any]:
+    """
+    Análisis vectorizado de varios usuarios con un único DataFrame. Los
+    usuarios sin transacciones en el payload usan su historial guardado; si no
+    lo tienen, su resultado lleva el error en lugar del análisis
+    """
+    users, stored_transactions, errors = [], {}, {}
+    for user_key, financial_data in enumerate(batch.users):
+        if financial_data.transactions is None:
+            try:
+                financial_data, stored_transactions[user_key], _ = load_stored_history(financial_data)
+            except HistoryNotFoundError as e:
+                errors[user_key] = str(e)
+            metrics.observe_payload(len(stored_transactions.get(user_key, ())), "batch")
+        else:
+            metrics.observe_payload(len(financial_data.transactions), "batch")
+        users.append(financial_data)
+
+    results = batch_analyzer.analyze(users, stored_transactions)
+    for user_key, error in errors.items():
+        results[user_key] = {"user_id": users[user_key].user_id, "results": None, "error": error}
+
+    return {
+        "analysis_date": datetime.now().isoformat(),
+        "users": results
+    }
+
+
+def run_store_delta(user_id: str, delta: TransactionDelta) -> Dict[str, Any]:
+    """Aplica altas, cambios y bajas sobre el historial guardado del usuario"""
+    result = transaction_store.apply_delta(
+        user_id,
+        delta.transactions,
+        deleted_ids=delta.deleted_ids,
+        budgets=[b.model_dump() for b in delta.budgets] if delta.budgets is not None else None,
+        debts=[d.model_dump() for d in delta.debts] if delta.debts is not None else None,
+    )
+    update_predictor_models(user_id, delta.transactions, result)
+    return result
+
+
+def update_predictor_models(user_id: str, transactions: List[Transaction], result: Dict[str, Any]):
+    """
+    Con altas puras (y fechadas) los modelos del predictor incorporan los
+    gastos nuevos sin reajustar. Con cambios, bajas o fechas que asigna el
+    almacén se descartan y la próxima predicción ajusta con el historial.
+    """
+    only_inserts = (not result["updated"] and not result["deleted"]
+                    and result["inserted"] == len(transactions)
+                    and all(trans.date for trans in transactions))
+    if not only_inserts:
+        model_registry.invalidate(user_id)
+        predictor.discard_models(user_id)
+        return
+
+    expenses = TransactionArrays.empty()
+    if transactions:
+        now = datetime.now()
+        columns = data_processor._transaction_columns(transactions, now=now)
+        expenses = TransactionArrays.from_columns(columns, now).of_type('expense')
+
+    version = result["version"]
+    predictor.update_models(user_id, expenses, str(version - 1), str(version))
+
+
+def run_store_delete(user_id: str) -> bool:
+    """
+    Borra el historial guardado. Los descartes de cubos y modelos solo liberan
+    memoria en el worker que atiende el borrado; los demás no sirven datos del
+    historial borrado porque sus claves llevan la versión del historial, que
+    TransactionStore nunca repite (el borrado deja la versión siguiente).
+    """
+    if AnalysisContext.cube_cache is not None:
+        AnalysisContext.cube_cache.discard(user_id)
+    model_registry.invalidate(user_id)
+    predictor.discard_models(user_id)
+    return transaction_store.delete_user(user_id)
+
+
+def model_registry_stats() -> Dict[str, Any]:
+    """Estadísticas del registro de modelos del proceso que atiende la tarea"""
+    return {"pid": os.getpid(), **model_registry.stats()}
+
+
+WARMUP_USER_ID = "__warmup__"
+
+
+def warm_up() -> float:
+    """
+    Ejecuta cada motor sobre un payload sintético mínimo para pagar al arrancar
+    los imports y la inicialización perezosa de pandas y scikit-learn
+    (IsolationForest, StandardScaler). Devuelve los segundos empleados.
+    """
+    start = datetime.now()
+    today = start.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    # 2 categorías con 6 gastos cada una: suficiente para el camino ML del
+    # predictor (>= 5 por categoría) y para IsolationForest (>= 10 gastos)
+    transactions = [
+        Transaction(
+            amount=20.0 + i * 3 + (150.0 if i == 5 else 0.0),
+            category=category,
+            type="expense",
+            date=(today - timedelta(days=i * 2 + offset)).strftime('%Y-%m-%d'),
+        )
+        for offset, category in enumerate(["food", "transportation"])
+        for i in range(6)
+    ]
+    transactions.append(Transaction(amount=1500.0, category="salary", type="income",
+                                    date=today.strftime('%Y-%m-%d')))
+
+    payload = UserFinancialData(
+        user_id=WARMUP_USER_ID,
+        transactions=transactions,
+        budgets=[Budget(category="food", amountPlanned=200.0,
+                        periodStart=today.replace(day=1).strftime('%Y-%m-%d'),
+                        periodEnd=(today + timedelta(days=30)).strftime('%Y-%m-%d'))],
+        debts=[Debt(type="loan", amount=1000.0, interestRate=0.1)],
+    )
+
+    context = build_context(payload, record_size=False)
+    for section in SECTION_BUILDERS:
+        build_section(section, context, WARMUP_USER_ID)
+
+    # No dejar modelos del usuario sintético en el registro ni en disco
+    model_registry.invalidate(WARMUP_USER_ID)
+    predictor.wait_for_saves()
+    predictor.discard_models(WARMUP_USER_ID)
+
+    return (datetime.now() - start).total_seconds()
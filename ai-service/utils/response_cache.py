@@ -0,0 +1,313 @@
+#utils/response_cache
+
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Set, Tuple
+
+
+def payload_fingerprint(scope: str, normalized_payload: str, reference_date: Optional[datetime] = None,
+                        extra: str = "") -> str:
+    """
+    Clave estable de una respuesta: ámbito (ruta o usuario) + día de referencia +
+    hash del payload normalizado. El día forma parte de la clave porque days_ago,
+    el día de la semana y las ventanas de 30 días dependen de la fecha actual.
+    """
+    day = (reference_date or datetime.now()).date().isoformat()
+    digest = hashlib.sha256(normalized_payload.encode("utf-8")).hexdigest()
+    return f"{scope}:{day}:{extra}:{digest}"
+
+
+class ResponseCache:
+    """
+    Cache de respuestas de análisis direccionado por contenido.
+
+    - Nivel en memoria: LRU con presupuesto en bytes (tamaño serializado) y TTL.
+    - Nivel en disco opcional: un archivo pickle por clave en ``disk_dir``, con
+      un barrido periódico que borra los caducados y, si el directorio supera
+      ``disk_max_bytes``, los más antiguos.
+
+    Las entradas pueden tener dueño (el usuario), que se guarda también en el
+    disco: ``invalidate(owner)`` quita las suyas que este proceso tiene en
+    memoria, junto con sus archivos. Las que solo están en el disco dejan de
+    alcanzarse porque la clave incluye la versión del historial, que nunca se
+    repite.
+
+    Cada entrada guarda además ``expires_at``: el instante en que cambiaría algún
+    campo dependiente de la fecha (ver AnalysisContext.valid_until), de modo que
+    la entrada caduca con lo que ocurra primero, el TTL o ese instante.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl_seconds: int = 300,
+                 disk_dir: Optional[str] = None, disk_max_bytes: int = 256 * 1024 * 1024,
+                 sweep_interval_seconds: int = 60):
+        self.max_bytes = max_bytes
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.disk_dir = disk_dir or None
+        self.disk_max_bytes = disk_max_bytes
+        self.sweep_interval = timedelta(seconds=sweep_interval_seconds)
+
+        self._entries: "OrderedDict[str, Tuple[Any, datetime, int]]" = OrderedDict()
+        self._owners: Dict[str, Set[str]] = {}
+        self._owner_of: Dict[str, str] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._last_sweep: Optional[datetime] = None
+        self._sweep_lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.disk_evictions = 0
+        self.disk_expirations = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Busca en memoria y, si no está, en disco"""
+        now = datetime.now()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at, size = entry
+                if now < expires_at:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._remove(key)
+                self.expirations += 1
+
+        value = self._disk_get(key, now)
+        if value is not None:
+            with self._lock:
+                self.disk_hits += 1
+            return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, value: Any, valid_until: Optional[datetime] = None,
+            owner: Optional[str] = None):
+        """
+        Guarda una respuesta hasta el TTL o hasta ``valid_until`` si es
+        anterior. ``owner`` (el usuario) permite invalidarla con invalidate
+        """
+        now = datetime.now()
+        expires_at = now + self.ttl
+        if valid_until is not None:
+            expires_at = min(expires_at, valid_until)
+        if expires_at <= now:
+            return
+
+        try:
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            logging.error(f"Respuesta no serializable para el cache: {e}")
+            return
+
+        self._memory_put(key, value, expires_at, len(data), owner)
+        self._disk_put(key, data, expires_at, owner)
+
+    def invalidate(self, owner: str) -> int:
+        """
+        Quita las entradas de un dueño que están en memoria (guardadas o
+        promovidas desde el disco en este proceso) y sus archivos; devuelve cuántas
+        """
+        with self._lock:
+            keys = list(self._owners.get(owner, ()))
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+
+        if self.disk_dir:
+            for key in keys:
+                try:
+                    os.remove(self._disk_path(key))
+                except OSError:
+                    pass
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._owners.clear()
+            self._owner_of.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": int(self.ttl.total_seconds()),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "disk_enabled": self.disk_dir is not None,
+                "disk_max_bytes": self.disk_max_bytes,
+                "disk_evictions": self.disk_evictions,
+                "disk_expirations": self.disk_expirations
+            }
+
+    # Nivel en memoria
+
+    def _memory_put(self, key: str, value: Any, expires_at: datetime, size: int,
+                    owner: Optional[str] = None):
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (value, expires_at, size)
+            self._bytes += size
+            if owner is not None:
+                self._owners.setdefault(owner, set()).add(key)
+                self._owner_of[key] = owner
+
+            # Desalojar las entradas menos usadas hasta respetar el presupuesto
+            while self._bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key: str):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+        owner = self._owner_of.pop(key, None)
+        if owner is not None:
+            keys = self._owners[owner]
+            keys.discard(key)
+            if not keys:
+                del self._owners[owner]
+
+    # Nivel en disco
+
+    def _disk_path(self, key: str) -> str:
+        name = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.disk_dir, f"{name}.pkl")
+
+    @staticmethod
+    def _read_header(f) -> Tuple[datetime, Optional[str]]:
+        """Cabecera de un archivo del disco: (expires_at, dueño)"""
+        header = pickle.load(f)
+        if isinstance(header, tuple):
+            return header
+        return header, None  # Archivos anteriores: solo expires_at
+
+    def _disk_get(self, key: str, now: datetime) -> Optional[Any]:
+        if not self.disk_dir:
+            return None
+
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                expires_at, owner = self._read_header(f)
+                if now >= expires_at:
+                    value = None
+                else:
+                    value = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.error(f"Entrada de cache en disco ilegible {path}: {e}")
+            return None
+
+        if now >= expires_at:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+        # Promover al nivel en memoria, con su dueño para que invalidate la alcance
+        self._memory_put(key, value, expires_at, os.path.getsize(path), owner)
+        return value
+
+    def _disk_put(self, key: str, data: bytes, expires_at: datetime, owner: Optional[str] = None):
+        if not self.disk_dir:
+            return
+
+        try:
+            # Escritura atómica: archivo temporal + rename
+            fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump((expires_at, owner), f, protocol=pickle.HIGHEST_PROTOCOL)
+                f.write(data)
+            os.replace(tmp_path, self._disk_path(key))
+        except Exception as e:
+            logging.error(f"Error guardando entrada de cache en disco: {e}")
+
+        now = datetime.now()
+        if self._last_sweep is None or now - self._last_sweep >= self.sweep_interval:
+            self._sweep_disk(now)
+
+    def _sweep_disk(self, now: datetime):
+        """
+        Borra los archivos caducados (y los temporales abandonados) y, si el
+        directorio sigue por encima de ``disk_max_bytes``, los más antiguos.
+        Las claves incluyen el día, así que sin barrido los archivos viejos
+        nunca se volverían a leer ni a borrar.
+        """
+        if not self._sweep_lock.acquire(blocking=False):
+            return  # Otro hilo ya está barriendo
+        try:
+            self._last_sweep = now
+            files = []
+            for entry in os.scandir(self.disk_dir):
+                try:
+                    stat = entry.stat()
+                    if entry.name.endswith(".tmp"):
+                        if now.timestamp() - stat.st_mtime > self.sweep_interval.total_seconds():
+                            os.remove(entry.path)
+                        continue
+                    if not entry.name.endswith(".pkl"):
+                        continue
+                    with open(entry.path, "rb") as f:
+                        expires_at, _ = self._read_header(f)
+                    if now >= expires_at:
+                        os.remove(entry.path)
+                        self.disk_expirations += 1
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+                except FileNotFoundError:
+                    continue  # Borrado por otro proceso
+                except Exception as e:
+                    logging.error(f"Entrada de cache en disco ilegible {entry.path}: {e}")
+                    try:
+                        os.remove(entry.path)
+                    except OSError:
+                        pass
+
+            total = sum(size for _, size, _ in files)
+            for _, size, path in sorted(files):
+                if total <= self.disk_max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    self.disk_evictions += 1
+                except OSError:
+                    pass
+                total -= size
+        except Exception as e:
+            logging.error(f"Error barriendo el cache en disco: {e}")
+        finally:
+            self._sweep_lock.release()
@@ -0,0 +1,11 @@
+#utils/sections
+
+# Secciones del análisis completo. Este módulo no importa los motores: lo usa
+# también el proceso principal, que no carga pandas ni scikit-learn.
+
+# Orden de las secciones en la respuesta combinada
+ANALYSIS_SECTIONS = ["predictions", "anomalies", "recommendations", "summary"]
+
+# Orden de envío en streaming: de la sección más barata a la más costosa
+# (IsolationForest en anomalías es la más lenta)
+STREAM_SECTIONS = ["summary", "recommendations", "predictions", "anomalies"]
@@ -0,0 +1,49 @@
+#utils/single_flight
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+class SingleFlight:
+    """
+    Deduplicación de trabajo en curso: las llamadas concurrentes con la misma
+    clave esperan una sola ejecución y comparten su resultado (o su error).
+
+    La ejecución corre en su propia tarea, así que si la solicitud que la
+    inició se cancela (cliente desconectado) las demás siguen esperándola.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._in_flight
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Ejecuta ``fn`` o, si ya hay una ejecución con esa clave, espera su resultado"""
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.executions += 1
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+
+        return await asyncio.shield(task)
+
+    async def join(self, key: str) -> Optional[Any]:
+        """Espera una ejecución en curso sin iniciar ninguna (None si no la hay)"""
+        task = self._in_flight.get(key)
+        if task is None:
+            return None
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._in_flight),
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+        }
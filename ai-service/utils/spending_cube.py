@@ -0,0 +1,208 @@
+#utils/spending_cube
+
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Tamaño máximo del cubo (días × categorías). Con historiales de fechas muy
+# dispersas el cubo denso no compensa y los consumidores usan el frame
+MAX_CELLS = 1_000_000
+
+
+class SpendingCube:
+    """
+    Gastos agregados por día × categoría, en arrays densos: suma, conteo y suma
+    de cuadrados de cada celda, y la posición de la primera transacción de cada
+    celda (para conservar el orden de aparición). Los días van del primero al
+    último con gastos, sin huecos; las categorías son las observadas, en orden
+    alfabético (el mismo que un groupby).
+    """
+
+    def __init__(self, start: Optional[date], categories: List[str], sums: np.ndarray,
+                 counts: np.ndarray, sumsq: np.ndarray, first_seen: np.ndarray):
+        self.start = start
+        self.categories = categories
+        self.sums = sums
+        self.counts = counts
+        self.sumsq = sumsq
+        self.first_seen = first_seen
+
+    @classmethod
+    def from_expenses(cls, expenses: pd.DataFrame) -> Optional["SpendingCube"]:
+        """Construye el cubo a partir de los gastos; None si no cabe en MAX_CELLS"""
+        if expenses.empty:
+            return cls.from_arrays(np.array([], dtype='datetime64[ns]'), np.array([], dtype=np.int64), [],
+                                   np.array([], dtype=np.float64))
+
+        category = expenses['category']
+        if isinstance(category.dtype, pd.CategoricalDtype):
+            # Códigos enteros: las categorías observadas se renumeran sin ordenar filas
+            codes = category.cat.codes.to_numpy().astype(np.int64)
+            observed = np.bincount(codes, minlength=len(category.cat.categories)) > 0
+            category_index = (np.cumsum(observed) - 1)[codes]
+            categories = [str(name) for name in category.cat.categories[observed]]
+        else:
+            names, category_index = np.unique(category.astype(str).to_numpy(), return_inverse=True)
+            categories = names.tolist()
+
+        return cls.from_arrays(expenses['date'].to_numpy(), category_index, categories,
+                               expenses['amount'].to_numpy(dtype=np.float64))
+
+    @classmethod
+    def from_arrays(cls, dates: np.ndarray, category_index: np.ndarray, categories: List[str],
+                    amount: np.ndarray) -> Optional["SpendingCube"]:
+        """
+        Construye el cubo a partir de columnas de NumPy: fecha de cada gasto,
+        índice de su categoría en ``categories`` (ordenadas) y monto
+        """
+        if len(dates) == 0:
+            empty = np.zeros((0, 0))
+            return cls(None, [], empty, empty.astype(np.int64), empty, empty.astype(np.int64))
+
+        days = dates.astype('datetime64[D]')
+        start = days.min()
+        day_index = (days - start).astype(np.int64)
+        n_days = int(day_index.max()) + 1
+        n_categories = len(categories)
+
+        if n_days * n_categories > MAX_CELLS:
+            return None
+
+        cells = day_index * n_categories + category_index
+        size = n_days * n_categories
+
+        first_seen = np.full(size, len(cells), dtype=np.int64)
+        np.minimum.at(first_seen, cells, np.arange(len(cells)))
+
+        shape = (n_days, n_categories)
+        return cls(
+            start.astype(object),
+            categories,
+            np.bincount(cells, weights=amount, minlength=size).reshape(shape),
+            np.bincount(cells, minlength=size).reshape(shape),
+            np.bincount(cells, weights=amount * amount, minlength=size).reshape(shape),
+            first_seen.reshape(shape),
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return self.sums.nbytes + self.counts.nbytes + self.sumsq.nbytes + self.first_seen.nbytes
+
+    @property
+    def n_days(self) -> int:
+        return self.sums.shape[0]
+
+    def day(self, index: int) -> date:
+        return self.start + timedelta(days=int(index))
+
+    # Agregados derivados (su costo depende de días × categorías, no de las transacciones)
+
+    def daily_stats(self) -> pd.DataFrame:
+        """Suma y número de gastos de cada día con gastos, indexado por fecha"""
+        day_counts = self.counts.sum(axis=1)
+        active = np.flatnonzero(day_counts)
+        return pd.DataFrame(
+            {'amount': self.sums.sum(axis=1)[active], 'transaction_count': day_counts[active]},
+            index=pd.Index([self.day(i) for i in active], name='date'),
+        )
+
+    def day_categories(self, day: date) -> List[str]:
+        """Categorías con gastos en un día, en el orden en que aparecen en el historial"""
+        if self.start is None or not 0 <= (day - self.start).days < self.n_days:
+            return []
+        index = (day - self.start).days
+        present = np.flatnonzero(self.counts[index])
+        ordered = present[np.argsort(self.first_seen[index, present], kind='stable')]
+        return [self.categories[i] for i in ordered]
+
+    def category_totals(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Suma y número de gastos por categoría (en el orden de ``categories``)"""
+        return self.sums.sum(axis=0), self.counts.sum(axis=0)
+
+    def category_stats(self) -> pd.DataFrame:
+        """Suma, conteo y promedio por categoría"""
+        sums, counts = self.category_totals()
+        return pd.DataFrame(
+            {'sum': sums, 'count': counts, 'mean': sums / np.where(counts > 0, counts, 1)},
+            index=pd.Index(self.categories, name='category'),
+        )
+
+    def weekday_totals(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Días de la semana con gastos (0 = lunes), con su suma y número de gastos"""
+        if self.start is None:
+            return np.array([], dtype=np.int64), np.array([]), np.array([])
+        weekdays = (np.arange(self.n_days) + self.start.weekday()) % 7
+        sums = np.bincount(weekdays, weights=self.sums.sum(axis=1), minlength=7)
+        counts = np.bincount(weekdays, weights=self.counts.sum(axis=1), minlength=7)
+        active = np.flatnonzero(counts)
+        return active, sums[active], counts[active]
+
+    def weekday_stats(self) -> pd.DataFrame:
+        """Suma y promedio por día de la semana (solo los días de la semana con gastos)"""
+        if self.start is None:
+            return pd.DataFrame(columns=['sum', 'mean'])
+        weekdays, sums, counts = self.weekday_totals()
+        return pd.DataFrame(
+            {'sum': sums, 'mean': sums / counts},
+            index=pd.Index(weekdays, name='day_of_week'),
+        )
+
+
+class CubeCache:
+    """
+    Cubos recientes por usuario y versión del historial guardado (LRU acotado
+    en bytes). El cubo no depende de la fecha de referencia, así que sirve a
+    todas las solicitudes sobre la misma versión del historial.
+
+    Cada worker tiene su propio cache y no se entera de los borrados atendidos
+    por otro: la clave es segura porque la versión de un usuario nunca se
+    repite, ni siquiera después de borrar su historial.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, str], SpendingCube]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_build(self, user_id: str, version: str, expenses: pd.DataFrame) -> Optional[SpendingCube]:
+        key = (user_id, version)
+        with self._lock:
+            cube = self._entries.get(key)
+            if cube is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cube
+            self.misses += 1
+
+        cube = SpendingCube.from_expenses(expenses)
+        if cube is None or cube.nbytes > self.max_bytes:
+            return cube
+
+        with self._lock:
+            # Un solo cubo por usuario: el historial anterior ya no se va a pedir
+            for stale in [k for k in self._entries if k[0] == user_id]:
+                self._bytes -= self._entries.pop(stale).nbytes
+            self._entries[key] = cube
+            self._bytes += cube.nbytes
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+        return cube
+
+    def discard(self, user_id: str):
+        """Olvida los cubos de un usuario (historial borrado o usuario sintético)"""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == user_id]:
+                self._bytes -= self._entries.pop(key).nbytes
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes,
+                    "hits": self.hits, "misses": self.misses}